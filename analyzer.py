@@ -9,18 +9,79 @@ import csv
 import json
 from datetime import datetime
 import re
+import time
+import threading
+from share_of_voice import shared_share_of_voice
+from trends import shared_trend_store
+from rate_control import error_signals
+
+
+# Fixed instruction block sent first on every analysis call. It never changes between calls and
+# only the message after it varies, but at about 440 tokens it is below the 1024-token minimum
+# providers need before they cache a prefix, so it is not served from the cache yet.
+ANALYSIS_INSTRUCTIONS = """You are an AI optimization expert analyzing responses for AISEO insights. Always return valid JSON.
+
+Analyze the AI response in the next message for SEO/AISEO optimization insights.
+
+Extract the following information in JSON format:
+
+1. companies_mentioned: List all companies/brands/products mentioned
+2. mention_reasons: For each company, why was it mentioned? (features, authority, popularity, etc.)
+3. authority_signals: Authority phrases used (e.g., "leading", "popular", "trusted", "industry standard")
+4. key_features: What features/benefits were highlighted as important?
+5. sources_cited: Extract ALL sources and references, including:
+   - Explicit URLs or website mentions (e.g., "investopedia.com", "https://...")
+   - Named products/platforms/tools (e.g., "iShares", "Aladdin platform", "Russell Indices")
+   - Industry reports or indices mentioned (e.g., "S&P 500", "Russell 2000")
+   - Specific data sources or statistics cited (e.g., "according to...", "data from...")
+   - Publications or media outlets referenced (e.g., "Forbes", "Wall Street Journal")
+   - Research firms or rating agencies (e.g., "Morningstar", "Moody's")
+   - Any parenthetical citations or footnotes
+   IMPORTANT: Include ANY named entity that serves as a source of information or authority
+6. ranking_factors: What seems to determine the order/prominence of mentions?
+7. sentiment: Overall sentiment toward mentioned entities (positive/neutral/negative)
+8. optimization_insights: Specific actionable tips for AISEO based on this response
+
+Return ONLY valid JSON with these exact keys. For sources_cited, be comprehensive - extract anything that could be considered a source, reference, or authoritative mention. Be specific and actionable in optimization_insights."""
 
 
 class ResponseAnalyzer:
     def __init__(self):
         self.csv_path = os.getenv('ANALYSIS_CSV_PATH', 'analysis_results.csv')
-        self.analysis_model = os.getenv('ANALYSIS_MODEL', 'gpt-4.1')
-        self.api_key = os.getenv('OPENAI_API_KEY')
+        # Analysis runs on OpenAI unless ANALYSIS_PROVIDER=anthropic points it at Claude
+        self.analysis_provider = os.getenv('ANALYSIS_PROVIDER', 'openai').lower()
+        if self.analysis_provider == 'anthropic':
+            self.analysis_model = os.getenv('ANALYSIS_MODEL', os.getenv('ANTHROPIC_MODEL', 'claude-3-5-sonnet-20241022'))
+            self.api_key = os.getenv('ANTHROPIC_API_KEY')
+        else:
+            self.analysis_model = os.getenv('ANALYSIS_MODEL', 'gpt-4.1')
+            self.api_key = os.getenv('OPENAI_API_KEY')
         self.analyze_enabled = os.getenv('ANALYZE_RESPONSES', 'false').lower() == 'true'
         
+        # One API client for all analyses; CSV appends are serialized so rows never interleave
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.csv_lock = threading.Lock()
+        
+        # Token counts of analysis calls, to see how much of each prompt came from the provider's cache
+        self._usage = {'calls': 0, 'input_tokens': 0, 'cached_tokens': 0, 'cache_write_tokens': 0,
+                       'output_tokens': 0, 'cached_calls': 0, 'cached_seconds': 0.0,
+                       'uncached_calls': 0, 'uncached_seconds': 0.0}
+        self._usage_lock = threading.Lock()
+        
+        # Materialized share-of-voice counts and mention trends, updated on every CSV write.
+        # Both are shared process-wide, so rebuilding the analyzer opens no new files or connections.
+        self.share_of_voice = None
+        self.trends = None
+        
+        # Optional rate_control.AdaptiveConcurrency, fed with every analysis call like the tester's calls
+        self.rate_control = None
+        
         # Initialize CSV if it doesn't exist
         if self.analyze_enabled:
             self._initialize_csv()
+            self.share_of_voice = shared_share_of_voice(self.csv_path)
+            self.trends = shared_trend_store()
     
     def _initialize_csv(self):
         """Create CSV file with headers if it doesn't exist"""
@@ -45,118 +106,233 @@ class ResponseAnalyzer:
             
             print(f"[OK] Created analysis CSV: {self.csv_path}")
     
+    def _get_client(self, client_class):
+        """Shared analysis client, created on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = client_class(api_key=self.api_key)
+        return self._client
+    
     def analyze_with_ai(self, response_text, query, provider):
         """Use AI to analyze response and extract AISEO insights"""
         
         if not self.analyze_enabled:
             return None
         
-        # Convert response to string for analysis
+        request = self.build_analysis_request(response_text, query, provider)
+        
+        try:
+            started = time.time()
+            if self.analysis_provider == 'anthropic':
+                import anthropic
+                
+                client = self._get_client(anthropic.Anthropic)
+                # Raw response so the rate-limit headers are kept
+                try:
+                    raw = client.messages.with_raw_response.create(**request)
+                except Exception as e:
+                    self._observe(started, error=e)
+                    raise
+                self._observe(started, raw.headers)
+                response = raw.parse()
+                analysis_text = ''.join(block.text for block in response.content if block.type == 'text')
+            else:
+                # Use OpenAI to analyze
+                from openai import OpenAI
+                
+                client = self._get_client(OpenAI)
+                try:
+                    raw = client.chat.completions.with_raw_response.create(**request)
+                except Exception as e:
+                    self._observe(started, error=e)
+                    raise
+                self._observe(started, raw.headers)
+                response = raw.parse()
+                analysis_text = response.choices[0].message.content
+            self.record_usage(response.usage, time.time() - started)
+            
+            return self.parse_analysis(analysis_text, response_text, query, provider)
+            
+        except Exception as e:
+            print(f"[ERROR] Analysis failed for {provider}: {e}")
+            return self._get_fallback_analysis(self._analysis_text(response_text), query, provider)
+    
+    def _observe(self, started, headers=None, error=None):
+        """Report an analysis call's outcome to the adaptive concurrency limits, if enabled"""
+        if self.rate_control is None:
+            return
+        status, timed_out = 200, False
+        if error is not None:
+            status, error_headers, timed_out = error_signals(error)
+            headers = headers if headers is not None else error_headers
+        self.rate_control.observe(self.analysis_provider, time.time() - started, status, headers, timed_out)
+    
+    def record_usage(self, usage, seconds=None):
+        """Count the tokens of one analysis call (an SDK usage object or a batch result's usage dict)"""
+        if usage is None:
+            return
+        
+        def field(obj, name):
+            if obj is None:
+                return None
+            return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+        
+        if self.analysis_provider == 'anthropic':
+            # Claude reports uncached, cache-read and cache-write input tokens separately
+            cached = field(usage, 'cache_read_input_tokens') or 0
+            written = field(usage, 'cache_creation_input_tokens') or 0
+            input_tokens = (field(usage, 'input_tokens') or 0) + cached + written
+            output_tokens = field(usage, 'output_tokens') or 0
+        else:
+            cached = field(field(usage, 'prompt_tokens_details'), 'cached_tokens') or 0
+            written = 0
+            input_tokens = field(usage, 'prompt_tokens') or 0
+            output_tokens = field(usage, 'completion_tokens') or 0
+        
+        with self._usage_lock:
+            stats = self._usage
+            stats['calls'] += 1
+            stats['input_tokens'] += input_tokens
+            stats['cached_tokens'] += cached
+            stats['cache_write_tokens'] += written
+            stats['output_tokens'] += output_tokens
+            if seconds is not None:
+                if cached:
+                    stats['cached_calls'] += 1
+                    stats['cached_seconds'] += seconds
+                else:
+                    stats['uncached_calls'] += 1
+                    stats['uncached_seconds'] += seconds
+    
+    def usage_stats(self):
+        """Analysis token totals, the share served from the prompt cache, and latency with and without a cache hit"""
+        with self._usage_lock:
+            stats = dict(self._usage)
+        return {
+            'provider': self.analysis_provider,
+            'model': self.analysis_model,
+            'calls': stats['calls'],
+            'input_tokens': stats['input_tokens'],
+            'cached_tokens': stats['cached_tokens'],
+            'cache_write_tokens': stats['cache_write_tokens'],
+            'output_tokens': stats['output_tokens'],
+            'cached_ratio': round(stats['cached_tokens'] / stats['input_tokens'], 3) if stats['input_tokens'] else 0.0,
+            'avg_seconds_cached': round(stats['cached_seconds'] / stats['cached_calls'], 2) if stats['cached_calls'] else None,
+            'avg_seconds_uncached': round(stats['uncached_seconds'] / stats['uncached_calls'], 2) if stats['uncached_calls'] else None
+        }
+    
+    def display_usage(self):
+        """Print analysis token usage and prompt-cache hits"""
+        stats = self.usage_stats()
+        if not stats['calls']:
+            return
+        print(f"\n[OK] Analysis tokens: {stats['input_tokens']} input "
+              f"({stats['cached_tokens']} from prompt cache, {stats['cached_ratio']:.0%}), "
+              f"{stats['output_tokens']} output over {stats['calls']} calls")
+        if stats['avg_seconds_cached'] is not None and stats['avg_seconds_uncached'] is not None:
+            print(f"     Average latency: {stats['avg_seconds_cached']}s with cache hit, {stats['avg_seconds_uncached']}s without")
+    
+    def _analysis_text(self, response_text):
+        """Response text as sent for analysis"""
         response_str = str(response_text)
+        # Truncate very long responses to avoid token limits
+        if len(response_str) > 5000:
+            response_str = response_str[:5000] + "... [truncated for analysis]"
+        return response_str
+    
+    def build_analysis_request(self, response_text, query, provider):
+        """Request parameters for analyzing one response (sent directly or inside a batch job)"""
+        response_str = self._analysis_text(response_text)
         
-        analysis_prompt = f"""Analyze this AI response for SEO/AISEO optimization insights.
-
-Extract the following information in JSON format:
-
-1. companies_mentioned: List all companies/brands/products mentioned
-2. mention_reasons: For each company, why was it mentioned? (features, authority, popularity, etc.)
-3. authority_signals: Authority phrases used (e.g., "leading", "popular", "trusted", "industry standard")
-4. key_features: What features/benefits were highlighted as important?
-5. sources_cited: Extract ALL sources and references, including:
-   - Explicit URLs or website mentions (e.g., "investopedia.com", "https://...")
-   - Named products/platforms/tools (e.g., "iShares", "Aladdin platform", "Russell Indices")
-   - Industry reports or indices mentioned (e.g., "S&P 500", "Russell 2000")
-   - Specific data sources or statistics cited (e.g., "according to...", "data from...")
-   - Publications or media outlets referenced (e.g., "Forbes", "Wall Street Journal")
-   - Research firms or rating agencies (e.g., "Morningstar", "Moody's")
-   - Any parenthetical citations or footnotes
-   IMPORTANT: Include ANY named entity that serves as a source of information or authority
-6. ranking_factors: What seems to determine the order/prominence of mentions?
-7. sentiment: Overall sentiment toward mentioned entities (positive/neutral/negative)
-8. optimization_insights: Specific actionable tips for AISEO based on this response
-
-Original Query: {query}
+        # Everything that changes per call goes after the cacheable instructions
+        analysis_prompt = f"""Original Query: {query}
 Provider: {provider}
 
 Response to analyze:
-{response_str}
-
-Return ONLY valid JSON with these exact keys. For sources_cited, be comprehensive - extract anything that could be considered a source, reference, or authoritative mention. Be specific and actionable in optimization_insights."""
+{response_str}"""
+        
+        if self.analysis_provider == 'anthropic':
+            # Claude only caches what is explicitly marked; the mark covers the whole system block
+            return {
+                'model': self.analysis_model,
+                'system': [{"type": "text", "text": ANALYSIS_INSTRUCTIONS, "cache_control": {"type": "ephemeral"}}],
+                'messages': [{"role": "user", "content": analysis_prompt}],
+                'max_tokens': 4000,
+                'temperature': 0.3
+            }
         
+        # OpenAI caches identical prompt prefixes automatically
+        return {
+            'model': self.analysis_model,
+            'messages': [
+                {"role": "system", "content": ANALYSIS_INSTRUCTIONS},
+                {"role": "user", "content": analysis_prompt}
+            ],
+            'max_tokens': 4000,
+            'temperature': 0.3,  # Lower temperature for more consistent analysis
+            'response_format': {"type": "json_object"}  # Force JSON response
+        }
+    
+    def parse_analysis(self, analysis_text, response_text, query, provider):
+        """Turn the analysis model's answer into an analysis record; raises if it is not valid JSON"""
+        response_str = self._analysis_text(response_text)
+        
+        # Parse JSON from response
+        # Handle potential markdown code blocks
+        if '```json' in analysis_text:
+            analysis_text = analysis_text.split('```json')[1].split('```')[0]
+        elif '```' in analysis_text:
+            analysis_text = analysis_text.split('```')[1].split('```')[0]
+        
+        # Try to parse JSON, with better error handling
         try:
-            # Use OpenAI to analyze
-            import openai
-            from openai import OpenAI
-            
-            client = OpenAI(api_key=self.api_key)
-            
-            # Escape problematic characters in the response text
-            # Truncate very long responses to avoid token limits
-            if len(response_str) > 5000:
-                response_str = response_str[:5000] + "... [truncated for analysis]"
-            
-            response = client.chat.completions.create(
-                model=self.analysis_model,
-                messages=[
-                    {"role": "system", "content": "You are an AI optimization expert analyzing responses for AISEO insights. Always return valid JSON."},
-                    {"role": "user", "content": analysis_prompt}
-                ],
-                max_tokens=4000,
-                temperature=0.3,  # Lower temperature for more consistent analysis
-                response_format={"type": "json_object"}  # Force JSON response
-            )
-            
-            analysis_text = response.choices[0].message.content
-            
-            # Parse JSON from response
-            # Handle potential markdown code blocks
-            if '```json' in analysis_text:
-                analysis_text = analysis_text.split('```json')[1].split('```')[0]
-            elif '```' in analysis_text:
-                analysis_text = analysis_text.split('```')[1].split('```')[0]
-            
-            # Try to parse JSON, with better error handling
-            try:
-                analysis = json.loads(analysis_text.strip())
-            except json.JSONDecodeError as je:
-                print(f"[WARNING] JSON parse error, attempting to fix: {je}")
-                # Try to fix common JSON issues
-                fixed_text = analysis_text.strip()
-                # Remove any trailing commas
-                fixed_text = re.sub(r',\s*}', '}', fixed_text)
-                fixed_text = re.sub(r',\s*]', ']', fixed_text)
-                analysis = json.loads(fixed_text)
-            
-            # Ensure all required fields are present
-            required_fields = {
-                'companies_mentioned': [],
-                'mention_reasons': {},
-                'authority_signals': [],
-                'key_features': [],
-                'sources_cited': [],
-                'ranking_factors': '',
-                'sentiment': 'neutral',
-                'optimization_insights': ''
-            }
-            
-            # Merge with defaults
-            for field, default in required_fields.items():
-                if field not in analysis:
-                    analysis[field] = default
-            
-            # Post-process sources_cited to extract additional patterns
-            analysis['sources_cited'] = self._extract_additional_sources(response_str, analysis.get('sources_cited', []))
-            
-            # Add metadata
-            analysis['timestamp'] = datetime.now().isoformat()
-            analysis['query'] = query
-            analysis['provider'] = provider
-            
-            return analysis
-            
+            analysis = json.loads(analysis_text.strip())
+        except json.JSONDecodeError as je:
+            print(f"[WARNING] JSON parse error, attempting to fix: {je}")
+            # Try to fix common JSON issues
+            fixed_text = analysis_text.strip()
+            # Remove any trailing commas
+            fixed_text = re.sub(r',\s*}', '}', fixed_text)
+            fixed_text = re.sub(r',\s*]', ']', fixed_text)
+            analysis = json.loads(fixed_text)
+        
+        # Ensure all required fields are present
+        required_fields = {
+            'companies_mentioned': [],
+            'mention_reasons': {},
+            'authority_signals': [],
+            'key_features': [],
+            'sources_cited': [],
+            'ranking_factors': '',
+            'sentiment': 'neutral',
+            'optimization_insights': ''
+        }
+        
+        # Merge with defaults
+        for field, default in required_fields.items():
+            if field not in analysis:
+                analysis[field] = default
+        
+        # Post-process sources_cited to extract additional patterns
+        analysis['sources_cited'] = self._extract_additional_sources(response_str, analysis.get('sources_cited', []))
+        
+        # Add metadata
+        analysis['timestamp'] = datetime.now().isoformat()
+        analysis['query'] = query
+        analysis['provider'] = provider
+        
+        return analysis
+    
+    def analysis_from_text(self, analysis_text, response_text, query, provider):
+        """Analysis record from an answer obtained elsewhere (e.g. a batch job), with the usual fallback"""
+        try:
+            if not analysis_text:
+                raise ValueError("no analysis returned")
+            return self.parse_analysis(analysis_text, response_text, query, provider)
         except Exception as e:
             print(f"[ERROR] Analysis failed for {provider}: {e}")
-            return self._get_fallback_analysis(response_str, query, provider)
+            return self._get_fallback_analysis(self._analysis_text(response_text), query, provider)
     
     def _extract_additional_sources(self, response_text, existing_sources):
         """Extract additional sources from response text that may have been missed"""
@@ -310,7 +486,7 @@ Return ONLY valid JSON with these exact keys. For sources_cited, be comprehensiv
             return
         
         try:
-            with open(self.csv_path, 'a', newline='', encoding='utf-8') as f:
+            with self.csv_lock, open(self.csv_path, 'a', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
                 
                 # Convert complex fields to JSON strings
@@ -332,6 +508,19 @@ Return ONLY valid JSON with these exact keys. For sources_cited, be comprehensiv
                 
         except Exception as e:
             print(f"[ERROR] Failed to save to CSV: {e}")
+            return
+        
+        # Fold the new row into the share-of-voice counts
+        try:
+            self.share_of_voice.refresh()
+        except Exception as e:
+            print(f"[WARNING] Failed to update share-of-voice index: {e}")
+        
+        # Count it into the hourly/daily/weekly trend buckets
+        try:
+            self.trends.record(analysis_data)
+        except Exception as e:
+            print(f"[WARNING] Failed to update trend store: {e}")
     
     def display_insights(self, analysis_data):
         """Display key insights from analysis"""
@@ -4,17 +4,36 @@ Flask API Backend for AISEO Multi-LLM Query Tool
 Provides REST API and WebSocket support for the frontend
 """
 
-from flask import Flask, request, jsonify
+import os
+
+# The environment as the process started. run.py (imported below) loads .env into os.environ,
+# so the config watcher needs this to restore the right value when a key leaves .env.
+PROCESS_ENV = dict(os.environ)
+
+# Event-loop servers must patch the standard library before anything else imports it.
+# SOCKETIO_ASYNC_MODE has to come from the process environment, not .env.
+ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE', 'threading').lower()
+if ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+elif ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE != 'threading':
+    raise SystemExit(f"[ERROR] Unsupported SOCKETIO_ASYNC_MODE: {ASYNC_MODE} (use threading, gevent or eventlet)")
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 import sys
-import os
 import json
 import uuid
+import zlib
 from datetime import datetime
-from threading import Thread
 import queue
 import time
+from threading import Lock, Thread
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 # Add parent directory to path to import existing modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -51,6 +70,10 @@ except ImportError:
             return {"provider": "Google Search", "response": json.dumps([
                 {"title": "Result 1", "link": "https://example.com", "snippet": "Sample result"}
             ]), "success": True}
+            
+        def test_provider(self, provider, prompt):
+            method = getattr(self, f"test_{provider}", None)
+            return method(prompt) if method else None
     
     class ResponseAnalyzer:
         def __init__(self):
@@ -59,56 +82,172 @@ except ImportError:
         def analyze_with_ai(self, response_text, query, provider):
             return None
 
+from share_of_voice import shared_share_of_voice
+from trends import shared_trend_store, GRANULARITIES
+from worker_pool import QueryWorkerPool, QueueFull
+from scheduler import FairScheduler
+from rate_control import AdaptiveConcurrency
+from cancellation import CancelToken, QueryCancelled
+from result_store import create_result_store
+from config import ConfigWatcher
+from coalesce import SingleFlight, coalesce_key
+from export import parse_columns, stream_csv, stream_ndjson
+from batches import BatchTracker
+from http_cache import ResponseCache, json_response
+
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE)
+
+# Configuration snapshot, re-read only when .env changes
+config = ConfigWatcher(base_env=PROCESS_ENV)
 
-# Store query results in memory (in production, use Redis or database)
-query_results = {}
+# Bounded result store: in-memory LRU/TTL, optionally backed by SQLite (RESULT_STORE=sqlite)
+query_results = create_result_store()
 active_queries = {}
+# Provider threads write into a record while a cancel may be storing it; this makes each write and
+# the cancelled store atomic, so a result is either in the stored record or dropped, never half-kept
+record_lock = Lock()
 
-# Initialize tester and analyzer
-def init_services():
-    """Initialize services after environment is loaded"""
-    from dotenv import load_dotenv
-    load_dotenv(override=True)
-    
-    # Check configured providers
-    configured_providers = []
-    api_keys = {
-        'openai': os.getenv('OPENAI_API_KEY'),
-        'anthropic': os.getenv('ANTHROPIC_API_KEY'),
-        'perplexity': os.getenv('PERPLEXITY_API_KEY'),
-        'google': os.getenv('GOOGLE_API_KEY'),
-        'google_search': os.getenv('GOOGLE_SEARCH_API_KEY'),
-        'google_cx': os.getenv('GOOGLE_SEARCH_CX'),
-    }
-    
-    for provider, key in api_keys.items():
-        if provider == 'google_cx':
-            if key and not key.startswith('your-'):
-                pass
-        elif key and not key.startswith('your-') and not key.startswith('sk-your') and not key.startswith('pplx-your'):
-            if provider != 'google_search':
-                configured_providers.append(provider)
-    
-    if api_keys.get('google_search') and api_keys.get('google_cx'):
-        configured_providers.append('google_search')
+# Identical queries submitted while one is running share its execution
+COALESCE_QUERIES = os.getenv('COALESCE_QUERIES', 'true').lower() == 'true'
+in_flight = SingleFlight()
+
+# Fixed-size pool for query processing - bursts queue up (or get a 429) instead of spawning threads
+worker_pool = QueryWorkerPool(
+    max_workers=int(os.getenv('QUERY_WORKERS', 4)),
+    max_queue=int(os.getenv('QUERY_QUEUE_SIZE', 32))
+)
+
+# Serialized, compressed bodies of finished results, reused across polls
+FINAL_STATUSES = ('completed', 'error', 'cancelled')
+response_cache = ResponseCache(max_bytes=int(float(os.getenv('RESPONSE_CACHE_MB', 64)) * 1024 * 1024))
+
+# Batches run on their own workers so they never hold up interactive queries waiting for a worker;
+# both share the provider slots below
+BATCH_MAX_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', 1000))
+batch_pool = QueryWorkerPool(
+    max_workers=int(os.getenv('BATCH_WORKERS', 4)),
+    max_queue=int(os.getenv('BATCH_QUEUE_SIZE', 16)),
+    name='batch-worker'
+)
+batch_tracker = BatchTracker()
+# Batch questions not yet handed to the pool; each enters the result store when it is
+queued_batch_records = {}
+
+def find_record(query_id):
+    """A query's record, including batch questions still waiting for the pool"""
+    record = query_results.get(query_id)
+    return record if record is not None else queued_batch_records.get(query_id)
+
+# Provider calls from every query and batch go through one weighted fair queue per provider
+scheduler = FairScheduler()
+
+# Provider slot counts follow each provider's latency, 429s and rate-limit headers instead of staying fixed
+ADAPTIVE_CONCURRENCY = os.getenv('ADAPTIVE_CONCURRENCY', 'true').lower() == 'true'
+rate_control = None
+if ADAPTIVE_CONCURRENCY:
+    rate_control = AdaptiveConcurrency(initial_for=scheduler.limit_for, on_change=scheduler.wake)
+    scheduler.limit_for = rate_control.limit
+# Analysis shares the slots of the provider the analyzer calls (OpenAI unless ANALYSIS_PROVIDER says otherwise)
+ANALYSIS_BUDGET = os.getenv('ANALYSIS_PROVIDER', 'openai').lower()
+
+# Share-of-voice counts over the analysis CSV (catches up with rows written by any process);
+# the same instance the analyzers update
+share_of_voice = shared_share_of_voice(os.getenv('ANALYSIS_CSV_PATH', 'analysis_results.csv'))
+
+# Hourly/daily/weekly mention trends fed by the analyzer, over one shared SQLite connection
+trend_store = shared_trend_store()
+
+# Tester and analyzer are shared by all query threads and rebuilt only when the config changes
+services = {"version": None, "tester": None, "analyzer": None}
+services_lock = Lock()
+
+def get_services(settings):
+    """Tester and analyzer for a config snapshot, built once per snapshot version"""
+    with services_lock:
+        if services["version"] != settings.version:
+            tester = FixedLLMTester()
+            tester.rate_control = rate_control
+            tester.configured_providers = list(settings.configured_providers)
+            tester.api_keys = dict(settings.api_keys)
+            analyzer = ResponseAnalyzer()
+            # Analysis calls hold ANALYSIS_BUDGET slots, so they feed that provider's limit too
+            analyzer.rate_control = rate_control
+            services.update(version=settings.version, tester=tester, analyzer=analyzer)
+        return services["tester"], services["analyzer"]
+
+# Payloads at least this large go compressed to clients that asked for it
+SOCKETIO_COMPRESS_THRESHOLD = int(os.getenv('SOCKETIO_COMPRESS_THRESHOLD', 4096))
+ANALYSIS_METADATA = ('query', 'provider', 'timestamp')
+
+def room_has_members(room):
+    """True if any client on this server is in the room"""
+    return next(socketio.server.manager.get_participants('/', room), None) is not None
+
+def emit_to_query(event, payload, query_id):
+    """Emit a query event to its plain room and, zlib-compressed when large, to its compressed room"""
+    room = f"query_{query_id}"
+    packed_room = f"{room}_z"
     
-    return configured_providers
+    # Nobody watching - skip the serialization entirely
+    if room_has_members(packed_room):
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        if len(body) >= SOCKETIO_COMPRESS_THRESHOLD:
+            socketio.emit(event, {'query_id': query_id, 'z': zlib.compress(body)}, room=packed_room)
+        else:
+            socketio.emit(event, payload, room=packed_room)
+    if room_has_members(room):
+        socketio.emit(event, payload, room=room)
+
+# Optionally cancel interactive queries nobody is watching any more
+AUTO_CANCEL_GRACE_SECONDS = float(os.getenv('AUTO_CANCEL_GRACE_SECONDS', 0))
+
+def watch_abandoned_queries():
+    """Cancel interactive queries whose room has been empty for the grace period"""
+    while True:
+        time.sleep(1)
+        now = time.time()
+        for query_id, entry in list(active_queries.items()):
+            # Batch queries are never watched, so an empty room means nothing for them
+            if entry["priority"] != 'interactive':
+                continue
+            room = f"query_{query_id}"
+            if room_has_members(room) or room_has_members(f"{room}_z"):
+                entry["empty_since"] = None
+            elif entry["empty_since"] is None:
+                entry["empty_since"] = now
+            elif now - entry["empty_since"] >= AUTO_CANCEL_GRACE_SECONDS:
+                print(f"[WARNING] Cancelling abandoned query {query_id}")
+                cancel_query(query_id, reason='abandoned')
+
+if AUTO_CANCEL_GRACE_SECONDS > 0:
+    Thread(target=watch_abandoned_queries, name="abandoned-query-watcher", daemon=True).start()
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
+    return jsonify({
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "workers": worker_pool.stats(),
+        "batch_workers": batch_pool.stats(),
+        "scheduler": scheduler.stats(),
+        "adaptive_concurrency": rate_control.stats() if rate_control else None,
+        "result_store": query_results.stats(),
+        "coalescing": in_flight.stats(),
+        "response_cache": response_cache.stats(),
+        "analysis_usage": services["analyzer"].usage_stats() if hasattr(services["analyzer"], 'usage_stats') else None,
+        "config_version": config.current().version
+    })
 
 @app.route('/api/providers', methods=['GET'])
 def get_providers():
     """Get list of configured providers"""
-    providers = init_services()
+    settings = config.current()
     
     provider_info = []
-    for provider in providers:
+    for provider in settings.configured_providers:
         info = {
             "id": provider,
             "name": provider.replace('_', ' ').title(),
@@ -118,19 +257,19 @@ def get_providers():
         
         # Add model information
         if provider == 'openai':
-            info["model"] = os.getenv('OPENAI_MODEL', 'gpt-4.1')
+            info["model"] = settings.get('OPENAI_MODEL', 'gpt-4.1')
         elif provider == 'anthropic':
-            info["model"] = os.getenv('ANTHROPIC_MODEL', 'claude-sonnet-4-20250514')
+            info["model"] = settings.get('ANTHROPIC_MODEL', 'claude-sonnet-4-20250514')
         elif provider == 'perplexity':
-            info["model"] = os.getenv('PERPLEXITY_MODEL', 'llama-3.1-sonar-small-128k-online')
+            info["model"] = settings.get('PERPLEXITY_MODEL', 'llama-3.1-sonar-small-128k-online')
         elif provider == 'google':
-            info["model"] = os.getenv('GOOGLE_MODEL', 'gemini-2.5-flash')
+            info["model"] = settings.get('GOOGLE_MODEL', 'gemini-2.5-flash')
         
         provider_info.append(info)
     
     return jsonify({
         "providers": provider_info,
-        "analysis_enabled": os.getenv('ANALYZE_RESPONSES', 'true').lower() == 'true'
+        "analysis_enabled": settings.analyze_enabled
     })
 
 @app.route('/api/query', methods=['POST'])
@@ -145,165 +284,462 @@ def submit_query():
     
     # Generate query ID
     query_id = str(uuid.uuid4())
+    providers = selected_providers or list(config.current().configured_providers)
     
     # Initialize result structure
-    query_results[query_id] = {
+    query_results.put(query_id, {
         "id": query_id,
         "query": query_text,
         "timestamp": datetime.now().isoformat(),
-        "status": "processing",
+        "status": "queued",
+        "providers": providers,
         "results": {},
         "analysis": None
-    }
+    })
     
-    # Start processing in background thread
-    thread = Thread(target=process_query_async, args=(query_id, query_text, selected_providers))
-    thread.start()
+    # Same question to the same providers already running? Share that run instead of starting another
+    if COALESCE_QUERIES:
+        leader_id = in_flight.claim(coalesce_key(query_text, providers), query_id)
+        if leader_id is not None:
+            query_results.delete(query_id)
+            leader = query_results.get(leader_id)
+            return jsonify({
+                "query_id": leader_id,
+                "status": leader["status"] if leader else None,
+                "message": "Identical query already in progress, attached to it",
+                "websocket_room": f"query_{leader_id}",
+                "queue_position": worker_pool.position(leader_id),
+                "queue_depth": worker_pool.depth(),
+                "coalesced": True
+            })
+    
+    # Hand off to the worker pool; push back if too much work is already waiting
+    track_query(query_id, 'interactive')
+    try:
+        position = worker_pool.submit(query_id, process_query_async, query_id, query_text, selected_providers)
+    except QueueFull as e:
+        active_queries.pop(query_id, None)
+        in_flight.release(query_id)
+        query_results.delete(query_id)
+        response = jsonify({
+            "error": "Too many queries in progress, please retry later",
+            "retry_after": e.retry_after
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
     
     return jsonify({
         "query_id": query_id,
         "message": "Query submitted successfully",
-        "websocket_room": f"query_{query_id}"
+        "websocket_room": f"query_{query_id}",
+        "queue_position": position,
+        "queue_depth": worker_pool.depth(),
+        "coalesced": False
     })
 
-def process_query_async(query_id, query_text, selected_providers=None):
+def process_query_async(query_id, query_text, selected_providers=None, priority='interactive'):
     """Process query asynchronously and emit updates via WebSocket"""
+    # In-flight records are pinned in memory, so updating this dict updates the store
+    record = query_results.get(query_id)
+    cancel = track_query(query_id, priority)
     try:
-        # Re-initialize services in thread context
-        from dotenv import load_dotenv
-        load_dotenv(override=True)
+        if cancel.cancelled:
+            # Cancelled between leaving the queue and starting
+            raise QueryCancelled()
         
-        # Import after loading env
-        global FixedLLMTester, ResponseAnalyzer
-        try:
-            from run import FixedLLMTester
-            from analyzer import ResponseAnalyzer
-        except ImportError:
-            pass  # Will use the simplified versions defined above
+        record["status"] = "processing"
+        query_results.put(query_id, record)
         
-        tester = FixedLLMTester()
-        analyzer = ResponseAnalyzer()
+        # One snapshot for the whole query, even if .env changes meanwhile
+        settings = config.current()
+        
+        tester, analyzer = get_services(settings)
         
         # Get configured providers
         if selected_providers is None:
-            selected_providers = init_services()
+            selected_providers = list(settings.configured_providers)
+        
+        # An interactive query's analysis keeps its priority; batch analysis queues as 'analysis'
+        analysis_class = 'interactive' if priority == 'interactive' else 'analysis'
         
-        # Process each provider
-        for provider in selected_providers:
+        def run_provider(provider):
+            """Query one provider and analyze its answer as soon as it arrives"""
+            if cancel.cancelled:
+                return
+            
             # Emit start event
-            socketio.emit('provider_start', {
+            emit_to_query('provider_start', {
                 'query_id': query_id,
                 'provider': provider
-            }, room=f"query_{query_id}")
+            }, query_id)
             
             # Test provider
-            result = None
-            if provider == 'openai':
-                result = tester.test_openai(query_text)
-            elif provider == 'anthropic':
-                result = tester.test_anthropic(query_text)
-            elif provider == 'google':
-                result = tester.test_google(query_text)
-            elif provider == 'perplexity':
-                result = tester.test_perplexity(query_text)
-            elif provider == 'google_search':
-                result = tester.test_google_search(query_text)
+            started = time.time()
+            with scheduler.slot(provider, priority, cancel):
+                # A cancel can land just as the slot is granted; hand the slot straight back
+                if cancel.cancelled:
+                    return
+                result = tester.test_provider(provider, query_text)
+            # A call that was already on the wire cannot be interrupted; drop its answer
+            if not result or cancel.cancelled:
+                return
+            result['elapsed_seconds'] = round(time.time() - started, 3)
+            
+            # Store result, unless the query was cancelled (and stored) since the check above
+            with record_lock:
+                if cancel.cancelled:
+                    return
+                record["results"][provider] = result
             
-            if result:
-                # Store result
-                query_results[query_id]["results"][provider] = result
-                
-                # Emit result event
-                socketio.emit('provider_complete', {
-                    'query_id': query_id,
-                    'provider': provider,
-                    'result': result
-                }, room=f"query_{query_id}")
-                
-                # Analyze if enabled and successful
-                if result.get('success') and analyzer.analyze_enabled and provider != 'google_search':
+            # Emit result event
+            emit_to_query('provider_complete', {
+                'query_id': query_id,
+                'provider': provider,
+                'result': result
+            }, query_id)
+            
+            # Analyze if enabled and successful
+            if result.get('success') and analyzer.analyze_enabled and provider != 'google_search':
+                started = time.time()
+                with scheduler.slot(ANALYSIS_BUDGET, analysis_class, cancel):
+                    if cancel.cancelled:
+                        return
                     analysis = analyzer.analyze_with_ai(
                         result.get('response'),
                         query_text,
                         provider
                     )
+                elapsed = round(time.time() - started, 3)
+                with record_lock:
+                    if cancel.cancelled:
+                        return
+                    result['analysis_seconds'] = elapsed
                     if analysis:
-                        if query_results[query_id]["analysis"] is None:
-                            query_results[query_id]["analysis"] = {}
-                        query_results[query_id]["analysis"][provider] = analysis
-                        
-                        # Emit analysis event
-                        socketio.emit('analysis_complete', {
-                            'query_id': query_id,
-                            'provider': provider,
-                            'analysis': analysis
-                        }, room=f"query_{query_id}")
+                        if record["analysis"] is None:
+                            record["analysis"] = {}
+                        record["analysis"][provider] = analysis
+                if analysis:
+                    # Emit only the new analysis fields - query, provider and timestamp are already known
+                    emit_to_query('analysis_complete', {
+                        'query_id': query_id,
+                        'provider': provider,
+                        'analysis': {k: v for k, v in analysis.items() if k not in ANALYSIS_METADATA}
+                    }, query_id)
+        
+        # Query every provider at once; events go out in completion order, fastest provider first
+        if selected_providers:
+            executor = ThreadPoolExecutor(max_workers=len(selected_providers),
+                                          thread_name_prefix=f"query-{query_id[:8]}")
+            try:
+                pending = {executor.submit(run_provider, provider) for provider in selected_providers}
+                while pending:
+                    # The cancel future completes on cancellation, so we stop waiting right away
+                    done, pending = wait(pending | {cancel.future}, return_when=FIRST_COMPLETED)
+                    pending.discard(cancel.future)
+                    if cancel.cancelled:
+                        raise QueryCancelled()
+                    for future in done:
+                        future.result()
+            finally:
+                # Never block the worker on abandoned calls; unstarted ones are dropped
+                executor.shutdown(wait=False, cancel_futures=True)
         
         # Update status
-        query_results[query_id]["status"] = "completed"
+        record["status"] = "completed"
+        store_final(record)
         
-        # Emit completion event
-        socketio.emit('query_complete', {
+        # Results and analysis already went out per provider; the final event just closes the query
+        emit_to_query('query_complete', {
             'query_id': query_id,
-            'results': query_results[query_id]
-        }, room=f"query_{query_id}")
+            'status': record["status"],
+            'providers': list(record["results"])
+        }, query_id)
         
+    except QueryCancelled:
+        mark_cancelled(record, cancel.reason)
     except Exception as e:
         print(f"Error processing query: {e}")
-        query_results[query_id]["status"] = "error"
-        query_results[query_id]["error"] = str(e)
+        record["status"] = "error"
+        record["error"] = str(e)
+        store_final(record)
         
-        socketio.emit('query_error', {
+        emit_to_query('query_error', {
             'query_id': query_id,
             'error': str(e)
-        }, room=f"query_{query_id}")
+        }, query_id)
+    finally:
+        finish_query(record)
+
+def track_query(query_id, priority):
+    """Cancel token for a query, registering it if the submitter did not"""
+    entry = active_queries.setdefault(query_id, {"cancel": CancelToken(), "priority": priority, "empty_since": None})
+    return entry["cancel"]
+
+def mark_cancelled(record, reason):
+    """Store and announce a cancelled query, keeping any results that already arrived"""
+    with record_lock:
+        record["status"] = "cancelled"
+        record["cancel_reason"] = reason
+        store_final(record)
+    
+    emit_to_query('query_cancelled', {
+        'query_id': record["id"],
+        'reason': reason
+    }, record["id"])
+
+def store_final(record):
+    """Store a query's final record and stop coalescing onto it - always before its terminal event goes out.
+
+    A submitter attached until this point joins a room whose terminal event is
+    still to come; one arriving later starts a fresh run. Clients that join
+    after the event anyway get the outcome replayed by handle_join_query.
+    """
+    query_results.put(record["id"], record)
+    in_flight.release(record["id"])
+
+def replay_final(record):
+    """Send a finished query's results and terminal event to the client that just joined its room"""
+    query_id = record["id"]
+    for provider, result in (record.get("results") or {}).items():
+        emit('provider_complete', {'query_id': query_id, 'provider': provider, 'result': result})
+    for provider, analysis in (record.get("analysis") or {}).items():
+        emit('analysis_complete', {
+            'query_id': query_id,
+            'provider': provider,
+            'analysis': {k: v for k, v in analysis.items() if k not in ANALYSIS_METADATA}
+        })
+    if record["status"] == "completed":
+        emit('query_complete', {'query_id': query_id, 'status': record["status"], 'providers': list(record.get("results") or {})})
+    elif record["status"] == "error":
+        emit('query_error', {'query_id': query_id, 'error': record.get("error")})
+    else:
+        emit('query_cancelled', {'query_id': query_id, 'reason': record.get("cancel_reason")})
+
+def finish_query(record):
+    """Bookkeeping once a query reached a final status"""
+    active_queries.pop(record["id"], None)
+    # Normally released by store_final already; covers queries that never got that far
+    in_flight.release(record["id"])
+    
+    if record.get("batch_id"):
+        report_batch_progress(record)
+
+def cancel_query(query_id, reason='cancelled'):
+    """Cancel a queued or running query; returns the resulting status, or None if there is nothing to cancel"""
+    entry = active_queries.get(query_id)
+    if entry is None:
+        return None
+    
+    # Several submitters may share a coalesced query - only the last one cancels it
+    if reason == 'cancelled' and in_flight.detach(query_id):
+        return "detached"
+    
+    if not entry["cancel"].cancel(reason):
+        return "cancelling"
+    
+    # Still waiting for a worker: drop it here, since no worker will ever pick it up
+    if worker_pool.cancel(query_id) or batch_pool.cancel(query_id):
+        record = query_results.get(query_id)
+        if record is not None:
+            mark_cancelled(record, reason)
+            finish_query(record)
+    return "cancelled"
+
+def report_batch_progress(record):
+    """Count a finished batch query and tell the batch room"""
+    results = record.get("results") or {}
+    failed = record.get("status") == "error" or not any(r.get('success') for r in results.values())
+    progress = batch_tracker.finish_query(record["batch_id"], record["id"], failed)
+    room = f"batch_{record['batch_id']}"
+    if progress and room_has_members(room):
+        socketio.emit('batch_progress', progress, room=room)
+
+@app.route('/api/batch', methods=['POST'])
+def submit_batch():
+    """Submit many questions at once; they run through the shared worker pool"""
+    data = request.json or {}
+    questions = [q.strip() for q in data.get('questions') or [] if isinstance(q, str) and q.strip()]
+    configured = list(config.current().configured_providers)
+    providers = data.get('providers') or configured
+    
+    if not questions:
+        return jsonify({"error": "questions must be a non-empty list of strings"}), 400
+    if not isinstance(providers, list) or not all(isinstance(p, str) for p in providers):
+        return jsonify({"error": "providers must be a list of provider names"}), 400
+    unknown = [p for p in providers if p not in configured]
+    if unknown:
+        return jsonify({"error": f"Providers not configured: {', '.join(unknown)}",
+                        "configured_providers": configured}), 400
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return jsonify({"error": f"A batch may contain at most {BATCH_MAX_QUESTIONS} questions"}), 400
+    
+    batch_id = str(uuid.uuid4())
+    jobs = []
+    for question in questions:
+        query_id = str(uuid.uuid4())
+        # Stubs wait outside the result store, so a big batch cannot push finished results out of it
+        queued_batch_records[query_id] = {
+            "id": query_id,
+            "query": question,
+            "timestamp": datetime.now().isoformat(),
+            "status": "queued",
+            "providers": providers,
+            "batch_id": batch_id,
+            "results": {},
+            "analysis": None
+        }
+        jobs.append((query_id, question))
+        track_query(query_id, 'batch')
+    
+    progress = batch_tracker.create(batch_id, [query_id for query_id, _ in jobs], providers)
+    
+    def feed():
+        """Hand questions to the batch pool as room frees up"""
+        for query_id, question in jobs:
+            record = queued_batch_records[query_id]
+            record["timestamp"] = datetime.now().isoformat()
+            query_results.put(query_id, record)
+            queued_batch_records.pop(query_id, None)
+            
+            cancel = active_queries[query_id]["cancel"]
+            if cancel.cancelled:
+                # Cancelled before it reached the pool - close it out without using a worker
+                mark_cancelled(record, cancel.reason)
+                finish_query(record)
+                continue
+            batch_pool.submit_blocking(query_id, process_query_async, query_id, question, providers, 'batch')
+    
+    Thread(target=feed, name=f"batch-{batch_id[:8]}", daemon=True).start()
+    
+    return jsonify(dict(progress,
+                        message="Batch submitted successfully",
+                        websocket_room=f"batch_{batch_id}",
+                        query_ids=[query_id for query_id, _ in jobs]))
+
+@app.route('/api/batch/<batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    """Progress of a batch"""
+    batch = batch_tracker.get(batch_id)
+    if batch is None:
+        return jsonify({"error": "Batch not found"}), 404
+    return jsonify(batch)
+
+@app.route('/api/batch/<batch_id>/results', methods=['GET'])
+def get_batch_results(batch_id):
+    """Results of every query in a batch; format=ndjson or csv streams rows like /api/export"""
+    batch = batch_tracker.get(batch_id)
+    if batch is None:
+        return jsonify({"error": "Batch not found"}), 404
+    
+    records = (record for record in (find_record(query_id) for query_id in batch["query_ids"]) if record is not None)
+    
+    format_type = request.args.get('format', 'json')
+    if format_type == 'json':
+        return jsonify({"batch": batch, "results": list(records)})
+    if format_type not in ('ndjson', 'csv'):
+        return jsonify({"error": "format must be json, ndjson or csv"}), 400
+    
+    try:
+        columns = parse_columns(request.args.get('columns'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    stream = stream_csv if format_type == 'csv' else stream_ndjson
+    return Response(
+        stream_with_context(stream(records, columns)),
+        mimetype='text/csv' if format_type == 'csv' else 'application/x-ndjson',
+        headers={"Content-disposition": f"attachment; filename=batch_{batch_id}.{format_type}"}
+    )
+
+@app.route('/api/query/<query_id>/cancel', methods=['POST'])
+def cancel_query_endpoint(query_id):
+    """Cancel a queued or running query"""
+    record = find_record(query_id)
+    if record is None:
+        return jsonify({"error": "Query not found"}), 404
+    
+    status = cancel_query(query_id)
+    if status is None:
+        return jsonify({"error": "Query already finished", "status": record["status"]}), 409
+    
+    return jsonify({"query_id": query_id, "status": status})
 
 @app.route('/api/results/<query_id>', methods=['GET'])
 def get_results(query_id):
     """Get results for a specific query"""
-    if query_id not in query_results:
+    result = find_record(query_id)
+    if result is None:
         return jsonify({"error": "Query not found"}), 404
     
-    return jsonify(query_results[query_id])
+    if result["status"] in FINAL_STATUSES:
+        # Finished records never change: serialize and compress once, then answer polls with 304s
+        return response_cache.respond(('results', query_id), lambda: result)
+    
+    if result["status"] == "queued":
+        # Let the client show where it is in line - batch questions wait in the batch pool
+        pool = batch_pool if result.get("batch_id") else worker_pool
+        result = dict(result,
+                      queue_position=pool.position(query_id),
+                      queue_depth=pool.depth())
+    
+    return json_response(result)
 
 @app.route('/api/analysis/<query_id>', methods=['GET'])
 def get_analysis(query_id):
     """Get AISEO analysis for a specific query"""
-    if query_id not in query_results:
+    record = query_results.get(query_id)
+    if record is None:
         return jsonify({"error": "Query not found"}), 404
     
-    analysis = query_results[query_id].get("analysis")
+    analysis = record.get("analysis")
     if not analysis:
         return jsonify({"error": "No analysis available"}), 404
     
-    return jsonify({
+    payload = lambda: {
         "query_id": query_id,
-        "query": query_results[query_id]["query"],
+        "query": record["query"],
         "analysis": analysis
-    })
+    }
+    if record["status"] in FINAL_STATUSES:
+        return response_cache.respond(('analysis', query_id), payload)
+    return json_response(payload())
 
 @app.route('/api/history', methods=['GET'])
 def get_history():
-    """Get query history"""
-    # Return last 20 queries
-    history = sorted(
-        query_results.values(),
-        key=lambda x: x['timestamp'],
-        reverse=True
-    )[:20]
+    """Get a page of query history, newest first"""
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    
+    try:
+        rows, next_cursor = query_results.history(
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            provider=request.args.get('provider'),
+            status=request.args.get('status'),
+            prefix=request.args.get('q')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    return jsonify({"queries": history})
+    # Summary rows by default; full=1 returns the complete records for the page
+    if request.args.get('full', '').lower() in ('1', 'true'):
+        rows = [query_results.get(row['id']) or row for row in rows]
+    
+    return json_response({"queries": rows, "next_cursor": next_cursor})
 
 @app.route('/api/export/<query_id>', methods=['GET'])
 def export_results(query_id):
     """Export results for a specific query"""
-    if query_id not in query_results:
+    record = query_results.get(query_id)
+    if record is None:
         return jsonify({"error": "Query not found"}), 404
     
     format_type = request.args.get('format', 'json')
     
     if format_type == 'json':
-        return jsonify(query_results[query_id])
+        return jsonify(record)
     elif format_type == 'csv':
         # Convert to CSV format
         import csv
@@ -316,7 +752,7 @@ def export_results(query_id):
         writer.writerow(['Provider', 'Model', 'Response', 'Success'])
         
         # Write data
-        for provider, result in query_results[query_id]["results"].items():
+        for provider, result in record["results"].items():
             writer.writerow([
                 provider,
                 result.get('model', 'N/A'),
@@ -324,7 +760,6 @@ def export_results(query_id):
                 result.get('success', False)
             ])
         
-        from flask import Response
         return Response(
             output.getvalue(),
             mimetype='text/csv',
@@ -333,6 +768,94 @@ def export_results(query_id):
     else:
         return jsonify({"error": "Invalid format"}), 400
 
+@app.route('/api/export', methods=['GET', 'POST'])
+def bulk_export():
+    """Stream many queries as NDJSON or CSV, selected by time range or ids"""
+    params = dict(request.args)
+    if request.method == 'POST':
+        params.update(request.get_json(silent=True) or {})
+    
+    format_type = params.get('format', 'ndjson')
+    if format_type not in ('ndjson', 'csv'):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+    
+    columns = params.get('columns')
+    try:
+        columns = parse_columns(','.join(columns) if isinstance(columns, list) else columns)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    ids = params.get('ids')
+    if isinstance(ids, str):
+        ids = [query_id for query_id in ids.split(',') if query_id]
+    
+    if ids:
+        records = (record for record in (query_results.get(query_id) for query_id in ids) if record is not None)
+    else:
+        # Oldest first, read from the store a batch at a time
+        records = query_results.scan(since=params.get('since'), until=params.get('until'))
+    
+    if format_type == 'csv':
+        body, mimetype, extension = stream_csv(records, columns), 'text/csv', 'csv'
+    else:
+        body, mimetype, extension = stream_ndjson(records, columns), 'application/x-ndjson', 'ndjson'
+    
+    # No Content-Length, so the response goes out with chunked transfer encoding
+    filename = f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-disposition": f"attachment; filename={filename}"}
+    )
+
+@app.route('/api/share-of-voice', methods=['GET'])
+def get_share_of_voice():
+    """Get mention counts per company x provider x query"""
+    company = request.args.get('company')
+    provider = request.args.get('provider')
+    query_text = request.args.get('query')
+    
+    share_of_voice.refresh()
+    
+    if company:
+        return jsonify(share_of_voice.lookup(company, provider, query_text))
+    
+    try:
+        limit = int(request.args.get('top', 10))
+    except ValueError:
+        return jsonify({"error": "top must be an integer"}), 400
+    
+    return jsonify({
+        "responses_analyzed": share_of_voice.rows,
+        "companies": share_of_voice.top(provider, query_text, limit)
+    })
+
+@app.route('/api/trends', methods=['GET'])
+def get_trends():
+    """Get mention rate and average rank over time for one company"""
+    company = request.args.get('company')
+    if not company:
+        return jsonify({"error": "company is required"}), 400
+    
+    granularity = request.args.get('granularity', 'daily')
+    if granularity not in GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    
+    points = trend_store.trend(
+        company,
+        request.args.get('provider'),
+        granularity,
+        since=request.args.get('since'),
+        until=request.args.get('until')
+    )
+    
+    return jsonify({
+        "company": company,
+        "provider": request.args.get('provider'),
+        "granularity": granularity,
+        "points": points
+    })
+
 # WebSocket events
 @socketio.on('connect')
 def handle_connect():
@@ -352,9 +875,33 @@ def handle_join_query(data):
     if query_id:
         from flask_socketio import join_room
         room = f"query_{query_id}"
+        # Clients that can inflate zlib get large payloads compressed, in their own room
+        compress = bool(data.get('compress'))
+        join_room(f"{room}_z" if compress else room)
+        emit('joined', {'room': room, 'compress': compress})
+        
+        # Finished before this client got here (e.g. it attached to a coalesced query as it ended)
+        record = query_results.get(query_id)
+        if record is not None and record["status"] in FINAL_STATUSES:
+            replay_final(record)
+
+@socketio.on('join_batch')
+def handle_join_batch(data):
+    """Join a batch room for progress updates"""
+    batch_id = data.get('batch_id')
+    if batch_id:
+        from flask_socketio import join_room
+        room = f"batch_{batch_id}"
         join_room(room)
         emit('joined', {'room': room})
 
+@socketio.on('cancel_query')
+def handle_cancel_query(data):
+    """Cancel a query from the socket (e.g. the user navigated away or resubmitted)"""
+    query_id = data.get('query_id')
+    if query_id:
+        emit('cancel_result', {'query_id': query_id, 'status': cancel_query(query_id) or 'finished'})
+
 @socketio.on('leave_query')
 def handle_leave_query(data):
     """Leave a query room"""
@@ -363,9 +910,16 @@ def handle_leave_query(data):
         from flask_socketio import leave_room
         room = f"query_{query_id}"
         leave_room(room)
+        leave_room(f"{room}_z")
         emit('left', {'room': room})
 
 if __name__ == '__main__':
     print("Starting AISEO Backend API Server...")
     print("Server will be available at http://localhost:5555")
-    socketio.run(app, host='0.0.0.0', port=5555, debug=True, allow_unsafe_werkzeug=True)
\ No newline at end of file
+    if ASYNC_MODE == 'threading':
+        # Development server: fine for a handful of clients
+        socketio.run(app, host='0.0.0.0', port=5555, debug=True, allow_unsafe_werkzeug=True)
+    else:
+        # gevent/eventlet serve every socket and provider call from one event loop
+        print(f"[OK] Running on the {ASYNC_MODE} server")
+        socketio.run(app, host='0.0.0.0', port=5555)
\ No newline at end of file
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Batch Tracking for the AISEO Backend
+Progress counters, ETA and status for groups of queries submitted together through /api/batch
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+
+class BatchTracker:
+    """Keeps progress for recent batches.
+
+    Each batch is a list of query ids that run through the normal worker
+    pool; the backend reports every finished query here and gets back the
+    updated progress to emit. Only the newest max_batches are kept.
+    """
+
+    def __init__(self, max_batches=100):
+        self.max_batches = max_batches
+        self._lock = threading.Lock()
+        self._batches = OrderedDict()
+
+    def create(self, batch_id, query_ids, providers):
+        """Start tracking a new batch"""
+        batch = {
+            'id': batch_id,
+            'created': datetime.now().isoformat(),
+            'providers': providers,
+            'query_ids': list(query_ids),
+            'total': len(query_ids),
+            'done': 0,
+            'failed': 0,
+            'status': 'running',
+            '_started': time.time(),
+            '_ended': None,
+            '_finished': set()
+        }
+        with self._lock:
+            self._batches[batch_id] = batch
+            while len(self._batches) > self.max_batches:
+                self._batches.popitem(last=False)
+        return self._progress(batch)
+
+    def finish_query(self, batch_id, query_id, failed):
+        """Count one finished query; returns the batch progress, or None for unknown batches"""
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is None or query_id in batch['_finished']:
+                return None
+            batch['_finished'].add(query_id)
+            batch['done'] += 1
+            if failed:
+                batch['failed'] += 1
+            if batch['done'] == batch['total']:
+                batch['status'] = 'completed'
+                batch['_ended'] = time.time()
+            return self._progress(batch)
+
+    def get(self, batch_id):
+        """Progress of one batch including its query ids, or None"""
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                return None
+            return dict(self._progress(batch), query_ids=list(batch['query_ids']), providers=batch['providers'])
+
+    def _progress(self, batch):
+        """Public progress fields with an ETA from the average time per finished query so far"""
+        remaining = batch['total'] - batch['done']
+        elapsed = (batch['_ended'] or time.time()) - batch['_started']
+        if not remaining:
+            eta = 0
+        elif batch['done']:
+            eta = round(elapsed / batch['done'] * remaining, 1)
+        else:
+            eta = None
+        return {
+            'batch_id': batch['id'],
+            'created': batch['created'],
+            'status': batch['status'],
+            'total': batch['total'],
+            'done': batch['done'],
+            'failed': batch['failed'],
+            'pending': remaining,
+            'elapsed_seconds': round(elapsed, 1),
+            'eta_seconds': eta
+        }
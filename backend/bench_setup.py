@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Per-Request Setup Benchmark
+Compares building a tester and analyzer for every query with reusing the shared per-config instances
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+# Run from the backend directory or the repository root
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import FixedLLMTester, ResponseAnalyzer, config, get_services
+from trends import TrendStore
+from share_of_voice import ShareOfVoice
+
+
+def fresh_services(settings):
+    """What process_query_async used to do for every query"""
+    tester = FixedLLMTester()
+    tester.configured_providers = list(settings.configured_providers)
+    tester.api_keys = dict(settings.api_keys)
+    analyzer = ResponseAnalyzer()
+    # Every call also paid for a new API client per provider
+    if tester.has_openai and 'openai' in tester.configured_providers:
+        from openai import OpenAI
+        OpenAI(api_key=tester.api_keys['openai'])
+    # ...and opened its own trend database and share-of-voice index. The analyzer now holds the
+    # process-wide ones, so build private copies to repeat that cost without touching the shared
+    # connection every other analyzer uses.
+    if analyzer.analyze_enabled:
+        TrendStore().close()
+        ShareOfVoice(analyzer.csv_path)
+    return tester, analyzer
+
+
+def shared_services(settings):
+    """The current path: one tester/analyzer (and their clients) per config version"""
+    tester, analyzer = get_services(settings)
+    if tester.has_openai and 'openai' in tester.configured_providers:
+        from openai import OpenAI
+        tester._client('openai', lambda: OpenAI(api_key=tester.api_keys['openai']))
+    return tester, analyzer
+
+
+def measure(fn, settings, iterations):
+    """Per-call timings in milliseconds"""
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn(settings)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def describe(name, timings):
+    """One summary line for a set of timings"""
+    p95 = sorted(timings)[int(len(timings) * 0.95) - 1]
+    print(f"{name:<10} mean {statistics.mean(timings):8.3f} ms   "
+          f"median {statistics.median(timings):8.3f} ms   p95 {p95:8.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure per-query setup overhead in the backend')
+    parser.add_argument('--iterations', '-n', type=int, default=200, help='Setups to time per variant (default: 200)')
+    args = parser.parse_args()
+
+    settings = config.current()
+    print(f"Providers: {', '.join(settings.configured_providers) or 'none'}; "
+          f"analysis {'enabled' if os.getenv('ANALYZE_RESPONSES', 'false').lower() == 'true' else 'disabled'}")
+    print("-" * 60)
+
+    # Warm imports and the shared instances before timing
+    fresh_services(settings)
+    shared_services(settings)
+
+    fresh = measure(fresh_services, settings, args.iterations)
+    shared = measure(shared_services, settings, args.iterations)
+    describe('per-query', fresh)
+    describe('shared', shared)
+
+    saved = statistics.mean(fresh) - statistics.mean(shared)
+    print("-" * 60)
+    print(f"[OK] Shared instances save {saved:.3f} ms of setup per query "
+          f"({statistics.mean(fresh) / max(statistics.mean(shared), 1e-6):.0f}x faster)")
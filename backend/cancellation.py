@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Query Cancellation Tokens
+Lets a cancel request reach every part of a running query: queued jobs, slot waits and provider fan-out
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class QueryCancelled(Exception):
+    """Raised inside a query's work once it has been cancelled"""
+
+
+class CancelToken:
+    """Cancellation flag for one query.
+
+    Code doing the work checks `cancelled` between steps; code that blocks
+    can wait on `future` (it completes when the query is cancelled) or
+    register a callback with on_cancel() to be woken up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._fired = False
+        self.future = Future()
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        return self._fired
+
+    def cancel(self, reason='cancelled'):
+        """Cancel the query; returns False if it was already cancelled"""
+        with self._lock:
+            if self._fired:
+                return False
+            self._fired = True
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        self.future.set_result(reason)
+        for callback in callbacks:
+            callback()
+        return True
+
+    def on_cancel(self, callback):
+        """Call callback() when the query is cancelled (immediately if it already is).
+
+        Returns the callback, to hand to remove_callback() once the caller
+        no longer needs waking.
+        """
+        with self._lock:
+            if not self._fired:
+                self._callbacks.append(callback)
+                return callback
+        callback()
+        return callback
+
+    def remove_callback(self, callback):
+        """Forget a callback registered with on_cancel()"""
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
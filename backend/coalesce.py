@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Single-Flight Query Coalescing
+Lets identical queries submitted while one is already running share that run instead of starting another
+"""
+
+import threading
+
+
+def coalesce_key(query_text, providers):
+    """Queries match when their text differs only in case/whitespace and they ask the same providers"""
+    normalized = ' '.join(query_text.casefold().split())
+    return normalized, tuple(sorted(set(providers)))
+
+
+class SingleFlight:
+    """Tracks which query is currently running for each coalesce key.
+
+    The first submitter of a key becomes the leader and runs the query;
+    anyone submitting the same key before the leader is released is handed
+    the leader's id instead, so they watch the same Socket.IO room and read
+    the same stored result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._leaders = {}
+        self._keys = {}
+        self._followers = {}
+        self.coalesced = 0
+
+    def claim(self, key, query_id):
+        """Register query_id as the leader for key; returns the existing leader's id if there is one"""
+        with self._lock:
+            leader = self._leaders.get(key)
+            if leader is not None:
+                self._followers[leader] += 1
+                self.coalesced += 1
+                return leader
+            self._leaders[key] = query_id
+            self._keys[query_id] = key
+            self._followers[query_id] = 0
+            return None
+
+    def release(self, query_id):
+        """The leader finished (or never started) - the next identical query runs afresh"""
+        with self._lock:
+            key = self._keys.pop(query_id, None)
+            if key is not None and self._leaders.get(key) == query_id:
+                del self._leaders[key]
+            return self._followers.pop(query_id, 0)
+
+    def detach(self, query_id):
+        """One attached submitter lost interest; returns True if others still share the query"""
+        with self._lock:
+            if self._followers.get(query_id, 0) > 0:
+                self._followers[query_id] -= 1
+                return True
+            return False
+
+    def followers(self, query_id):
+        """How many later submissions were attached to this query"""
+        with self._lock:
+            return self._followers.get(query_id, 0)
+
+    def stats(self):
+        """Running leaders and total coalesced submissions"""
+        with self._lock:
+            return {'in_flight': len(self._leaders), 'coalesced': self.coalesced}
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Configuration Snapshots for the AISEO Backend
+Loads .env once into an immutable snapshot and swaps in a new one when the file changes
+"""
+
+import os
+import time
+import threading
+from types import MappingProxyType
+
+from dotenv import dotenv_values, find_dotenv
+
+
+PROVIDER_KEYS = {
+    'openai': 'OPENAI_API_KEY',
+    'anthropic': 'ANTHROPIC_API_KEY',
+    'perplexity': 'PERPLEXITY_API_KEY',
+    'google': 'GOOGLE_API_KEY',
+    'google_search': 'GOOGLE_SEARCH_API_KEY',
+    'google_cx': 'GOOGLE_SEARCH_CX',
+}
+
+TEMPLATE_PREFIXES = ('your-', 'sk-your', 'pplx-your')
+
+
+def detect_providers(api_keys):
+    """Providers whose keys are set and not left at the template values"""
+    configured = []
+    for provider, key in api_keys.items():
+        if provider in ('google_cx', 'google_search'):
+            continue
+        if key and not key.startswith(TEMPLATE_PREFIXES):
+            configured.append(provider)
+
+    # Google Search needs both the API key and the search engine ID
+    if api_keys.get('google_search') and api_keys.get('google_cx'):
+        configured.append('google_search')
+    return configured
+
+
+class ConfigSnapshot:
+    """One immutable view of the configuration.
+
+    Holds the environment as it was when the snapshot was taken, plus the
+    values derived from it, so request handlers never touch the disk or
+    re-parse keys. Anything that needs a consistent view (e.g. a whole
+    query) should take one snapshot and use it throughout.
+    """
+
+    def __init__(self, values, version):
+        self.version = version
+        self.values = MappingProxyType(dict(values))
+        self.api_keys = MappingProxyType({p: self.values.get(name) for p, name in PROVIDER_KEYS.items()})
+        self.configured_providers = tuple(detect_providers(self.api_keys))
+        self.analyze_enabled = self.get('ANALYZE_RESPONSES', 'true').lower() == 'true'
+
+    def get(self, name, default=None):
+        """Value of a setting, like os.getenv"""
+        return self.values.get(name, default)
+
+
+class ConfigWatcher:
+    """Keeps the current ConfigSnapshot in step with the .env file.
+
+    A daemon thread polls the file's mtime and size; when either changes the
+    file is parsed once, its values are applied to os.environ (matching
+    load_dotenv(override=True), so modules that read os.getenv see them too),
+    and a new snapshot replaces the old one in a single reference swap.
+    current() is therefore just an attribute read. A key removed from the
+    file is removed from os.environ again (or set back to the value the
+    process started with), so deleting an API key disables its provider.
+    Pass base_env when something may already have loaded .env into
+    os.environ before the watcher was built.
+    """
+
+    def __init__(self, env_path=None, poll_interval=None, base_env=None):
+        self.env_path = env_path or os.getenv('ENV_FILE') or find_dotenv(usecwd=True) or os.path.abspath('.env')
+        if poll_interval is None:
+            poll_interval = float(os.getenv('CONFIG_POLL_INTERVAL', 2))
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._stamp = None
+        self._snapshot = None
+        # Keys .env has set, with the value each had in the process environment before (None if unset)
+        self._overridden = {}
+        self._base_env = base_env
+        self.reload()
+
+        if self.poll_interval > 0:
+            watcher = threading.Thread(target=self._watch, name="config-watcher", daemon=True)
+            watcher.start()
+
+    def current(self):
+        """The latest snapshot"""
+        return self._snapshot
+
+    def on_reload(self, callback):
+        """Call callback(snapshot) whenever a new snapshot is installed"""
+        self._listeners.append(callback)
+
+    def reload(self):
+        """Re-read the .env file and install a new snapshot"""
+        with self._lock:
+            self._stamp = self._file_stamp()
+            values = dotenv_values(self.env_path) if self._stamp is not None else {}
+            values = {name: value for name, value in values.items() if value is not None}
+            for name in [name for name in self._overridden if name not in values]:
+                original = self._overridden.pop(name)
+                if original is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = original
+            base_env = os.environ if self._base_env is None else self._base_env
+            for name, value in values.items():
+                self._overridden.setdefault(name, base_env.get(name))
+                os.environ[name] = value
+            version = self._snapshot.version + 1 if self._snapshot else 1
+            self._snapshot = ConfigSnapshot(os.environ, version)
+            snapshot = self._snapshot
+
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"[ERROR] Config reload listener failed: {e}")
+        return snapshot
+
+    def _file_stamp(self):
+        """(mtime, size) of the .env file, or None if it does not exist"""
+        try:
+            stat = os.stat(self.env_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _watch(self):
+        """Poll the file and reload when it changes"""
+        while True:
+            time.sleep(self.poll_interval)
+            if self._file_stamp() != self._stamp:
+                snapshot = self.reload()
+                print(f"[OK] Configuration reloaded from {self.env_path} (version {snapshot.version})")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Streaming Bulk Export for the AISEO Backend
+Turns stored query records into NDJSON or CSV rows, one row per query and provider, yielded in chunks
+"""
+
+import io
+import csv
+import json
+
+
+def _analysis_field(name):
+    """Column reading one field of the provider's analysis"""
+    return lambda record, provider, result: ((record.get('analysis') or {}).get(provider) or {}).get(name)
+
+
+# Every column that can be selected, in default display order
+COLUMNS = {
+    'query_id': lambda record, provider, result: record.get('id'),
+    'timestamp': lambda record, provider, result: record.get('timestamp'),
+    'query': lambda record, provider, result: record.get('query'),
+    'status': lambda record, provider, result: record.get('status'),
+    'provider': lambda record, provider, result: provider,
+    'model': lambda record, provider, result: result.get('model'),
+    'success': lambda record, provider, result: bool(result.get('success')),
+    'response': lambda record, provider, result: result.get('response'),
+    'error': lambda record, provider, result: result.get('error'),
+    'elapsed_seconds': lambda record, provider, result: result.get('elapsed_seconds'),
+    'analysis_seconds': lambda record, provider, result: result.get('analysis_seconds'),
+    'companies_mentioned': _analysis_field('companies_mentioned'),
+    'mention_reasons': _analysis_field('mention_reasons'),
+    'authority_signals': _analysis_field('authority_signals'),
+    'key_features': _analysis_field('key_features'),
+    'sources_cited': _analysis_field('sources_cited'),
+    'ranking_factors': _analysis_field('ranking_factors'),
+    'sentiment': _analysis_field('sentiment'),
+    'optimization_insights': _analysis_field('optimization_insights'),
+}
+
+DEFAULT_COLUMNS = ('query_id', 'timestamp', 'query', 'provider', 'model', 'success', 'elapsed_seconds', 'response')
+
+# Flush to the client roughly this often so chunks are neither tiny nor unbounded
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_columns(value):
+    """Validate a comma-separated column list, raising ValueError on unknown names"""
+    if not value:
+        return list(DEFAULT_COLUMNS)
+    if value == 'all':
+        return list(COLUMNS)
+    columns = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in columns if name not in COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+    return columns
+
+
+def export_rows(record, columns):
+    """One dict per provider result of a record (a single row if it has no results yet)"""
+    results = record.get('results') or {}
+    for provider, result in (results.items() if results else [(None, {})]):
+        yield {name: COLUMNS[name](record, provider, result) for name in columns}
+
+
+def stream_ndjson(records, columns):
+    """NDJSON chunks, one JSON object per line"""
+    buffer = []
+    size = 0
+    for record in records:
+        for row in export_rows(record, columns):
+            line = json.dumps(row, default=str) + '\n'
+            buffer.append(line)
+            size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_csv(records, columns):
+    """CSV chunks starting with a header row; list and dict cells are written as JSON"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(columns)
+    for record in records:
+        for row in export_rows(record, columns):
+            writer.writerow([
+                json.dumps(value) if isinstance(value, (list, dict)) else ('' if value is None else value)
+                for value in row.values()
+            ])
+        if output.tell() >= CHUNK_SIZE:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+    if output.tell():
+        yield output.getvalue()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+HTTP Response Caching for the AISEO Backend
+Serializes JSON once, serves it gzip/brotli-compressed with strong ETags, and answers repeat polls with 304
+"""
+
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 512
+
+
+def dumps(payload):
+    """JSON bytes for a payload, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=str, separators=(',', ':')).encode('utf-8')
+
+
+def _compress(body, encoding):
+    """Body in the given content encoding"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def _pick_encoding(body):
+    """Best encoding the client accepts for this body, or None to send it as is"""
+    if len(body) < MIN_COMPRESS_SIZE:
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+class CachedBody:
+    """One serialized payload with its ETag and lazily built compressed variants"""
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self._encoded = {}
+
+    def encoded(self, encoding):
+        """The body in an encoding, compressed only once"""
+        if encoding is None:
+            return self.body
+        if encoding not in self._encoded:
+            self._encoded[encoding] = _compress(self.body, encoding)
+        return self._encoded[encoding]
+
+    def size(self):
+        """Bytes held, counting every compressed variant"""
+        return len(self.body) + sum(len(data) for data in self._encoded.values())
+
+
+class ResponseCache:
+    """LRU of serialized responses for payloads that no longer change.
+
+    Completed query records are immutable, so their JSON (and its gzip or
+    brotli form) is built on the first request and reused for every later
+    poll. Bounded by total bytes, including the compressed copies.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key, build):
+        """Cached body for key, serializing build() on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        cached = CachedBody(dumps(build()))
+        self._store(key, cached)
+        return cached
+
+    def _store(self, key, cached):
+        """Insert (or re-account after compression) and evict down to the byte budget"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            size = cached.size()
+            self._entries[key] = (cached, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def respond(self, key, build):
+        """Response for a cacheable payload"""
+        cached = self.get_or_build(key, build)
+        size = cached.size()
+        response = _respond(cached, _pick_encoding(cached.body))
+        if cached.size() != size:
+            # A new compressed variant was added - update the byte accounting
+            self._store(key, cached)
+        return response
+
+    def stats(self):
+        """Cache size and hit counts"""
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+def _respond(cached, encoding):
+    """304 if the client already has this body, otherwise the (possibly compressed) body"""
+    # Each content encoding is its own representation, so it gets its own strong ETag
+    etag = f"{cached.etag}-{encoding}" if encoding else cached.etag
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(cached.encoded(encoding), mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Clients may keep the body but must revalidate it on every poll
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def json_response(payload):
+    """Uncached JSON response that still gets an ETag, compression and 304 handling"""
+    cached = CachedBody(dumps(payload))
+    return _respond(cached, _pick_encoding(cached.body))
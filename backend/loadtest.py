@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Socket.IO Connection Load Test
+Opens many concurrent WebSocket clients against the backend and reports how many it holds and how fast it answers
+"""
+
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+
+try:
+    import socketio
+except ImportError:
+    print("[ERROR] python-socketio not installed. Install with: pip install \"python-socketio[asyncio_client]\"")
+    sys.exit(1)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))]
+
+
+class LoadClient:
+    """One simulated dashboard: connects, joins a query room and then sits idle"""
+
+    def __init__(self, url):
+        self.url = url
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.connected = asyncio.Event()
+        self.joined = asyncio.Event()
+        self.dropped = False
+
+        self.sio.on('connected', self._on_connected)
+        self.sio.on('joined', self._on_joined)
+        self.sio.on('disconnect', self._on_disconnect)
+
+    async def _on_connected(self, data):
+        self.connected.set()
+
+    async def _on_joined(self, data):
+        self.joined.set()
+
+    async def _on_disconnect(self, *args):
+        self.dropped = True
+
+    async def connect(self, timeout):
+        """Connect over WebSocket and wait for the server greeting; returns seconds taken"""
+        started = time.perf_counter()
+        await self.sio.connect(self.url, transports=['websocket'], wait_timeout=timeout)
+        await asyncio.wait_for(self.connected.wait(), timeout)
+        return time.perf_counter() - started
+
+    async def round_trip(self, timeout):
+        """Join a room and wait for the acknowledgement; returns seconds taken"""
+        self.joined.clear()
+        started = time.perf_counter()
+        await self.sio.emit('join_query', {'query_id': str(uuid.uuid4())})
+        await asyncio.wait_for(self.joined.wait(), timeout)
+        return time.perf_counter() - started
+
+    async def close(self):
+        if self.sio.connected:
+            await self.sio.disconnect()
+
+
+async def run_load_test(url, connections, ramp, hold, timeout):
+    """Ramp up connections, hold them open, then measure responsiveness with all of them idle"""
+    clients = [LoadClient(url) for _ in range(connections)]
+    connect_times, failures = [], []
+
+    async def open_one(client, delay):
+        await asyncio.sleep(delay)
+        try:
+            connect_times.append(await client.connect(timeout))
+        except Exception as e:
+            failures.append(str(e) or type(e).__name__)
+
+    print(f"Opening {connections} connections to {url} at {ramp}/s...")
+    started = time.perf_counter()
+    await asyncio.gather(*(open_one(client, i / ramp) for i, client in enumerate(clients)))
+    ramp_seconds = time.perf_counter() - started
+
+    live = [client for client in clients if client.sio.connected]
+    print(f"[OK] {len(live)}/{connections} connected in {ramp_seconds:.1f}s; holding for {hold}s...")
+    await asyncio.sleep(hold)
+
+    held = [client for client in live if client.sio.connected and not client.dropped]
+
+    # Every idle client asks for a room at once - a blocked event loop shows up here
+    async def ping(client):
+        try:
+            return await client.round_trip(timeout)
+        except Exception:
+            return None
+
+    round_trips = [t for t in await asyncio.gather(*(ping(client) for client in held)) if t is not None]
+
+    await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+
+    print("\n" + "=" * 60)
+    print("LOAD TEST RESULTS")
+    print("=" * 60)
+    print(f"Connections requested: {connections}")
+    print(f"Connected:             {len(connect_times)}")
+    print(f"Failed to connect:     {len(failures)}")
+    print(f"Still open after hold: {len(held)}")
+    print(f"Answered round trip:   {len(round_trips)}")
+    if connect_times:
+        print(f"Connect time:          median {statistics.median(connect_times) * 1000:.0f} ms, "
+              f"p95 {percentile(connect_times, 0.95) * 1000:.0f} ms")
+    if round_trips:
+        print(f"Round trip under load: median {statistics.median(round_trips) * 1000:.0f} ms, "
+              f"p95 {percentile(round_trips, 0.95) * 1000:.0f} ms")
+    if failures:
+        print(f"First failure:         {failures[0]}")
+
+    return len(held) == connections and len(round_trips) == len(held)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Concurrent Socket.IO connection load test for the backend')
+    parser.add_argument('--url', type=str, default='http://localhost:5555', help='Backend URL (default: http://localhost:5555)')
+    parser.add_argument('--connections', '-c', type=int, default=1000, help='Concurrent clients to open (default: 1000)')
+    parser.add_argument('--ramp', type=float, default=200, help='New connections per second (default: 200)')
+    parser.add_argument('--hold', type=float, default=30, help='Seconds to keep every connection open (default: 30)')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-operation timeout in seconds (default: 30)')
+    args = parser.parse_args()
+
+    ok = asyncio.run(run_load_test(args.url, args.connections, args.ramp, args.hold, args.timeout))
+    sys.exit(0 if ok else 1)
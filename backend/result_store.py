@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Query Result Stores for the AISEO Backend
+Bounded in-memory LRU/TTL cache with an optional SQLite store for older entries
+"""
+
+import os
+import json
+import time
+import base64
+import bisect
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+# Records in these states are still being written to by a worker and must not be evicted
+IN_FLIGHT_STATUSES = ('queued', 'processing')
+
+
+def record_size(record):
+    """Approximate memory footprint of a record: its JSON size in bytes"""
+    return len(json.dumps(record, default=str))
+
+
+def summarize(record):
+    """Small history row for a record, without response or analysis bodies"""
+    results = record.get('results') or {}
+    return {
+        'id': record.get('id'),
+        'query': record.get('query', ''),
+        'timestamp': record.get('timestamp', ''),
+        'status': record.get('status'),
+        'providers': record.get('providers') or list(results),
+        'successful': sum(1 for r in results.values() if r.get('success')),
+        'failed': sum(1 for r in results.values() if 'error' in r),
+        'analyzed': bool(record.get('analysis'))
+    }
+
+
+def encode_cursor(summary):
+    """Opaque cursor pointing just after a history row"""
+    raw = f"{summary['timestamp']}|{summary['id']}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Turn a cursor back into its (timestamp, id) key, raising ValueError if it is malformed"""
+    try:
+        timestamp, query_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|', 1)
+    except Exception:
+        raise ValueError("Invalid history cursor")
+    return timestamp, query_id
+
+
+def matches(summary, provider=None, status=None, prefix=None):
+    """True if a history row passes every given filter"""
+    if provider and provider not in summary['providers']:
+        return False
+    if status and summary['status'] != status:
+        return False
+    if prefix and not summary['query'].lower().startswith(prefix.lower()):
+        return False
+    return True
+
+
+class HistoryIndex:
+    """Time-ordered index of history rows, maintained on every insert.
+
+    Keys are kept sorted as (timestamp, id); since queries arrive in time
+    order an insert is normally an append. Paging walks backwards from a
+    cursor, so a page costs O(log n + rows scanned) instead of a full sort.
+    Removed rows are dropped from the key list lazily.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._indexed = set()
+        self._rows = {}
+        self._dead = 0
+
+    def upsert(self, summary):
+        """Add a row or refresh an existing one (e.g. after a status change)"""
+        key = (summary['timestamp'], summary['id'])
+        if key not in self._indexed:
+            if not self._keys or key >= self._keys[-1]:
+                self._keys.append(key)
+            else:
+                bisect.insort(self._keys, key)
+            self._indexed.add(key)
+        self._rows[summary['id']] = summary
+
+    def remove(self, query_id):
+        """Forget a row"""
+        if self._rows.pop(query_id, None) is not None:
+            self._dead += 1
+            if self._dead > len(self._rows):
+                self._keys = [key for key in self._keys if key[1] in self._rows]
+                self._indexed = set(self._keys)
+                self._dead = 0
+
+    def page(self, limit=20, cursor=None, provider=None, status=None, prefix=None):
+        """Newest-first rows after the cursor, plus the cursor for the next page"""
+        position = len(self._keys)
+        if cursor:
+            position = bisect.bisect_left(self._keys, decode_cursor(cursor))
+
+        rows = []
+        while position > 0 and len(rows) < limit:
+            position -= 1
+            summary = self._rows.get(self._keys[position][1])
+            if summary is None or summary['timestamp'] != self._keys[position][0]:
+                continue
+            if matches(summary, provider, status, prefix):
+                rows.append(summary)
+
+        has_more = position > 0 and len(rows) == limit
+        return rows, (encode_cursor(rows[-1]) if has_more else None)
+
+    def keys_between(self, since=None, until=None, after=None, limit=500):
+        """(timestamp, id) keys with since <= timestamp < until in time order, starting after the given key"""
+        start = bisect.bisect_left(self._keys, (since, '')) if since else 0
+        if after:
+            start = max(start, bisect.bisect_right(self._keys, after))
+
+        keys = []
+        for position in range(start, len(self._keys)):
+            key = self._keys[position]
+            if until and key[0] >= until:
+                break
+            summary = self._rows.get(key[1])
+            if summary is not None and summary['timestamp'] == key[0]:
+                keys.append(key)
+                if len(keys) == limit:
+                    break
+        return keys
+
+
+def _escape_like(text):
+    """Escape LIKE wildcards in user input"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class SQLiteResultStore:
+    """Durable result store keeping every record in a SQLite table"""
+
+    def __init__(self, path='query_results.db'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'id TEXT PRIMARY KEY, timestamp TEXT NOT NULL, status TEXT, record TEXT NOT NULL, '
+            'query_lower TEXT NOT NULL, summary TEXT NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS results_history ON results (timestamp, id)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS results_status_history ON results (status, timestamp, id)')
+        # One row per (record, provider), so a provider filter seeks instead of scanning every record
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS result_providers ('
+            'provider TEXT NOT NULL, timestamp TEXT NOT NULL, id TEXT NOT NULL, '
+            'PRIMARY KEY (provider, timestamp, id)) WITHOUT ROWID'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS result_providers_id ON result_providers (id)')
+        self.conn.commit()
+
+    def put(self, query_id, record):
+        """Insert or replace a record"""
+        summary = summarize(record)
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO results (id, timestamp, status, record, query_lower, summary) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (query_id, summary['timestamp'], summary['status'], json.dumps(record, default=str),
+                 summary['query'].lower(), json.dumps(summary))
+            )
+            self.conn.execute('DELETE FROM result_providers WHERE id = ?', (query_id,))
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO result_providers (provider, timestamp, id) VALUES (?, ?, ?)',
+                [(provider, summary['timestamp'], query_id) for provider in summary['providers']]
+            )
+
+    def get(self, query_id):
+        """Fetch a record, or None"""
+        with self.lock:
+            row = self.conn.execute('SELECT record FROM results WHERE id = ?', (query_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, query_id):
+        """Remove a record if present"""
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM results WHERE id = ?', (query_id,))
+            self.conn.execute('DELETE FROM result_providers WHERE id = ?', (query_id,))
+
+    def __contains__(self, query_id):
+        with self.lock:
+            return self.conn.execute('SELECT 1 FROM results WHERE id = ?', (query_id,)).fetchone() is not None
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def history(self, limit=20, cursor=None, provider=None, status=None, prefix=None):
+        """Newest-first summary rows after the cursor, using the (timestamp, id) indexes"""
+        # With a provider filter the walk runs down that provider's (provider, timestamp, id) keys
+        keys = 'p' if provider else 'r'
+        clauses, params = [], []
+        if provider:
+            clauses.append('p.provider = ?')
+            params.append(provider)
+        if cursor:
+            timestamp, query_id = decode_cursor(cursor)
+            clauses.append(f'({keys}.timestamp < ? OR ({keys}.timestamp = ? AND {keys}.id < ?))')
+            params += [timestamp, timestamp, query_id]
+        if status:
+            clauses.append('r.status = ?')
+            params.append(status)
+        if prefix:
+            clauses.append("r.query_lower LIKE ? ESCAPE '\\'")
+            params.append(_escape_like(prefix.lower()) + '%')
+
+        sql = 'SELECT r.summary FROM '
+        sql += 'result_providers p JOIN results r ON r.id = p.id' if provider else 'results r'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += f' ORDER BY {keys}.timestamp DESC, {keys}.id DESC LIMIT ?'
+        params.append(limit + 1)
+
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+
+        summaries = [json.loads(row[0]) for row in rows]
+        has_more = len(summaries) > limit
+        summaries = summaries[:limit]
+        return summaries, (encode_cursor(summaries[-1]) if has_more else None)
+
+    def scan(self, since=None, until=None, batch_size=500):
+        """Yield records with since <= timestamp < until, oldest first, a batch of rows at a time"""
+        last = ('', '')
+        while True:
+            clauses = ['(timestamp > ? OR (timestamp = ? AND id > ?))']
+            params = [last[0], last[0], last[1]]
+            if since:
+                clauses.append('timestamp >= ?')
+                params.append(since)
+            if until:
+                clauses.append('timestamp < ?')
+                params.append(until)
+            params.append(batch_size)
+
+            with self.lock:
+                rows = self.conn.execute(
+                    'SELECT timestamp, id, record FROM results WHERE ' + ' AND '.join(clauses) +
+                    ' ORDER BY timestamp, id LIMIT ?', params
+                ).fetchall()
+
+            for timestamp, query_id, record in rows:
+                yield json.loads(record)
+            if len(rows) < batch_size:
+                return
+            last = (rows[-1][0], rows[-1][1])
+
+    def stats(self):
+        """Store size information"""
+        return {'backend': 'sqlite', 'path': self.path, 'entries': len(self)}
+
+
+class MemoryResultStore:
+    """In-memory result store with entry, byte and age limits.
+
+    Entries are evicted least-recently-used first once max_entries or
+    max_bytes is exceeded, and expire ttl seconds after they were last
+    written. Records that are still queued or processing are never
+    evicted. With a backing store every put() is written through to it,
+    so evicted or expired records are still served from there and the
+    memory tier acts as a cache of the hottest results.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=256 * 1024 * 1024, ttl=None, backing=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.backing = backing
+
+        self.lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._last_expiry_scan = 0.0
+        self.evictions = 0
+        # Without a backing store, history pages come from this index
+        self._history = HistoryIndex() if backing is None else None
+
+    def put(self, query_id, record):
+        """Store (or re-store after changes) a record and enforce the limits"""
+        size = record_size(record)
+        with self.lock:
+            self._remove_locked(query_id)
+            self._entries[query_id] = (record, size, time.time())
+            self._bytes += size
+            if self._history is not None:
+                self._history.upsert(summarize(record))
+            self._evict_locked()
+        if self.backing is not None:
+            self.backing.put(query_id, record)
+
+    def get(self, query_id):
+        """Fetch a record from memory, falling back to the backing store"""
+        with self.lock:
+            entry = self._entries.get(query_id)
+            if entry is not None:
+                if self._expired(entry):
+                    self._remove_locked(query_id)
+                else:
+                    self._entries.move_to_end(query_id)
+                    return entry[0]
+
+        if self.backing is None:
+            return None
+        record = self.backing.get(query_id)
+        if record is not None:
+            # Promote back into memory without rewriting the backing copy
+            size = record_size(record)
+            with self.lock:
+                self._remove_locked(query_id)
+                self._entries[query_id] = (record, size, time.time())
+                self._bytes += size
+                self._evict_locked()
+        return record
+
+    def delete(self, query_id):
+        """Remove a record from every tier"""
+        with self.lock:
+            self._remove_locked(query_id)
+        if self.backing is not None:
+            self.backing.delete(query_id)
+
+    def __contains__(self, query_id):
+        return self.get(query_id) is not None
+
+    def __len__(self):
+        if self.backing is not None:
+            return len(self.backing)
+        with self.lock:
+            return len(self._entries)
+
+    def history(self, limit=20, cursor=None, provider=None, status=None, prefix=None):
+        """One page of newest-first summary rows, plus the cursor for the next page"""
+        if self.backing is not None:
+            # Every put is written through, so the backing store's summaries are current
+            return self.backing.history(limit, cursor, provider, status, prefix)
+
+        with self.lock:
+            self._evict_locked()
+            return self._history.page(limit, cursor, provider, status, prefix)
+
+    def scan(self, since=None, until=None, batch_size=500):
+        """Yield records with since <= timestamp < until, oldest first, without holding the lock between batches"""
+        if self.backing is not None:
+            yield from self.backing.scan(since, until, batch_size)
+            return
+
+        after = None
+        while True:
+            with self.lock:
+                keys = self._history.keys_between(since, until, after, batch_size)
+                records = [self._entries[key[1]][0] for key in keys if key[1] in self._entries]
+            yield from records
+            if len(keys) < batch_size:
+                return
+            after = keys[-1]
+
+    def stats(self):
+        """Store size information"""
+        with self.lock:
+            stats = {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'evictions': self.evictions
+            }
+        if self.backing is not None:
+            stats['backing'] = self.backing.stats()
+        return stats
+
+    def _expired(self, entry):
+        """True if an entry outlived the TTL (in-flight records never expire)"""
+        record, _, stored_at = entry
+        if not self.ttl or record.get('status') in IN_FLIGHT_STATUSES:
+            return False
+        return time.time() - stored_at > self.ttl
+
+    def _remove_locked(self, query_id):
+        """Drop one entry and its byte accounting"""
+        entry = self._entries.pop(query_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+            if self._history is not None:
+                self._history.remove(query_id)
+
+    def _evict_locked(self):
+        """Evict expired, then least-recently-used, entries until within limits"""
+        # Expiry needs a full scan, so do it at most once a second
+        if self.ttl and time.time() - self._last_expiry_scan >= 1:
+            for query_id in [qid for qid, entry in self._entries.items() if self._expired(entry)]:
+                self._remove_locked(query_id)
+                self.evictions += 1
+            self._last_expiry_scan = time.time()
+
+        if len(self._entries) <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+        for query_id in list(self._entries):
+            if len(self._entries) <= self.max_entries and self._bytes <= self.max_bytes:
+                break
+            if self._entries[query_id][0].get('status') in IN_FLIGHT_STATUSES:
+                continue
+            self._remove_locked(query_id)
+            self.evictions += 1
+
+
+def create_result_store():
+    """Build the result store configured by the RESULT_STORE_* environment variables"""
+    backing = None
+    if os.getenv('RESULT_STORE', 'memory').lower() == 'sqlite':
+        backing = SQLiteResultStore(os.getenv('RESULT_STORE_PATH', 'query_results.db'))
+
+    ttl = int(os.getenv('RESULT_STORE_TTL', 0))
+    return MemoryResultStore(
+        max_entries=int(os.getenv('RESULT_STORE_MAX_ENTRIES', 1000)),
+        max_bytes=int(float(os.getenv('RESULT_STORE_MAX_MB', 256)) * 1024 * 1024),
+        ttl=ttl or None,
+        backing=backing
+    )
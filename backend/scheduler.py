@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Priority Scheduler for Provider Calls
+Weighted fair queuing of interactive, batch and analysis work onto per-provider concurrency slots
+"""
+
+import os
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+
+from cancellation import QueryCancelled
+
+
+DEFAULT_WEIGHTS = {'interactive': 8, 'analysis': 2, 'batch': 1}
+
+
+def parse_weights(value):
+    """Weights from a "class=weight,..." string, e.g. "interactive=8,batch=1" """
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in (value or '').split(','):
+        if '=' in part:
+            name, weight = part.split('=', 1)
+            weights[name.strip()] = max(float(weight), 0.01)
+    return weights
+
+
+class _Waiter:
+    """A call waiting for a slot"""
+
+    def __init__(self, priority, start_tag, finish_tag):
+        self.priority = priority
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.granted = False
+
+
+class _ProviderQueue:
+    """Slots and waiting calls for one provider"""
+
+    def __init__(self):
+        self.in_use = 0
+        self.waiting = []
+        self.virtual_time = 0.0
+        self.last_finish = {}
+
+
+class FairScheduler:
+    """Shares each provider's concurrency between priority classes.
+
+    Every provider has a number of slots (the calls allowed in flight at
+    once). When all are busy, callers queue with a start-time fair queuing
+    tag: a class with weight w advances its virtual clock by 1/w per call,
+    and a freed slot goes to the waiter with the smallest tag. A steady
+    stream of batch calls therefore cannot starve an interactive call; with
+    the default weights interactive work gets 8 slots for every batch one
+    whenever both are waiting. Idle capacity is never held back.
+    """
+
+    def __init__(self, slots=None, weights=None, limit_for=None):
+        self.slots = slots or int(os.getenv('PROVIDER_CONCURRENCY', 4))
+        self.weights = weights or parse_weights(os.getenv('SCHEDULER_WEIGHTS'))
+        # Per-provider limits default to PROVIDER_CONCURRENCY_<PROVIDER>, then the shared default
+        self.limit_for = limit_for or self._static_limit
+
+        # Re-entrant: a cancel token registered while we hold the lock may call _notify() right away
+        self._lock = threading.RLock()
+        self._cond = threading.Condition(self._lock)
+        self._queues = {}
+        self._sequence = itertools.count()
+        self._wait_stats = {name: [0, 0.0] for name in self.weights}
+        self._static_limits = {}
+
+    def _static_limit(self, provider):
+        """Configured slot count for a provider"""
+        limit = self._static_limits.get(provider)
+        if limit is None:
+            limit = self._static_limits[provider] = int(os.getenv(f'PROVIDER_CONCURRENCY_{provider.upper()}', self.slots))
+        return limit
+
+    @contextmanager
+    def slot(self, provider, priority='interactive', cancel=None):
+        """Hold one of the provider's slots for the duration of the block"""
+        self.acquire(provider, priority, cancel)
+        try:
+            yield
+        finally:
+            self.release(provider)
+
+    def acquire(self, provider, priority='interactive', cancel=None):
+        """Wait for a slot on the provider; raises QueryCancelled if the cancel token fires first"""
+        weight = self.weights.get(priority, 1)
+        with self._cond:
+            if cancel is not None and cancel.cancelled:
+                raise QueryCancelled()
+            queue = self._queues.setdefault(provider, _ProviderQueue())
+            started = time.time()
+
+            if not queue.waiting and queue.in_use < self.limit_for(provider):
+                queue.in_use += 1
+                self._record_wait(priority, 0.0)
+                return
+
+            start_tag = max(queue.virtual_time, queue.last_finish.get(priority, 0.0))
+            finish_tag = start_tag + 1.0 / weight
+            queue.last_finish[priority] = finish_tag
+            waiter = _Waiter(priority, start_tag, finish_tag)
+            heapq.heappush(queue.waiting, (start_tag, next(self._sequence), waiter))
+
+            # Only a caller that actually waits needs waking on cancel, and only while it waits
+            woken = cancel.on_cancel(self._notify) if cancel is not None else None
+            try:
+                while not waiter.granted:
+                    if cancel is not None and cancel.cancelled:
+                        # Give up our place in line
+                        queue.waiting = [entry for entry in queue.waiting if entry[2] is not waiter]
+                        heapq.heapify(queue.waiting)
+                        raise QueryCancelled()
+                    self._cond.wait()
+            finally:
+                if woken is not None:
+                    cancel.remove_callback(woken)
+            self._record_wait(priority, time.time() - started)
+
+    def release(self, provider):
+        """Give a slot back, handing it straight to the next waiter by fair-queuing order"""
+        with self._cond:
+            queue = self._queues[provider]
+            queue.in_use -= 1
+            self._dispatch(provider, queue)
+
+    def _dispatch(self, provider, queue):
+        """Grant free slots to waiters, smallest start tag first"""
+        granted = False
+        while queue.waiting and queue.in_use < self.limit_for(provider):
+            start_tag, _, waiter = heapq.heappop(queue.waiting)
+            queue.virtual_time = start_tag
+            queue.in_use += 1
+            waiter.granted = True
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _notify(self):
+        """Wake every waiter so cancelled ones can leave"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def wake(self, provider=None):
+        """Re-check waiters after a limit changed"""
+        with self._cond:
+            for name, queue in self._queues.items():
+                if provider is None or name == provider:
+                    self._dispatch(name, queue)
+
+    def _record_wait(self, priority, seconds):
+        """Count a wait for the per-class statistics"""
+        stats = self._wait_stats.setdefault(priority, [0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+
+    def stats(self):
+        """Slots in use and waiting calls per provider, plus average wait per class"""
+        with self._lock:
+            providers = {}
+            for name, queue in self._queues.items():
+                waiting = {}
+                for _, _, waiter in queue.waiting:
+                    waiting[waiter.priority] = waiting.get(waiter.priority, 0) + 1
+                providers[name] = {'limit': self.limit_for(name), 'in_use': queue.in_use, 'waiting': waiting}
+            classes = {
+                name: {'weight': self.weights.get(name, 1), 'calls': count,
+                       'avg_wait_seconds': round(total / count, 3) if count else 0.0}
+                for name, (count, total) in self._wait_stats.items()
+            }
+        return {'providers': providers, 'classes': classes}
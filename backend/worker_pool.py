@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Bounded Worker Pool for the AISEO Backend
+Fixed number of worker threads behind a bounded queue, with queue positions for status reporting
+"""
+
+import math
+import time
+import queue
+import threading
+from collections import OrderedDict
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Query queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class QueryWorkerPool:
+    """Runs submitted jobs on a fixed set of worker threads.
+
+    At most max_queue jobs may wait; submit() raises QueueFull beyond that so
+    the caller can push back (HTTP 429) instead of spawning more threads.
+    Waiting jobs keep their submission order, which is what position()
+    reports back to clients.
+    """
+
+    def __init__(self, max_workers=4, max_queue=32, name='query-worker'):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+
+        self._jobs = queue.Queue()
+        self._pending = OrderedDict()
+        self._running = set()
+        self._cancelled = set()
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)
+
+        # Moving average of job duration, used to estimate Retry-After
+        self._avg_runtime = 10.0
+
+        for i in range(max_workers):
+            worker = threading.Thread(target=self._work, name=f"{name}-{i + 1}", daemon=True)
+            worker.start()
+
+    def submit(self, job_id, fn, *args, **kwargs):
+        """Queue a job, or raise QueueFull if too many are already waiting"""
+        with self._lock:
+            if len(self._pending) >= self.max_queue:
+                raise QueueFull(self._retry_after_locked())
+            self._pending[job_id] = time.time()
+        self._jobs.put((job_id, fn, args, kwargs))
+        return self.position(job_id)
+
+    def submit_blocking(self, job_id, fn, *args, **kwargs):
+        """Queue a job, waiting for room in the queue instead of raising QueueFull"""
+        with self._space:
+            while len(self._pending) >= self.max_queue:
+                self._space.wait()
+            self._pending[job_id] = time.time()
+        self._jobs.put((job_id, fn, args, kwargs))
+        return self.position(job_id)
+
+    def position(self, job_id):
+        """1-based position of a waiting job, 0 if it is running, None if unknown or finished"""
+        with self._lock:
+            if job_id in self._running:
+                return 0
+            for index, pending_id in enumerate(self._pending):
+                if pending_id == job_id:
+                    return index + 1
+        return None
+
+    def cancel(self, job_id):
+        """Drop a job that is still waiting; returns False if it already started or is unknown"""
+        with self._lock:
+            if self._pending.pop(job_id, None) is None:
+                return False
+            self._cancelled.add(job_id)
+            self._space.notify_all()
+            return True
+
+    def depth(self):
+        """Number of jobs waiting for a worker"""
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self):
+        """Snapshot of pool utilisation"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'running': len(self._running),
+                'queued': len(self._pending),
+                'queue_capacity': self.max_queue,
+                'avg_runtime_seconds': round(self._avg_runtime, 2)
+            }
+
+    def retry_after(self):
+        """Seconds a rejected client should wait before trying again"""
+        with self._lock:
+            return self._retry_after_locked()
+
+    def _retry_after_locked(self):
+        """Time for one worker slot to free up, given the queue ahead"""
+        waves = (len(self._pending) + 1) / max(self.max_workers, 1)
+        return max(1, math.ceil(self._avg_runtime * waves))
+
+    def _work(self):
+        """Worker loop: run jobs in submission order"""
+        while True:
+            job_id, fn, args, kwargs = self._jobs.get()
+            with self._lock:
+                if job_id in self._cancelled:
+                    self._cancelled.discard(job_id)
+                    self._jobs.task_done()
+                    continue
+                self._pending.pop(job_id, None)
+                self._running.add(job_id)
+                self._space.notify_all()
+
+            started = time.time()
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                print(f"[ERROR] Worker job {job_id} failed: {e}")
+            finally:
+                elapsed = time.time() - started
+                with self._lock:
+                    self._running.discard(job_id)
+                    self._avg_runtime = 0.8 * self._avg_runtime + 0.2 * elapsed
+                self._jobs.task_done()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Offline Bulk Mode via Provider Batch APIs
+Submits questions and analysis prompts as OpenAI Batch / Anthropic Message Batches jobs and collects the answers
+"""
+
+import os
+import json
+import time
+import hashlib
+
+import requests
+
+
+# Providers with an asynchronous batch API; everything else is queried directly
+BATCH_PROVIDERS = ('openai', 'anthropic')
+
+# Job states that will not change any more
+OPENAI_FINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+
+def bulk_state_path_for(questions_file, directory='results'):
+    """Where the job ids of a bulk run are kept so a stopped run can resume polling"""
+    name = os.path.splitext(os.path.basename(questions_file))[0] or 'questions'
+    return os.path.join(directory, f"bulk_{name}.json")
+
+
+class BulkStateMismatch(Exception):
+    """Raised when resuming bulk jobs that were submitted for a different question list"""
+
+
+def questions_fingerprint(queries):
+    """Hash of the question list, so a resumed run only re-attaches to jobs built from the same questions"""
+    return hashlib.sha256(json.dumps(list(queries)).encode('utf-8')).hexdigest()
+
+
+def question_request(provider, prompt):
+    """Request body for one question, with the same models and limits as the interactive calls"""
+    max_tokens = int(os.getenv('MAX_TOKENS', 1000))
+    if provider == 'openai':
+        return {
+            'model': os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
+            'messages': [{"role": "user", "content": prompt}],
+            'max_tokens': max_tokens,
+            'temperature': 0.7
+        }
+    return {
+        'model': os.getenv('ANTHROPIC_MODEL', 'claude-3-5-sonnet-20241022'),
+        'max_tokens': max_tokens,
+        'messages': [{"role": "user", "content": prompt}]
+    }
+
+
+class OpenAIBatch:
+    """OpenAI Batch API: upload a JSONL file of chat completion requests, poll the batch, download the output"""
+
+    def __init__(self, api_key, base_url=None, session=None):
+        self.base_url = (base_url or os.getenv('OPENAI_BASE_URL') or 'https://api.openai.com/v1').rstrip('/')
+        self.session = session or requests.Session()
+        self.session.headers['Authorization'] = f"Bearer {api_key}"
+        self.timeout = int(os.getenv('REQUEST_TIMEOUT', 30))
+
+    def _request(self, method, path, **kwargs):
+        response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def submit(self, items):
+        """Start a batch of (custom_id, body) chat completion requests; returns the batch id"""
+        lines = [
+            json.dumps({'custom_id': custom_id, 'method': 'POST', 'url': '/v1/chat/completions', 'body': body})
+            for custom_id, body in items
+        ]
+        upload = self._request('POST', '/files', data={'purpose': 'batch'},
+                               files={'file': ('batch.jsonl', '\n'.join(lines).encode('utf-8'), 'application/jsonl')})
+        batch = self._request('POST', '/batches', json={
+            'input_file_id': upload.json()['id'],
+            'endpoint': '/v1/chat/completions',
+            'completion_window': '24h'
+        })
+        return batch.json()['id']
+
+    def poll(self, job_id):
+        """(finished, progress text) for a batch"""
+        batch = self._request('GET', f"/batches/{job_id}").json()
+        counts = batch.get('request_counts') or {}
+        progress = f"{batch['status']} ({counts.get('completed', 0)}/{counts.get('total', '?')} done)"
+        return batch['status'] in OPENAI_FINAL_STATUSES, progress
+
+    def results(self, job_id):
+        """{custom_id: {'text', 'model'} or {'error'}} for every request that produced an outcome"""
+        batch = self._request('GET', f"/batches/{job_id}").json()
+        outcomes = {}
+        for file_id in (batch.get('output_file_id'), batch.get('error_file_id')):
+            if not file_id:
+                continue
+            for line in self._request('GET', f"/files/{file_id}/content").text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get('response') or {}
+                body = response.get('body') or {}
+                if entry.get('error') or response.get('status_code') != 200:
+                    error = entry.get('error') or body.get('error') or {}
+                    outcomes[entry['custom_id']] = {'error': error.get('message') or str(error) or 'Request failed'}
+                else:
+                    outcomes[entry['custom_id']] = {
+                        'text': body['choices'][0]['message']['content'],
+                        'model': body.get('model'),
+                        'usage': body.get('usage')
+                    }
+        if batch['status'] == 'failed' and not outcomes:
+            errors = (batch.get('errors') or {}).get('data') or []
+            print(f"[ERROR] OpenAI batch {job_id} failed: {'; '.join(e.get('message', '') for e in errors) or 'no details'}")
+        return outcomes
+
+
+class AnthropicBatch:
+    """Anthropic Message Batches API: submit message requests in one call, poll, stream the results"""
+
+    def __init__(self, api_key, base_url=None, session=None):
+        self.base_url = (base_url or os.getenv('ANTHROPIC_BASE_URL') or 'https://api.anthropic.com').rstrip('/')
+        self.session = session or requests.Session()
+        self.session.headers.update({'x-api-key': api_key, 'anthropic-version': '2023-06-01'})
+        self.timeout = int(os.getenv('REQUEST_TIMEOUT', 30))
+
+    def _request(self, method, path, **kwargs):
+        response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def submit(self, items):
+        """Start a batch of (custom_id, params) message requests; returns the batch id"""
+        batch = self._request('POST', '/v1/messages/batches', json={
+            'requests': [{'custom_id': custom_id, 'params': params} for custom_id, params in items]
+        })
+        return batch.json()['id']
+
+    def poll(self, job_id):
+        """(finished, progress text) for a batch"""
+        batch = self._request('GET', f"/v1/messages/batches/{job_id}").json()
+        counts = batch.get('request_counts') or {}
+        done = sum(counts.get(key, 0) for key in ('succeeded', 'errored', 'canceled', 'expired'))
+        progress = f"{batch['processing_status']} ({done}/{done + counts.get('processing', 0)} done)"
+        return batch['processing_status'] == 'ended', progress
+
+    def results(self, job_id):
+        """{custom_id: {'text', 'model'} or {'error'}} for every request in the batch"""
+        batch = self._request('GET', f"/v1/messages/batches/{job_id}").json()
+        url = batch.get('results_url') or f"{self.base_url}/v1/messages/batches/{job_id}/results"
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+
+        outcomes = {}
+        for line in response.text.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            result = entry.get('result') or {}
+            if result.get('type') == 'succeeded':
+                message = result['message']
+                outcomes[entry['custom_id']] = {
+                    'text': ''.join(block.get('text', '') for block in message.get('content', [])
+                                    if block.get('type') == 'text'),
+                    'model': message.get('model'),
+                    'usage': message.get('usage')
+                }
+            else:
+                error = (result.get('error') or {}).get('error') or {}
+                outcomes[entry['custom_id']] = {'error': error.get('message') or f"Request {result.get('type', 'failed')}"}
+        return outcomes
+
+
+class BulkRunner:
+    """Runs phases of batch jobs (questions, then analysis) and remembers their ids.
+
+    Job ids are written to a small state file as soon as a job is created,
+    so a run that is stopped while the provider is still working can pick
+    the same jobs up again instead of paying for them twice. Custom ids only
+    number the questions, so the state also keeps a fingerprint of the
+    question list and resuming with a different list raises
+    BulkStateMismatch instead of mixing up the answers.
+    """
+
+    def __init__(self, clients, state_path, resume=False, poll_interval=None, fingerprint=None):
+        self.clients = clients
+        self.state_path = state_path
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.getenv('BULK_POLL_INTERVAL', 60))
+        self.state = {'questions': fingerprint, 'jobs': {}}
+        if resume and os.path.exists(state_path):
+            with open(state_path, 'r') as f:
+                state = json.load(f)
+            if fingerprint is not None and state.get('questions') != fingerprint:
+                raise BulkStateMismatch(f"{state_path} holds jobs for a different question list")
+            self.state = state
+            print(f"[INFO] Resuming bulk jobs from: {state_path}")
+
+    def _save(self):
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.state_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+
+    def run(self, phase, requests_by_provider):
+        """Submit (or re-attach to) one job per provider, wait for all of them and return every outcome by custom_id"""
+        jobs = self.state['jobs'].setdefault(phase, {})
+        for provider, items in requests_by_provider.items():
+            if not items or provider in jobs:
+                continue
+            jobs[provider] = self.clients[provider].submit(items)
+            self._save()
+            print(f"[OK] Submitted {len(items)} {phase} requests to the {provider} batch API (job {jobs[provider]})")
+
+        pending = dict(jobs)
+        while pending:
+            for provider, job_id in list(pending.items()):
+                finished, progress = self.clients[provider].poll(job_id)
+                print(f"[INFO] {phase} job for {provider}: {progress}")
+                if finished:
+                    del pending[provider]
+            if pending:
+                time.sleep(self.poll_interval)
+
+        outcomes = {}
+        for provider, job_id in jobs.items():
+            outcomes.update(self.clients[provider].results(job_id))
+        return outcomes
+
+    def finish(self):
+        """Forget the job ids once their results are written"""
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
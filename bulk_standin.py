@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Local Stand-in for the Provider Batch APIs
+Serves the OpenAI Batch and Anthropic Message Batches endpoints used by run.py --bulk, with canned answers
+"""
+
+import json
+import time
+import argparse
+import itertools
+import threading
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+ANALYSIS_ANSWER = {
+    'companies_mentioned': ['Vanguard', 'Fidelity'],
+    'mention_reasons': {'Vanguard': 'low fees', 'Fidelity': 'broad fund range'},
+    'authority_signals': ['leading'],
+    'key_features': ['low cost'],
+    'sources_cited': ['Morningstar'],
+    'ranking_factors': 'Fees and reputation',
+    'sentiment': 'positive',
+    'optimization_insights': 'Publish fee comparisons'
+}
+
+# Shortest prompt prefix the providers will cache: 1024 tokens, 2048 on Claude Haiku models
+CACHE_MIN_TOKENS = 1024
+HAIKU_CACHE_MIN_TOKENS = 2048
+
+
+class StandinState:
+    """Uploaded files and batches, each batch finishing `delay` seconds after it was created"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.cached_prefixes = set()
+        self.files = {}
+        self.batches = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def new_id(self, prefix):
+        with self.lock:
+            return f"{prefix}{next(self.ids)}"
+
+    def finished(self, batch):
+        return time.time() - batch['created'] >= self.delay
+
+    def prompt_tokens(self, body):
+        """(total, cached, written) prompt tokens at ~4 characters a token.
+
+        Like the real APIs, a system prompt shorter than the model's caching
+        minimum is never cached; a longer one is written to the cache on its
+        first use and read from it afterwards.
+        """
+        system = body.get('system') or body['messages'][0]['content']
+        system = json.dumps(system)
+        prefix = len(system) // 4 if is_analysis(body) else 0
+        total = prefix + len(json.dumps(body['messages'])) // 4
+        if prefix < cache_minimum(body['model']):
+            return total, 0, 0
+        with self.lock:
+            if system in self.cached_prefixes:
+                return total, prefix, 0
+            self.cached_prefixes.add(system)
+        return total, 0, prefix
+
+
+def cache_minimum(model):
+    """Prompt tokens a prefix needs before the provider caches it"""
+    return HAIKU_CACHE_MIN_TOKENS if 'haiku' in model else CACHE_MIN_TOKENS
+
+
+def is_analysis(body):
+    """Analysis requests carry the fixed instructions as a system prompt"""
+    return 'system' in body or body['messages'][0]['role'] == 'system'
+
+
+def answer(body):
+    """Canned completion text: analysis JSON for analysis prompts, an echo otherwise"""
+    if is_analysis(body):
+        return json.dumps(ANALYSIS_ANSWER)
+    prompt = body['messages'][-1]['content']
+    return f"Stand-in answer to: {prompt}. Many investors choose Vanguard or Fidelity."
+
+
+def failing(body):
+    """Prompts containing [fail] come back as errors so failure handling can be exercised"""
+    return '[fail]' in json.dumps(body)
+
+
+class Handler(BaseHTTPRequestHandler):
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, payload, status=200, content_type='application/json'):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_POST(self):
+        if self.path == '/v1/files':
+            # Multipart upload: let the email parser split the parts
+            raw = b'Content-Type: ' + self.headers['Content-Type'].encode() + b'\r\n\r\n' + self._body()
+            message = BytesParser().parsebytes(raw)
+            content = next(part.get_payload(decode=True) for part in message.get_payload()
+                           if part.get_param('name', header='content-disposition') == 'file')
+            file_id = self.state.new_id('file-')
+            self.state.files[file_id] = content
+            return self._send({'id': file_id, 'object': 'file', 'purpose': 'batch', 'bytes': len(content)})
+
+        if self.path == '/v1/batches':
+            request = json.loads(self._body())
+            batch_id = self.state.new_id('batch_')
+            self.state.batches[batch_id] = {'kind': 'openai', 'created': time.time(),
+                                            'input_file_id': request['input_file_id']}
+            return self._send(self._openai_batch(batch_id))
+
+        if self.path == '/v1/messages/batches':
+            request = json.loads(self._body())
+            batch_id = self.state.new_id('msgbatch_')
+            self.state.batches[batch_id] = {'kind': 'anthropic', 'created': time.time(),
+                                            'requests': request['requests']}
+            return self._send(self._anthropic_batch(batch_id))
+
+        self._send({'error': {'message': f'Unknown endpoint {self.path}'}}, 404)
+
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+        if parts[:2] == ['v1', 'batches'] and len(parts) == 3 and parts[2] in self.state.batches:
+            return self._send(self._openai_batch(parts[2]))
+        if parts[:2] == ['v1', 'files'] and len(parts) == 4 and parts[2] in self.state.files:
+            return self._send(self.state.files[parts[2]], content_type='application/jsonl')
+        if parts[:3] == ['v1', 'messages', 'batches'] and len(parts) >= 4 and parts[3] in self.state.batches:
+            if len(parts) == 5 and parts[4] == 'results':
+                return self._send(self._anthropic_results(parts[3]), content_type='application/x-jsonl')
+            return self._send(self._anthropic_batch(parts[3]))
+        self._send({'error': {'message': f'Not found: {self.path}'}}, 404)
+
+    def _openai_batch(self, batch_id):
+        batch = self.state.batches[batch_id]
+        lines = [json.loads(line) for line in self.state.files[batch['input_file_id']].splitlines() if line.strip()]
+        done = self.state.finished(batch)
+        if done and 'output_file_id' not in batch:
+            output, errors = [], []
+            for line in lines:
+                if failing(line['body']):
+                    errors.append({'custom_id': line['custom_id'], 'response': None,
+                                   'error': {'code': 'server_error', 'message': 'Stand-in failure'}})
+                    continue
+                total, cached, _ = self.state.prompt_tokens(line['body'])
+                body = {'model': line['body']['model'], 'choices': [{'index': 0, 'message': {
+                    'role': 'assistant', 'content': answer(line['body'])}}],
+                    'usage': {'prompt_tokens': total, 'completion_tokens': 20,
+                              'prompt_tokens_details': {'cached_tokens': cached}}}
+                output.append({'custom_id': line['custom_id'], 'response': {'status_code': 200, 'body': body},
+                               'error': None})
+            for key, entries in (('output_file_id', output), ('error_file_id', errors)):
+                file_id = self.state.new_id('file-')
+                self.state.files[file_id] = '\n'.join(json.dumps(e) for e in entries).encode('utf-8')
+                batch[key] = file_id
+        return {
+            'id': batch_id, 'object': 'batch', 'status': 'completed' if done else 'in_progress',
+            'input_file_id': batch['input_file_id'],
+            'output_file_id': batch.get('output_file_id'), 'error_file_id': batch.get('error_file_id'),
+            'request_counts': {'total': len(lines), 'completed': len(lines) if done else 0, 'failed': 0}
+        }
+
+    def _anthropic_batch(self, batch_id):
+        batch = self.state.batches[batch_id]
+        done = self.state.finished(batch)
+        total = len(batch['requests'])
+        host = self.headers.get('Host')
+        return {
+            'id': batch_id, 'type': 'message_batch',
+            'processing_status': 'ended' if done else 'in_progress',
+            'request_counts': {'processing': 0 if done else total, 'succeeded': total if done else 0,
+                               'errored': 0, 'canceled': 0, 'expired': 0},
+            'results_url': f"http://{host}/v1/messages/batches/{batch_id}/results" if done else None
+        }
+
+    def _anthropic_results(self, batch_id):
+        lines = []
+        for request in self.state.batches[batch_id]['requests']:
+            params = request['params']
+            if failing(params):
+                result = {'type': 'errored', 'error': {'type': 'error', 'error': {
+                    'type': 'api_error', 'message': 'Stand-in failure'}}}
+            else:
+                total, cached, written = self.state.prompt_tokens(params)
+                usage = {'input_tokens': total - cached - written, 'cache_read_input_tokens': cached,
+                         'cache_creation_input_tokens': written, 'output_tokens': 20}
+                result = {'type': 'succeeded', 'message': {'model': params['model'], 'role': 'assistant',
+                          'content': [{'type': 'text', 'text': answer(params)}], 'usage': usage}}
+            lines.append(json.dumps({'custom_id': request['custom_id'], 'result': result}))
+        return '\n'.join(lines).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the OpenAI and Anthropic batch endpoints')
+    parser.add_argument('--port', type=int, default=8089, help='Port to listen on (default: 8089)')
+    parser.add_argument('--delay', type=float, default=2.0, help='Seconds before each batch reports completion (default: 2)')
+    args = parser.parse_args()
+
+    Handler.state = StandinState(args.delay)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), Handler)
+    print(f"[OK] Batch API stand-in listening on http://127.0.0.1:{args.port}")
+    print(f"     OPENAI_BASE_URL=http://127.0.0.1:{args.port}/v1 ANTHROPIC_BASE_URL=http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
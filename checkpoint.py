@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Batch Checkpoint Manifest
+Tracks which (question, provider) pairs of a batch run are done so it can be resumed
+"""
+
+import os
+import json
+from datetime import datetime
+
+
+def checkpoint_path_for(questions_file, directory='results'):
+    """Default checkpoint location for a questions file"""
+    name = os.path.splitext(os.path.basename(questions_file))[0] or 'questions'
+    return os.path.join(directory, f"checkpoint_{name}.jsonl")
+
+
+class BatchCheckpoint:
+    """Append-only manifest of a batch run.
+
+    The first line describes the run (questions file and result log), every
+    following line records the outcome of one (question, provider) pair and
+    where its record lives in the result log. Later lines win, so a pair that
+    failed and was retried successfully counts as done. A final 'complete'
+    line marks a run that needs no resuming, so starting a new one over it
+    is safe.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header = {}
+        self.pairs = {}
+        self.complete = False
+
+    @classmethod
+    def start(cls, path, questions_file, result_log, shard=None):
+        """Begin a fresh checkpoint, replacing any previous one at this path"""
+        checkpoint = cls(path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        checkpoint.header = {
+            'type': 'batch',
+            'questions_file': questions_file,
+            'result_log': result_log.path,
+            'compression': result_log.compression,
+            'shard': f"{shard[0]}/{shard[1]}" if shard else None,
+            'started': datetime.now().isoformat()
+        }
+        with open(path, 'w') as f:
+            f.write(json.dumps(checkpoint.header) + '\n')
+        return checkpoint
+
+    @classmethod
+    def unfinished(cls, path):
+        """The checkpoint at path if it belongs to a run that can still be resumed, else None"""
+        checkpoint = cls.load(path)
+        if checkpoint is None or checkpoint.complete:
+            return None
+        return checkpoint
+
+    @classmethod
+    def load(cls, path):
+        """Load an existing checkpoint, or return None if there is nothing to resume"""
+        if not os.path.exists(path):
+            return None
+
+        checkpoint = cls(path)
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a partial last line - ignore it, the pair is simply retried
+                    continue
+                if entry.get('type') == 'batch':
+                    checkpoint.header = entry
+                elif entry.get('type') == 'pair':
+                    checkpoint.pairs[(entry['question'], entry['provider'])] = entry
+                    checkpoint.complete = False
+                elif entry.get('type') == 'complete':
+                    checkpoint.complete = True
+
+        if not checkpoint.header:
+            return None
+        return checkpoint
+
+    def is_done(self, question, provider):
+        """True if the pair already completed successfully"""
+        entry = self.pairs.get((question, provider))
+        return bool(entry and entry.get('status') == 'ok')
+
+    def pending_providers(self, question, providers):
+        """Providers that still need to run for a question (failed or missing)"""
+        return [p for p in providers if not self.is_done(question, p)]
+
+    def record(self, question, results, location):
+        """Record the outcome of every provider result stored at a log location"""
+        with open(self.path, 'a') as f:
+            for result in results:
+                provider = result.get('provider_id') or result.get('provider')
+                entry = {
+                    'type': 'pair',
+                    'question': question,
+                    'provider': provider,
+                    'status': 'failed' if 'error' in result else 'ok',
+                    'offset': location['offset'],
+                    'length': location['length'],
+                    'completed': datetime.now().isoformat()
+                }
+                self.pairs[(question, provider)] = entry
+                f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def mark_complete(self):
+        """Record that every pair of the run succeeded"""
+        with open(self.path, 'a') as f:
+            f.write(json.dumps({'type': 'complete', 'completed': datetime.now().isoformat()}) + '\n')
+        self.complete = True
+
+    def build_index(self, questions):
+        """Merge every recorded pair into a per-question index for the batch summary"""
+        by_question = {}
+        for (question, provider), entry in self.pairs.items():
+            by_question.setdefault(question, {})[provider] = {
+                'status': entry['status'],
+                'offset': entry['offset'],
+                'length': entry['length']
+            }
+
+        index = []
+        for question in questions:
+            providers = by_question.get(question, {})
+            index.append({
+                'query': question,
+                'providers': providers,
+                'successful': [p for p, e in providers.items() if e['status'] == 'ok'],
+                'failed': [p for p, e in providers.items() if e['status'] != 'ok']
+            })
+        return index
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Offset-Indexed Analysis CSV Reader
+Streams matching rows of a large analysis CSV through a memory map using a cached sidecar index
+"""
+
+import os
+import io
+import csv
+import sys
+import json
+import mmap
+import struct
+import argparse
+import threading
+
+from share_of_voice import complete_rows, normalize_provider
+
+
+INDEX_VERSION = 2
+
+# One fixed-width record per row: byte offset, then provider, query and date key ids
+ROW_RECORD = struct.Struct('<QIII')
+KEY_KINDS = ('provider', 'query', 'date')
+
+
+class AnalysisCSVReader:
+    """Lazy, filtered reader for the analysis CSV.
+
+    The sidecar index holds the byte offset of every row plus row-number
+    lists keyed by provider, query and date. It is stored append-only:
+    <csv>.idx.rows gets one fixed-width record per row, <csv>.idx.keys one
+    line per distinct key, and <csv>.idx is a small header saying how far
+    both are valid. Opening the reader only scans bytes appended since the
+    index was last saved, and saving only writes the new rows and keys.
+    Reading slices the matching rows out of a memory-mapped file, so memory
+    use does not depend on the size of the CSV.
+    """
+
+    def __init__(self, csv_path, index_path=None):
+        self.csv_path = csv_path
+        self.index_path = index_path or f"{csv_path}.idx"
+        self.rows_path = f"{self.index_path}.rows"
+        self.keys_path = f"{self.index_path}.keys"
+        self.lock = threading.Lock()
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        """Start with an empty index"""
+        self.size = 0
+        self.header = []
+        self.head_fingerprint = ''
+        self.offsets = []
+        self.by_provider = {}
+        self.by_query = {}
+        self.by_date = {}
+        self._key_ids = {kind: {} for kind in KEY_KINDS}
+        self._key_names = {kind: [] for kind in KEY_KINDS}
+        # Records and keys not yet on disk; a reset index rewrites its files from scratch
+        self._new_rows = []
+        self._new_keys = []
+        self._rewrite = True
+
+    def _load(self):
+        """Load the sidecar index if it belongs to this CSV and its files agree with each other"""
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != INDEX_VERSION:
+                return
+            keys = self._read_keys()
+            with open(self.rows_path, 'rb') as f:
+                data = f.read(meta['rows'] * ROW_RECORD.size)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARNING] Ignoring unreadable CSV index {self.index_path}: {e}")
+            return
+        if len(data) < meta['rows'] * ROW_RECORD.size:
+            print(f"[WARNING] CSV index {self.index_path} is out of sync with its rows file, rebuilding")
+            return
+
+        for kind, key in keys:
+            self._key_names[kind].append(key)
+        lists = {kind: [[] for _ in self._key_names[kind]] for kind in KEY_KINDS}
+        offsets = []
+        try:
+            for row_number, (offset, *ids) in enumerate(ROW_RECORD.iter_unpack(data)):
+                offsets.append(offset)
+                for kind, key_id in zip(KEY_KINDS, ids):
+                    lists[kind][key_id].append(row_number)
+        except IndexError:
+            print(f"[WARNING] CSV index {self.index_path} refers to unknown keys, rebuilding")
+            self._reset()
+            return
+
+        self.size = meta['size']
+        self.header = meta['header']
+        self.head_fingerprint = meta['head_fingerprint']
+        self.offsets = offsets
+        for kind, target in zip(KEY_KINDS, (self.by_provider, self.by_query, self.by_date)):
+            for key_id, key in enumerate(self._key_names[kind]):
+                self._key_ids[kind][key] = key_id
+                if lists[kind][key_id]:
+                    target[key] = lists[kind][key_id]
+        self._rewrite = False
+
+    def _read_keys(self):
+        """(kind, key) pairs in id order, dropping a torn last line left by a crash"""
+        keys = []
+        with open(self.keys_path, 'rb') as f:
+            data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        if len(complete) < len(data):
+            with open(self.keys_path, 'r+b') as f:
+                f.truncate(len(complete))
+        for line in complete.splitlines():
+            kind, key = json.loads(line)
+            keys.append((kind, key))
+        return keys
+
+    def _save(self):
+        """Append new rows and keys, then atomically move the header past them"""
+        mode = 'w' if self._rewrite else 'a'
+        with open(self.keys_path, mode + 'b') as f:
+            f.write(b''.join(json.dumps(key).encode('utf-8') + b'\n' for key in self._new_keys))
+        with open(self.rows_path, 'r+b' if not self._rewrite and os.path.exists(self.rows_path) else 'wb') as f:
+            # Drop records a crashed save wrote past the header before appending
+            f.truncate((len(self.offsets) - len(self._new_rows)) * ROW_RECORD.size)
+            f.seek(0, os.SEEK_END)
+            f.write(b''.join(self._new_rows))
+
+        meta = {
+            'version': INDEX_VERSION,
+            'csv_path': self.csv_path,
+            'size': self.size,
+            'rows': len(self.offsets),
+            'header': self.header,
+            'head_fingerprint': self.head_fingerprint
+        }
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, separators=(',', ':'))
+        os.replace(tmp_path, self.index_path)
+        self._new_rows = []
+        self._new_keys = []
+        self._rewrite = False
+
+    def _fingerprint(self, mm):
+        """First bytes of the file, used to notice that the CSV was replaced"""
+        return mm[:256].hex()
+
+    def _parse(self, data):
+        """Parse the bytes of one CSV row"""
+        return next(csv.reader(io.StringIO(data.decode('utf-8'), newline='')), [])
+
+    def _scan(self, mm, start, end):
+        """Index every complete row between two byte offsets; returns where scanning stopped"""
+        stop = start
+        for row_start, stop in complete_rows(mm, start, end):
+            row = self._parse(mm[row_start:stop])
+            if not self.header:
+                self.header = row
+            elif row:
+                self._add_row(row_start, row)
+        return stop
+
+    def _key_id(self, kind, key):
+        """Id of a provider/query/date key, assigning the next one to a new key"""
+        key_id = self._key_ids[kind].get(key)
+        if key_id is None:
+            key_id = self._key_ids[kind][key] = len(self._key_names[kind])
+            self._key_names[kind].append(key)
+            self._new_keys.append((kind, key))
+        return key_id
+
+    def _add_row(self, offset, row):
+        """Add one parsed row to the offset list and the secondary indexes"""
+        record = dict(zip(self.header, row))
+        row_number = len(self.offsets)
+        keys = (normalize_provider(record.get('provider')), record.get('query', '').strip(),
+                record.get('timestamp', '')[:10])
+        self.offsets.append(offset)
+        self._new_rows.append(ROW_RECORD.pack(offset, *(self._key_id(kind, key) for kind, key in zip(KEY_KINDS, keys))))
+        for target, key in zip((self.by_provider, self.by_query, self.by_date), keys):
+            target.setdefault(key, []).append(row_number)
+
+    def refresh(self):
+        """Bring the index up to date with rows appended since it was saved"""
+        with self.lock:
+            if not os.path.exists(self.csv_path):
+                self._reset()
+                return
+            size = os.path.getsize(self.csv_path)
+            if size == 0:
+                self._reset()
+                return
+
+            with open(self.csv_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                fingerprint = self._fingerprint(mm)
+                if size < self.size or (self.size and fingerprint[:len(self.head_fingerprint)] != self.head_fingerprint):
+                    # Truncated or replaced - start over
+                    self._reset()
+                if size == self.size:
+                    return
+
+                if not self.size:
+                    self.head_fingerprint = fingerprint
+                self.size = self._scan(mm, self.size, size)
+
+            self._save()
+
+    def _matching_rows(self, provider=None, query=None, date=None, since=None, until=None):
+        """Sorted row numbers matching every given filter"""
+        candidates = []
+        if provider:
+            candidates.append(self.by_provider.get(normalize_provider(provider), []))
+        if query:
+            candidates.append(self.by_query.get(query.strip(), []))
+        if date:
+            candidates.append(self.by_date.get(date, []))
+        if since or until:
+            dates = [d for d in self.by_date if (not since or d >= since[:10]) and (not until or d <= until[:10])]
+            candidates.append(sorted(n for d in dates for n in self.by_date[d]))
+
+        if not candidates:
+            return range(len(self.offsets))
+
+        # Intersect starting from the most selective list
+        candidates.sort(key=len)
+        matching = candidates[0]
+        for other in candidates[1:]:
+            other = set(other)
+            matching = [n for n in matching if n in other]
+        return matching
+
+    def rows(self, provider=None, query=None, date=None, since=None, until=None):
+        """Yield matching rows as dicts, reading only their bytes from the memory-mapped CSV"""
+        self.refresh()
+        matching = self._matching_rows(provider, query, date, since, until)
+        if not self.offsets:
+            return
+
+        with open(self.csv_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for row_number in matching:
+                start = self.offsets[row_number]
+                end = self.offsets[row_number + 1] if row_number + 1 < len(self.offsets) else self.size
+                yield dict(zip(self.header, self._parse(mm[start:end])))
+
+    def count(self, provider=None, query=None, date=None, since=None, until=None):
+        """Number of matching rows, answered from the index alone"""
+        self.refresh()
+        return len(self._matching_rows(provider, query, date, since, until))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Filtered, streaming reads of the analysis CSV')
+    parser.add_argument('--provider', '-p', type=str, help='Only rows for this provider')
+    parser.add_argument('--query', '-q', type=str, help='Only rows for this exact query')
+    parser.add_argument('--date', '-d', type=str, help='Only rows from this day (YYYY-MM-DD)')
+    parser.add_argument('--since', type=str, help='Only rows on or after this day')
+    parser.add_argument('--until', type=str, help='Only rows on or before this day')
+    parser.add_argument('--count', action='store_true', help='Print the number of matching rows only')
+    parser.add_argument('--csv', type=str, default=os.getenv('ANALYSIS_CSV_PATH', 'analysis_results.csv'),
+                        help='Analysis CSV path (default: ANALYSIS_CSV_PATH or analysis_results.csv)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv):
+        print(f"[ERROR] Analysis CSV not found: {args.csv}")
+        sys.exit(1)
+
+    reader = AnalysisCSVReader(args.csv)
+    filters = dict(provider=args.provider, query=args.query, date=args.date, since=args.since, until=args.until)
+
+    if args.count:
+        print(reader.count(**filters))
+    else:
+        # One JSON object per line so the output can be piped into other tools
+        for row in reader.rows(**filters):
+            print(json.dumps(row))
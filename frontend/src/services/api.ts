@@ -31,9 +31,42 @@ export interface QueryResponse {
   id: string;
   query: string;
   timestamp: string;
-  status: 'processing' | 'completed' | 'error';
+  status: 'queued' | 'processing' | 'completed' | 'error' | 'cancelled';
   results: Record<string, QueryResult>;
   analysis: Record<string, any> | null;
+  queue_position?: number | null;
+  queue_depth?: number;
+}
+
+export interface HistoryEntry {
+  id: string;
+  query: string;
+  timestamp: string;
+  status: QueryResponse['status'];
+  providers: string[];
+  successful: number;
+  failed: number;
+  analyzed: boolean;
+}
+
+export interface HistoryParams {
+  limit?: number;
+  cursor?: string;
+  provider?: string;
+  status?: QueryResponse['status'];
+  q?: string;
+}
+
+export interface BatchProgress {
+  batch_id: string;
+  created: string;
+  status: 'running' | 'completed';
+  total: number;
+  done: number;
+  failed: number;
+  pending: number;
+  elapsed_seconds: number;
+  eta_seconds: number | null;
 }
 
 export interface AnalysisData {
@@ -56,7 +89,7 @@ export const apiService = {
   },
 
   // Submit a query
-  async submitQuery(query: string, providers?: string[]): Promise<{ query_id: string; websocket_room: string }> {
+  async submitQuery(query: string, providers?: string[]): Promise<{ query_id: string; websocket_room: string; queue_position: number | null; queue_depth: number; coalesced: boolean }> {
     const response = await api.post('/query', { query, providers });
     return response.data;
   },
@@ -67,15 +100,21 @@ export const apiService = {
     return response.data;
   },
 
+  // Cancel a queued or running query (the result keeps any providers that already answered)
+  async cancelQuery(queryId: string): Promise<{ query_id: string; status: 'cancelled' | 'cancelling' | 'detached' }> {
+    const response = await api.post(`/query/${queryId}/cancel`);
+    return response.data;
+  },
+
   // Get analysis
   async getAnalysis(queryId: string): Promise<{ query_id: string; query: string; analysis: Record<string, AnalysisData> }> {
     const response = await api.get(`/analysis/${queryId}`);
     return response.data;
   },
 
-  // Get history
-  async getHistory(): Promise<{ queries: QueryResponse[] }> {
-    const response = await api.get('/history');
+  // Get one page of history; pass next_cursor back to fetch the following page
+  async getHistory(params: HistoryParams = {}): Promise<{ queries: HistoryEntry[]; next_cursor: string | null }> {
+    const response = await api.get('/history', { params });
     return response.data;
   },
 
@@ -87,12 +126,50 @@ export const apiService = {
     });
     return response.data;
   },
+
+  // Submit a batch of questions; progress arrives as batch_progress events on the batch room
+  async submitBatch(questions: string[], providers?: string[]): Promise<BatchProgress & { query_ids: string[]; websocket_room: string }> {
+    const response = await api.post('/batch', { questions, providers });
+    return response.data;
+  },
+
+  // Get batch progress
+  async getBatch(batchId: string): Promise<BatchProgress & { query_ids: string[]; providers: string[] }> {
+    const response = await api.get(`/batch/${batchId}`);
+    return response.data;
+  },
+
+  // Get all results of a batch
+  async getBatchResults(batchId: string): Promise<{ batch: BatchProgress; results: QueryResponse[] }> {
+    const response = await api.get(`/batch/${batchId}/results`);
+    return response.data;
+  },
+
+  // Bulk export by time range or ids (streamed by the server as NDJSON or CSV)
+  async exportBulk(params: { since?: string; until?: string; ids?: string[]; format?: 'ndjson' | 'csv'; columns?: string[] }): Promise<Blob> {
+    const response = await api.post('/export', params, { responseType: 'blob' });
+    return response.data;
+  },
 };
 
+// Large event payloads arrive as { query_id, z } where z is zlib-compressed JSON
+const supportsCompression = typeof DecompressionStream !== 'undefined';
+
+async function inflatePayload(data: any): Promise<any> {
+  if (!data || !(data.z instanceof ArrayBuffer)) {
+    return data;
+  }
+  const stream = new Blob([data.z]).stream().pipeThrough(new DecompressionStream('deflate'));
+  return JSON.parse(await new Response(stream).text());
+}
+
 // WebSocket Manager
 export class WebSocketManager {
   private socket: Socket | null = null;
   private listeners: Map<string, Set<Function>> = new Map();
+  private handlers: Map<Function, (data: any) => void> = new Map();
+  // Decompression is async; chaining keeps callbacks in arrival order
+  private delivery: Promise<void> = Promise.resolve();
 
   connect(): Socket {
     if (!this.socket) {
@@ -120,7 +197,19 @@ export class WebSocketManager {
 
   joinQuery(queryId: string): void {
     if (this.socket) {
-      this.socket.emit('join_query', { query_id: queryId });
+      this.socket.emit('join_query', { query_id: queryId, compress: supportsCompression });
+    }
+  }
+
+  joinBatch(batchId: string): void {
+    if (this.socket) {
+      this.socket.emit('join_batch', { batch_id: batchId });
+    }
+  }
+
+  cancelQuery(queryId: string): void {
+    if (this.socket) {
+      this.socket.emit('cancel_query', { query_id: queryId });
     }
   }
 
@@ -136,8 +225,16 @@ export class WebSocketManager {
     }
     this.listeners.get(event)!.add(callback);
 
+    const handler = (data: any) => {
+      this.delivery = this.delivery
+        .then(() => inflatePayload(data))
+        .then(payload => callback(payload))
+        .catch(error => console.error(`Failed to handle ${event}:`, error));
+    };
+    this.handlers.set(callback, handler);
+
     if (this.socket) {
-      this.socket.on(event, callback as any);
+      this.socket.on(event, handler);
     }
   }
 
@@ -147,8 +244,11 @@ export class WebSocketManager {
       eventListeners.delete(callback);
     }
 
-    if (this.socket) {
-      this.socket.off(event, callback as any);
+    const handler = this.handlers.get(callback);
+    this.handlers.delete(callback);
+
+    if (this.socket && handler) {
+      this.socket.off(event, handler);
     }
   }
 }
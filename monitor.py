@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Staleness-Driven Monitoring Scheduler
+Re-queries only the (question, provider) pairs whose answers are likely to have changed, within a call budget
+"""
+
+import os
+import re
+import json
+import time
+from datetime import datetime
+
+
+HOUR = 3600
+
+# Fallback signature when there is no analysis: names (runs of capitalized words) and links
+CAPITALIZED = re.compile(r"\b[A-Z][\w&'-]*(?:[ \t]+(?:&[ \t]+)?[A-Z][\w&'-]*)*")
+LINK = re.compile(r"https?://[^\s)\]>\"']+|\b(?:[a-z0-9-]+\.)+(?:com|org|net|io|ai|co|gov|edu)\b", re.IGNORECASE)
+# Capitalized only because they start a sentence or a list item
+SENTENCE_WORDS = {
+    'a', 'according', 'after', 'all', 'also', 'an', 'and', 'are', 'as', 'at', 'because', 'before', 'best',
+    'both', 'but', 'by', 'can', 'consider', 'each', 'finally', 'first', 'for', 'here', 'how', 'however',
+    'i', 'if', 'in', 'is', 'it', 'its', 'many', 'most', 'note', 'of', 'on', 'or', 'other', 'our',
+    'overall', 'since', 'some', 'that', 'the', 'their', 'then', 'there', 'these', 'they', 'this', 'those',
+    'to', 'top', 'we', 'what', 'when', 'which', 'while', 'why', 'with', 'you', 'your'
+}
+# Signature kinds, most informative first; two answers are compared on the first kind both have
+SIGNATURE_KINDS = ('companies', 'entities')
+
+
+def monitor_state_path_for(questions_file, directory='results'):
+    """Default state file for monitoring a questions file"""
+    name = os.path.splitext(os.path.basename(questions_file))[0] or 'questions'
+    return os.path.join(directory, f"monitor_{name}.json")
+
+
+def entity_signature(text):
+    """Names and links in an answer, casefolded - steadier across rewordings than every word"""
+    text = str(text or '')
+    names = {link.rstrip('/.,;:').casefold() for link in LINK.findall(text)}
+    for match in CAPITALIZED.findall(text):
+        words = match.split()
+        while words and words[0].casefold() in SENTENCE_WORDS:
+            words.pop(0)
+        if words:
+            names.add(' '.join(words).casefold())
+    return sorted(names)
+
+
+def answer_signatures(result):
+    """What we compare between runs, by kind: the companies the analysis found, and the answer's entities"""
+    signatures = {'entities': entity_signature(result.get('response'))}
+    analysis = result.get('analysis') or {}
+    companies = analysis.get('companies_mentioned')
+    if companies:
+        signatures['companies'] = sorted({str(c).strip().casefold() for c in companies if str(c).strip()})
+    return signatures
+
+
+def signature_change(previous, current):
+    """1 - Jaccard similarity on the best signature kind both answers have, or None if they share none"""
+    if not isinstance(previous, dict):
+        # Written before signatures were kept by kind - there is nothing like-for-like to compare
+        return None
+    for kind in SIGNATURE_KINDS:
+        if kind in previous and kind in current:
+            return 1.0 - jaccard(previous[kind], current[kind])
+    return None
+
+
+def jaccard(a, b):
+    """Similarity of two signatures, 1.0 for identical sets"""
+    a, b = set(a), set(b)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MonitorState:
+    """Last run and answer volatility of every (question, provider) pair.
+
+    Volatility is an exponentially weighted average of how much each new
+    answer differed from the previous one (1 - Jaccard similarity). It sets
+    the pair's re-check interval between min_interval (answers change every
+    time) and max_interval (answers never change). A pair's staleness is its
+    age divided by that interval; pairs at or above 1 are due, and the most
+    stale are run first when the budget does not cover all of them.
+    """
+
+    def __init__(self, path, min_interval=None, max_interval=None, alpha=None):
+        self.path = path
+        if min_interval is None:
+            min_interval = float(os.getenv('MONITOR_MIN_INTERVAL_HOURS', 6)) * HOUR
+        if max_interval is None:
+            max_interval = float(os.getenv('MONITOR_MAX_INTERVAL_HOURS', 168)) * HOUR
+        if alpha is None:
+            alpha = float(os.getenv('MONITOR_VOLATILITY_ALPHA', 0.3))
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.alpha = alpha
+        self.pairs = {}
+
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for entry in json.load(f).get('pairs', []):
+                    self.pairs[(entry['question'], entry['provider'])] = entry
+
+    def interval(self, entry):
+        """Seconds between checks for a pair, shorter the more its answers move"""
+        volatility = entry.get('volatility', 0.5)
+        return self.min_interval + (self.max_interval - self.min_interval) * (1.0 - volatility)
+
+    def staleness(self, question, provider, now=None):
+        """Age relative to the pair's interval; never-run pairs are infinitely stale"""
+        if now is None:
+            now = time.time()
+        entry = self.pairs.get((question, provider))
+        if entry is None or entry.get('last_success') is None:
+            if entry is not None and entry.get('last_run') is not None:
+                # Failed so far - retry at the fastest pace, not on every tick
+                return (now - entry['last_run']) / self.min_interval
+            return float('inf')
+        return (now - entry['last_success']) / self.interval(entry)
+
+    def plan(self, questions, providers, budget=None, now=None):
+        """Due pairs, most stale first, cut to the budget"""
+        if now is None:
+            now = time.time()
+        due = []
+        for question in dict.fromkeys(questions):
+            for provider in providers:
+                score = self.staleness(question, provider, now)
+                if score >= 1.0:
+                    due.append((score, question, provider))
+        due.sort(key=lambda item: -item[0])
+        if budget is not None:
+            due = due[:budget]
+        return [(question, provider) for _, question, provider in due]
+
+    def record(self, question, result, result_log=None, location=None, now=None):
+        """Fold one new answer into its pair's history, remembering where it is stored"""
+        if now is None:
+            now = time.time()
+        provider = result.get('provider_id') or result.get('provider')
+        entry = self.pairs.setdefault((question, provider), {
+            'question': question, 'provider': provider, 'runs': 0,
+            'last_run': None, 'last_success': None, 'volatility': 0.5, 'signature': None
+        })
+        entry['last_run'] = now
+        entry['runs'] += 1
+        if 'error' in result:
+            entry['last_status'] = 'failed'
+            return entry
+
+        signature = answer_signatures(result)
+        change = signature_change(entry['signature'], signature)
+        if change is not None:
+            entry['volatility'] = round((1 - self.alpha) * entry['volatility'] + self.alpha * change, 4)
+            entry['last_change'] = round(change, 4)
+        entry['signature'] = signature
+        entry['last_success'] = now
+        if result_log and location:
+            # The latest answer of every pair, across ticks - together a full-run view
+            entry['answer'] = {'result_log': result_log, 'offset': location['offset'], 'length': location['length']}
+        entry['last_status'] = 'ok'
+        return entry
+
+    def coverage(self, questions, providers, now=None):
+        """How fresh the monitored answers are overall"""
+        if now is None:
+            now = time.time()
+        pairs = [(q, p) for q in dict.fromkeys(questions) for p in providers]
+        answered = [pair for pair in pairs if pair in self.pairs and self.pairs[pair].get('last_success')]
+        fresh = sum(1 for q, p in answered if self.staleness(q, p, now) < 1.0)
+        ages = [now - self.pairs[pair]['last_success'] for pair in answered]
+        return {
+            'pairs': len(pairs),
+            'within_interval': fresh,
+            'never_answered': len(pairs) - len(ages),
+            'max_age_hours': round(max(ages) / HOUR, 1) if ages else None,
+            'mean_age_hours': round(sum(ages) / len(ages) / HOUR, 1) if ages else None
+        }
+
+    def save(self):
+        """Write the state atomically, so a crash never leaves half a file"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'updated': datetime.now().isoformat(), 'pairs': list(self.pairs.values())}, f)
+        os.replace(temp_path, self.path)
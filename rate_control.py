@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Adaptive Provider Concurrency
+AIMD concurrency limits per provider, driven by call latency, 429s and rate-limit response headers
+"""
+
+import os
+import re
+import time
+import threading
+from datetime import datetime, timezone
+
+
+# Statuses that mean "slow down": rate limited, overloaded or unavailable
+CONGESTION_STATUSES = (429, 503, 529)
+
+# Remaining-request headers, OpenAI (and Perplexity) style then Anthropic style
+REMAINING_HEADERS = ('x-ratelimit-remaining-requests', 'anthropic-ratelimit-requests-remaining')
+REMAINING_TOKEN_HEADERS = ('x-ratelimit-remaining-tokens', 'anthropic-ratelimit-tokens-remaining')
+RESET_HEADERS = ('x-ratelimit-reset-requests', 'anthropic-ratelimit-requests-reset')
+RESET_TOKEN_HEADERS = ('x-ratelimit-reset-tokens', 'anthropic-ratelimit-tokens-reset')
+
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def _header(headers, names):
+    """First of the named headers present, or None"""
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+def _parse_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def error_signals(error):
+    """HTTP status, response headers and timeout flag carried by a failed call's exception"""
+    # SDK errors carry the HTTP status (genai calls it .code) and response; connection errors do not
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    if not isinstance(status, int):
+        status = None
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) if response is not None else None
+    timed_out = 'timeout' in type(error).__name__.lower()
+    return status, headers, timed_out
+
+
+def parse_reset(value, now=None):
+    """Seconds until a rate limit resets, from "1s"/"6m0s"/"20ms", plain seconds or an RFC 3339 time"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if parts and ''.join(number + unit for number, unit in parts) == value:
+        return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+    try:
+        reset_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if reset_at.tzinfo is None:
+        reset_at = reset_at.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max((reset_at - now).total_seconds(), 0.0)
+
+
+class AIMDLimiter:
+    """Concurrency limit for one provider.
+
+    Every successful call grows the limit by 1/limit, i.e. by one slot per
+    window of calls (additive increase). A 429/503/529 or a timeout halves it,
+    and latency rising well above its long-run average shrinks it by 10%
+    (multiplicative decrease) - at most once per cool-down, so a burst of
+    429s from calls that were already in flight counts as one signal. When
+    the rate-limit headers say no requests or tokens are left, the provider
+    is paused until the advertised reset.
+    """
+
+    def __init__(self, initial=4, min_limit=1, max_limit=32, backoff=0.5,
+                 latency_tolerance=2.0, cooldown=1.0):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+
+        self.short_latency = None
+        self.long_latency = None
+        self.paused_until = 0.0
+        self.remaining = None
+        self.last_decrease = 0.0
+        self.calls = 0
+        self.congestion_events = 0
+        self._lock = threading.Lock()
+
+    def current(self, now=None):
+        """Calls allowed in flight right now (0 while paused for a rate-limit reset)"""
+        now = now or time.time()
+        with self._lock:
+            if now < self.paused_until:
+                return 0
+            return int(self.limit)
+
+    def observe(self, latency, status=200, headers=None, timed_out=False, now=None):
+        """Adjust the limit after one call; returns seconds to pause if the provider asked for one"""
+        now = now or time.time()
+        headers = headers or {}
+        with self._lock:
+            self.calls += 1
+            pause = self._read_headers(headers, status)
+            if pause:
+                self.paused_until = max(self.paused_until, now + pause)
+
+            if status in CONGESTION_STATUSES or timed_out:
+                self._decrease(self.backoff, now, congestion=True)
+                return pause
+
+            if status is None or status >= 400:
+                # Other failures (bad key, bad request) say nothing about capacity
+                return pause
+
+            self._track_latency(latency)
+            if self.short_latency > self.long_latency * self.latency_tolerance:
+                self._decrease(0.9, now)
+            elif self.remaining is None or self.remaining > self.limit:
+                # Only grow while the provider says there is headroom left
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            return pause
+
+    def _track_latency(self, latency):
+        """Fast and slow moving averages of call latency"""
+        if self.short_latency is None:
+            self.short_latency = self.long_latency = latency
+            return
+        self.short_latency += 0.3 * (latency - self.short_latency)
+        self.long_latency += 0.05 * (latency - self.long_latency)
+
+    def _decrease(self, factor, now, congestion=False):
+        """Multiplicative decrease, once per cool-down"""
+        window = max(self.cooldown, self.short_latency or 0.0)
+        if now - self.last_decrease < window:
+            return
+        self.last_decrease = now
+        self.limit = max(self.min_limit, self.limit * factor)
+        if congestion:
+            self.congestion_events += 1
+
+    def _read_headers(self, headers, status):
+        """Remember the remaining request budget; seconds to pause if it ran out"""
+        retry_after = parse_reset(headers.get('retry-after'))
+        remaining = _parse_int(_header(headers, REMAINING_HEADERS))
+        remaining_tokens = _parse_int(_header(headers, REMAINING_TOKEN_HEADERS))
+        if remaining is not None:
+            self.remaining = remaining
+
+        if status == 429 and retry_after:
+            return retry_after
+        if remaining == 0:
+            return parse_reset(_header(headers, RESET_HEADERS)) or retry_after
+        if remaining_tokens == 0:
+            return parse_reset(_header(headers, RESET_TOKEN_HEADERS)) or retry_after
+        return None
+
+    def stats(self):
+        """Current limit and the signals behind it"""
+        with self._lock:
+            return {
+                'limit': int(self.limit),
+                'paused_seconds': round(max(self.paused_until - time.time(), 0.0), 1),
+                'remaining_requests': self.remaining,
+                'latency_seconds': round(self.short_latency, 3) if self.short_latency is not None else None,
+                'baseline_latency_seconds': round(self.long_latency, 3) if self.long_latency is not None else None,
+                'calls': self.calls,
+                'congestion_events': self.congestion_events
+            }
+
+
+class AdaptiveConcurrency:
+    """One AIMD limiter per provider, shared by every tester.
+
+    initial_for(provider) gives a provider's starting limit (defaults to
+    PROVIDER_CONCURRENCY_<PROVIDER>, then PROVIDER_CONCURRENCY). on_change()
+    is called whenever a limit may have grown, so a scheduler holding
+    waiting calls can hand out the new slots - including when a pause for a
+    rate-limit reset runs out.
+    """
+
+    def __init__(self, initial_for=None, on_change=None):
+        self.initial_for = initial_for or self._default_initial
+        self.on_change = on_change
+        self.min_limit = int(os.getenv('ADAPTIVE_MIN_CONCURRENCY', 1))
+        self.max_limit = int(os.getenv('ADAPTIVE_MAX_CONCURRENCY', 32))
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def _default_initial(self, provider):
+        """Configured starting limit for a provider"""
+        default = int(os.getenv('PROVIDER_CONCURRENCY', 4))
+        return int(os.getenv(f'PROVIDER_CONCURRENCY_{provider.upper()}', default))
+
+    def limiter(self, provider):
+        """The limiter for a provider, created on first use"""
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(provider)
+                if limiter is None:
+                    initial = min(max(self.initial_for(provider), self.min_limit), self.max_limit)
+                    limiter = self._limiters[provider] = AIMDLimiter(initial, self.min_limit, self.max_limit)
+        return limiter
+
+    def limit(self, provider):
+        """Calls currently allowed in flight for a provider"""
+        return self.limiter(provider).current()
+
+    def observe(self, provider, latency, status=200, headers=None, timed_out=False):
+        """Feed one call's outcome into the provider's limiter"""
+        limiter = self.limiter(provider)
+        before = limiter.current()
+        pause = limiter.observe(latency, status, headers, timed_out)
+        if self.on_change is None:
+            return
+        if pause:
+            # Wake waiters again once the pause is over
+            timer = threading.Timer(pause, self.on_change, args=(provider,))
+            timer.daemon = True
+            timer.start()
+        if limiter.current() > before:
+            self.on_change(provider)
+
+    def stats(self):
+        """Limiter state per provider"""
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {provider: limiter.stats() for provider, limiter in limiters.items()}
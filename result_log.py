@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Append-only JSONL Result Log
+Stores one query record per line, optionally gzip or zstd compressed
+"""
+
+import os
+import json
+import gzip
+import zlib
+from datetime import datetime
+
+try:
+    import zstandard
+    has_zstd = True
+except ImportError:
+    zstandard = None
+    has_zstd = False
+
+
+COMPRESSION_SUFFIXES = {
+    'none': '.jsonl',
+    'gzip': '.jsonl.gz',
+    'zstd': '.jsonl.zst',
+}
+
+
+def detect_compression(path):
+    """Guess the compression of a result log from its file name"""
+    if path.endswith('.gz'):
+        return 'gzip'
+    if path.endswith('.zst'):
+        return 'zstd'
+    return 'none'
+
+
+class ResultLog:
+    """Append-only log of query records.
+
+    Every record is written as its own line (or its own gzip/zstd frame), so a
+    record can be located by the byte offset and length returned from
+    append() and read back without touching the rest of the file.
+    """
+
+    def __init__(self, path, compression=None):
+        if compression is None:
+            compression = detect_compression(path)
+        compression = compression.lower()
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown result log compression: {compression}")
+        if compression == 'zstd' and not has_zstd:
+            raise ValueError("zstd compression requires the zstandard package (pip install zstandard)")
+
+        self.path = path
+        self.compression = compression
+        self.records_written = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def create(cls, directory='results', prefix='results', compression='none'):
+        """Create a new timestamped log in the given directory"""
+        compression = (compression or 'none').lower()
+        if compression == 'zstd' and not has_zstd:
+            print("[WARNING] zstandard is not installed - falling back to gzip compression")
+            compression = 'gzip'
+        suffix = COMPRESSION_SUFFIXES.get(compression, '.jsonl')
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return cls(os.path.join(directory, f"{prefix}_{timestamp}{suffix}"), compression)
+
+    def _encode(self, record):
+        """Serialize a record into the bytes that go on disk"""
+        line = json.dumps(record, default=str, separators=(',', ':')).encode('utf-8') + b'\n'
+        if self.compression == 'gzip':
+            # Each record is a complete gzip member; concatenated members are still a valid .gz file
+            return gzip.compress(line)
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor().compress(line)
+        return line
+
+    def _decode(self, data):
+        """Turn the bytes of one record back into a dict"""
+        if self.compression == 'gzip':
+            data = zlib.decompressobj(wbits=31).decompress(data)
+        elif self.compression == 'zstd':
+            data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        return json.loads(data.decode('utf-8'))
+
+    def append(self, record):
+        """Append one record and return its {'offset', 'length'} location"""
+        data = self._encode(record)
+        with open(self.path, 'ab') as f:
+            offset = f.tell()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.records_written += 1
+        return {'offset': offset, 'length': len(data)}
+
+    def read(self, offset, length):
+        """Read a single record by its location"""
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return self._decode(f.read(length))
+
+    @staticmethod
+    def _zstd_lines(f):
+        """Lines of a file of zstd frames; raises EOFError if the last frame is cut short"""
+        decompressor = zstandard.ZstdDecompressor()
+        frame = decompressor.decompressobj()
+        in_frame = False
+        buffer = b''
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            while chunk:
+                in_frame = True
+                buffer += frame.decompress(chunk)
+                if not frame.eof:
+                    break
+                # Each record is its own frame: start over on whatever follows it
+                chunk, frame, in_frame = frame.unused_data, decompressor.decompressobj(), False
+            *complete, buffer = buffer.split(b'\n')
+            for line in complete:
+                yield line + b'\n'
+        if buffer:
+            yield buffer
+        if in_frame:
+            raise EOFError()
+
+    def __iter__(self):
+        """Iterate over every record in the log, in write order"""
+        if not os.path.exists(self.path):
+            return
+        f = gzip.open(self.path, 'rb') if self.compression == 'gzip' else open(self.path, 'rb')
+        truncated = (EOFError, zstandard.ZstdError) if has_zstd else (EOFError,)
+        with f:
+            lines = self._zstd_lines(f) if self.compression == 'zstd' else f
+            try:
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    if not line.endswith(b'\n'):
+                        # Only the last record can lack its newline: its append was cut short
+                        raise EOFError()
+                    yield json.loads(line.decode('utf-8'))
+            except truncated:
+                print(f"[WARNING] {self.path} ends in a partly written record - skipping it")
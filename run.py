@@ -10,8 +10,16 @@ import json
 import time
 import argparse
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from analyzer import ResponseAnalyzer
+from result_log import ResultLog
+from checkpoint import BatchCheckpoint, checkpoint_path_for
+from sharding import parse_shard, select_shard, shard_path, shard_tag
+from sampling import analyze_samples, mention_frequencies, display_frequencies
+from monitor import MonitorState, monitor_state_path_for
+from rate_control import error_signals
 
 print("=" * 60)
 print("LLM Multi-Query Script - Fixed Version")
@@ -55,8 +63,9 @@ if os.path.exists(".env"):
     # Try to load it
     if has_dotenv:
         from dotenv import load_dotenv
-        # Force override system environment variables with .env values
-        load_dotenv(override=True)
+        # Force override system environment variables with .env values - from the file just found,
+        # not whichever .env python-dotenv would find next to this script
+        load_dotenv(".env", override=True)
         print("[OK] .env file loaded (overriding system env)")
     else:
         print("[WARNING] Cannot load .env - python-dotenv not installed")
@@ -131,6 +140,11 @@ print()
 
 # Fixed LLM tester class
 class FixedLLMTester:
+    # Providers that can return several completions from one request (OpenAI's n parameter)
+    NATIVE_SAMPLING = ('openai',)
+    # Providers worth sampling at all - search results do not vary between calls
+    SAMPLED_PROVIDERS = ('openai', 'anthropic', 'perplexity', 'google')
+    
     def __init__(self):
         self.results = []
         # Store global variables as instance variables
@@ -139,9 +153,36 @@ class FixedLLMTester:
         self.has_openai = has_openai
         self.has_anthropic = has_anthropic
         self.has_google = has_google
+        
+        # API clients hold connection pools, so build each once and reuse it across calls
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+        
+        # Optional rate_control.AdaptiveConcurrency fed with every call's latency, status and rate-limit headers
+        self.rate_control = None
+    
+    def _client(self, name, factory):
+        """Cached API client for a provider, created with factory() on first use"""
+        client = self._clients.get(name)
+        if client is None:
+            with self._clients_lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = factory()
+        return client
     
-    def test_openai(self, prompt):
-        """Test OpenAI API with version detection"""
+    def _observe(self, provider, started, headers=None, error=None, status=200):
+        """Report a call's outcome to the adaptive concurrency limits, if enabled"""
+        if self.rate_control is None:
+            return
+        timed_out = False
+        if error is not None:
+            status, error_headers, timed_out = error_signals(error)
+            headers = headers if headers is not None else error_headers
+        self.rate_control.observe(provider, time.time() - started, status, headers, timed_out)
+    
+    def test_openai(self, prompt, samples=1):
+        """Test OpenAI API with version detection; samples > 1 asks for that many completions in one request (n)"""
         if 'openai' not in self.configured_providers or not self.has_openai:
             return {'provider': 'OpenAI', 'error': 'Not configured or library not installed'}
         
@@ -157,14 +198,23 @@ class FixedLLMTester:
                 # New OpenAI client (v1.x)
                 try:
                     from openai import OpenAI
-                    client = OpenAI(api_key=self.api_keys['openai'])
+                    client = self._client('openai', lambda: OpenAI(api_key=self.api_keys['openai']))
                     
-                    response = client.chat.completions.create(
-                        model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=int(os.getenv('MAX_TOKENS', 1000)),
-                        temperature=0.7
-                    )
+                    # Raw response so the rate-limit headers are kept
+                    started = time.time()
+                    try:
+                        raw = client.chat.completions.with_raw_response.create(
+                            model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
+                            messages=[{"role": "user", "content": prompt}],
+                            max_tokens=int(os.getenv('MAX_TOKENS', 1000)),
+                            temperature=0.7,
+                            n=samples
+                        )
+                    except Exception as e:
+                        self._observe('openai', started, error=e)
+                        raise
+                    self._observe('openai', started, raw.headers)
+                    response = raw.parse()
                     
                     result = {
                         'provider': 'OpenAI',
@@ -179,7 +229,8 @@ class FixedLLMTester:
                         model=os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo'),
                         messages=[{"role": "user", "content": prompt}],
                         max_tokens=int(os.getenv('MAX_TOKENS', 1000)),
-                        temperature=0.7
+                        temperature=0.7,
+                        n=samples
                     )
                     
                     result = {
@@ -195,7 +246,8 @@ class FixedLLMTester:
                     model=os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo'),
                     messages=[{"role": "user", "content": prompt}],
                     max_tokens=int(os.getenv('MAX_TOKENS', 1000)),
-                    temperature=0.7
+                    temperature=0.7,
+                    n=samples
                 )
                 
                 result = {
@@ -205,6 +257,9 @@ class FixedLLMTester:
                     'success': True
                 }
             
+            if samples > 1:
+                result['samples'] = [choice.message.content for choice in response.choices]
+            
             print(f"[OK] OpenAI responded successfully")
             return result
             
@@ -221,13 +276,20 @@ class FixedLLMTester:
             import anthropic
             print("Testing Anthropic...")
             
-            client = anthropic.Anthropic(api_key=self.api_keys['anthropic'])
+            client = self._client('anthropic', lambda: anthropic.Anthropic(api_key=self.api_keys['anthropic']))
             
-            response = client.messages.create(
-                model=os.getenv('ANTHROPIC_MODEL', 'claude-3-5-sonnet-20241022'),
-                max_tokens=int(os.getenv('MAX_TOKENS', 1000)),
-                messages=[{"role": "user", "content": prompt}]
-            )
+            started = time.time()
+            try:
+                raw = client.messages.with_raw_response.create(
+                    model=os.getenv('ANTHROPIC_MODEL', 'claude-3-5-sonnet-20241022'),
+                    max_tokens=int(os.getenv('MAX_TOKENS', 1000)),
+                    messages=[{"role": "user", "content": prompt}]
+                )
+            except Exception as e:
+                self._observe('anthropic', started, error=e)
+                raise
+            self._observe('anthropic', started, raw.headers)
+            response = raw.parse()
             
             result = {
                 'provider': 'Anthropic',
@@ -259,16 +321,23 @@ class FixedLLMTester:
                 try:
                     # New OpenAI client (v1.x)
                     from openai import OpenAI
-                    client = OpenAI(
+                    client = self._client('perplexity', lambda: OpenAI(
                         api_key=self.api_keys['perplexity'],
                         base_url="https://api.perplexity.ai"
-                    )
+                    ))
                     
-                    response = client.chat.completions.create(
-                        model=os.getenv('PERPLEXITY_MODEL', 'llama-3.1-sonar-small-128k-online'),
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=int(os.getenv('MAX_TOKENS', 1000))
-                    )
+                    started = time.time()
+                    try:
+                        raw = client.chat.completions.with_raw_response.create(
+                            model=os.getenv('PERPLEXITY_MODEL', 'llama-3.1-sonar-small-128k-online'),
+                            messages=[{"role": "user", "content": prompt}],
+                            max_tokens=int(os.getenv('MAX_TOKENS', 1000))
+                        )
+                    except Exception as e:
+                        self._observe('perplexity', started, error=e)
+                        raise
+                    self._observe('perplexity', started, raw.headers)
+                    response = raw.parse()
                     
                     result = {
                         'provider': 'Perplexity',
@@ -305,15 +374,22 @@ class FixedLLMTester:
             from google import genai
             print("Using new google.genai library...")
             
-            client = genai.Client(api_key=self.api_keys['google'])
+            client = self._client('google', lambda: genai.Client(api_key=self.api_keys['google']))
             
             # Use gemini-2.5-flash by default for new client, fallback to env setting
             model_name = os.getenv('GOOGLE_MODEL', 'gemini-2.5-flash')
             
-            response = client.models.generate_content(
-                model=model_name,
-                contents=prompt
-            )
+            # The genai client does not expose response headers; latency and errors still count
+            started = time.time()
+            try:
+                response = client.models.generate_content(
+                    model=model_name,
+                    contents=prompt
+                )
+            except Exception as e:
+                self._observe('google', started, error=e)
+                raise
+            self._observe('google', started)
             
             result = {
                 'provider': 'Google',
@@ -371,7 +447,14 @@ class FixedLLMTester:
                 'num': 10  # Get top 10 results
             }
             
-            response = requests.get(url, params=params, timeout=int(os.getenv('REQUEST_TIMEOUT', 30)))
+            session = self._client('google_search', requests.Session)
+            started = time.time()
+            try:
+                response = session.get(url, params=params, timeout=int(os.getenv('REQUEST_TIMEOUT', 30)))
+            except Exception as e:
+                self._observe('google_search', started, error=e)
+                raise
+            self._observe('google_search', started, response.headers, status=response.status_code)
             
             if response.status_code != 200:
                 return {
@@ -405,8 +488,51 @@ class FixedLLMTester:
             print(f"[ERROR] Google Search error: {e}")
             return {'provider': 'Google Search', 'error': str(e)}
     
-    def test_all(self, prompt):
-        """Test all configured providers"""
+    def test_provider(self, provider, prompt, samples=1):
+        """Test a single provider by its id (openai, anthropic, ...), optionally sampling it several times"""
+        if samples > 1 and provider in self.SAMPLED_PROVIDERS and provider not in self.NATIVE_SAMPLING:
+            result = self._sample_concurrently(provider, prompt, samples)
+            if result is None:
+                return None
+        elif provider == 'openai':
+            result = self.test_openai(prompt, samples)
+        elif provider == 'anthropic':
+            result = self.test_anthropic(prompt)
+        elif provider == 'perplexity':
+            result = self.test_perplexity(prompt)
+        elif provider == 'google':
+            result = self.test_google(prompt)
+        elif provider == 'google_search':
+            result = self.test_google_search(prompt)
+        else:
+            return None
+        
+        # Keep the id next to the display name so results can be matched back to providers
+        result['provider_id'] = provider
+        return result
+    
+    def _sample_concurrently(self, provider, prompt, samples):
+        """Send the same prompt several times at once and fold the answers into one result"""
+        method = getattr(self, f"test_{provider}", None)
+        if method is None:
+            return None
+        
+        workers = max(1, min(samples, int(os.getenv('SAMPLE_CONCURRENCY', 5))))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"sample-{provider}") as executor:
+            results = list(executor.map(lambda _: method(prompt), range(samples)))
+        
+        successful = [r for r in results if 'error' not in r]
+        if not successful:
+            return results[0]
+        
+        result = dict(successful[0])
+        result['samples'] = [r['response'] for r in successful]
+        if len(successful) < samples:
+            result['sample_errors'] = [r['error'] for r in results if 'error' in r]
+        return result
+    
+    def test_all(self, prompt, providers=None, samples=1):
+        """Test all configured providers (or only the given subset)"""
         print("\n" + "=" * 60)
         print("Testing LLM APIs...")
         print("=" * 60 + "\n")
@@ -414,17 +540,10 @@ class FixedLLMTester:
         results = []
         
         # Test each provider
-        for provider in self.configured_providers:
-            if provider == 'openai':
-                results.append(self.test_openai(prompt))
-            elif provider == 'anthropic':
-                results.append(self.test_anthropic(prompt))
-            elif provider == 'perplexity':
-                results.append(self.test_perplexity(prompt))
-            elif provider == 'google':
-                results.append(self.test_google(prompt))
-            elif provider == 'google_search':
-                results.append(self.test_google_search(prompt))
+        for provider in (self.configured_providers if providers is None else providers):
+            result = self.test_provider(provider, prompt, samples)
+            if result is not None:
+                results.append(result)
             
             print()  # Space between tests
         
@@ -537,13 +656,24 @@ def select_questions_interactive(questions):
         except ValueError:
             print("Please enter a valid number.")
 
-def run_single_query(tester, query, analyzer=None, save_individual=True):
+def build_output_record(query, results):
+    """Build the record stored for one query (individual JSON file or result log line)"""
+    now = datetime.now()
+    return {
+        'query': query,
+        'timestamp': now.isoformat(),
+        'date': now.strftime('%Y-%m-%d'),
+        'time': now.strftime('%H:%M:%S'),
+        'results': results
+    }
+
+def run_single_query(tester, query, analyzer=None, save_individual=True, providers=None, samples=1):
     """Run a single query and return results"""
     print(f"\nQuery: {query}")
     print("-" * 60)
     
     # Run tests
-    results = tester.test_all(query)
+    results = tester.test_all(query, providers, samples)
     
     # Display results
     tester.display_results(results)
@@ -559,23 +689,32 @@ def run_single_query(tester, query, analyzer=None, save_individual=True):
             if result.get('provider') == 'Google Search':
                 continue
                 
-            if 'error' not in result and result.get('response'):
+            if 'error' not in result and result.get('samples'):
+                # Analyze every sample that came back, even if only one did, so sampled runs always report
+                # mention rates; the first successful analysis stands in for the usual single analysis
+                analyses = analyze_samples(analyzer, result['samples'], query, result['provider'])
+                result['sample_analysis'] = mention_frequencies(analyses)
+                display_frequencies(result['sample_analysis'], result['provider'])
+                analysis = next((analysis for analysis in analyses if analysis), None)
+            elif 'error' not in result and result.get('response'):
                 # Analyze the response
                 analysis = analyzer.analyze_with_ai(
                     result['response'],
                     query,
                     result['provider']
                 )
+            else:
+                analysis = None
+            
+            if analysis:
+                # Add analysis to result
+                result['analysis'] = analysis
                 
-                if analysis:
-                    # Add analysis to result
-                    result['analysis'] = analysis
-                    
-                    # Save to CSV
-                    analyzer.save_to_csv(analysis)
-                    
-                    # Display insights
-                    analyzer.display_insights(analysis)
+                # Save to CSV
+                analyzer.save_to_csv(analysis)
+                
+                # Display insights
+                analyzer.display_insights(analysis)
     
     # Save results if requested
     if save_individual:
@@ -587,13 +726,7 @@ def run_single_query(tester, query, analyzer=None, save_individual=True):
         
         filename = f"results/llm_results_{slug}_{timestamp}.json"
         
-        output_data = {
-            'query': query,
-            'timestamp': datetime.now().isoformat(),
-            'date': datetime.now().strftime('%Y-%m-%d'),
-            'time': datetime.now().strftime('%H:%M:%S'),
-            'results': results
-        }
+        output_data = build_output_record(query, results)
         
         with open(filename, 'w') as f:
             json.dump(output_data, f, indent=2, default=str)
@@ -602,6 +735,312 @@ def run_single_query(tester, query, analyzer=None, save_individual=True):
     
     return results
 
+def refuse_unfinished_checkpoint(checkpoint_path, questions_file, force=False, shard=None):
+    """Stop before a fresh run overwrites the resume state of an interrupted one (unless --force)"""
+    unfinished = BatchCheckpoint.unfinished(checkpoint_path)
+    if unfinished is None:
+        return
+    if force:
+        print(f"[WARNING] Discarding the unfinished checkpoint at {checkpoint_path} (--force)")
+        return
+    shard_arg = f" --shard {shard[0]}/{shard[1]}" if shard else ""
+    print(f"[ERROR] {checkpoint_path} belongs to an unfinished batch started {unfinished.header.get('started', 'earlier')}")
+    print(f"Resume it with: python3 run.py --batch --file {questions_file}{shard_arg} --resume")
+    print("Or pass --force to start over and discard its resume state")
+    sys.exit(1)
+
+def save_batch_summary(tester, queries, result_log, checkpoint, checkpoint_path, shard=None, extra=None):
+    """Write the batch summary for a result log; returns it with the queries still missing providers"""
+    # Save batch summary
+    print("\n" + "=" * 60)
+    print("SAVING BATCH SUMMARY")
+    print("=" * 60 + "\n")
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    os.makedirs('results', exist_ok=True)
+    summary_filename = f"results/batch_summary_{timestamp}.json"
+    if shard:
+        summary_filename = shard_path(summary_filename, shard)
+    
+    # The summary is only an index into the result log - responses are stored once.
+    # It is built from the checkpoint, so results from earlier attempts are merged in.
+    batch_index = checkpoint.build_index(queries)
+    incomplete = [entry['query'] for entry in batch_index
+                  if set(tester.configured_providers) - set(entry['successful'])]
+    
+    summary_data = {
+        'batch_timestamp': datetime.now().isoformat(),
+        'total_queries': len(queries),
+        'queries_run': queries,
+        'result_log': result_log.path,
+        'compression': result_log.compression,
+        'checkpoint': checkpoint_path,
+        'shard': f"{shard[0]}/{shard[1]}" if shard else None,
+        'complete': not incomplete,
+        'index': batch_index
+    }
+    summary_data.update(extra or {})
+    if not incomplete:
+        checkpoint.mark_complete()
+    
+    with open(summary_filename, 'w') as f:
+        json.dump(summary_data, f, indent=2, default=str)
+    
+    print(f"Results log saved to: {result_log.path}")
+    print(f"Batch summary saved to: {summary_filename}")
+    
+    return summary_data, incomplete
+
+def run_batch(tester, queries, analyzer=None, questions_file='questions.txt', compression='none', resume=False, shard=None, samples=1, force=False):
+    """Run many queries, appending to a result log and checkpointing every (question, provider) pair"""
+    # Shards keep their own checkpoint, result log and summary so they never write to the same file
+    checkpoint_path = checkpoint_path_for(questions_file)
+    if shard:
+        checkpoint_path = shard_path(checkpoint_path, shard)
+    checkpoint = BatchCheckpoint.load(checkpoint_path) if resume else None
+    
+    if checkpoint:
+        # Keep appending to the log of the interrupted run so old and new results live together
+        try:
+            result_log = ResultLog(checkpoint.header['result_log'], checkpoint.header.get('compression'))
+        except ValueError as e:
+            print(f"[ERROR] Cannot resume {checkpoint.header['result_log']}: {e}")
+            print(f"Install what it needs and resume again, or start over with: python3 run.py --batch --file {questions_file} --force")
+            sys.exit(1)
+        done = sum(1 for q in queries for p in tester.configured_providers if checkpoint.is_done(q, p))
+        print(f"\n[INFO] Resuming from checkpoint: {checkpoint_path}")
+        print(f"[INFO] {done} of {len(queries) * len(tester.configured_providers)} question/provider pairs already complete")
+    else:
+        if resume:
+            print(f"[WARNING] No checkpoint found at {checkpoint_path} - starting a new batch")
+        else:
+            refuse_unfinished_checkpoint(checkpoint_path, questions_file, force, shard)
+        prefix = f"batch_results_{shard_tag(shard)}" if shard else 'batch_results'
+        result_log = ResultLog.create('results', prefix=prefix, compression=compression)
+        checkpoint = BatchCheckpoint.start(checkpoint_path, questions_file, result_log, shard)
+    
+    print(f"\n[INFO] Running {len(queries)} queries...")
+    print(f"[INFO] Writing results to: {result_log.path}")
+    print("=" * 60)
+    
+    interrupted = False
+    try:
+        for i, query in enumerate(queries, 1):
+            pending = checkpoint.pending_providers(query, tester.configured_providers)
+            if not pending:
+                print(f"\n[{i}/{len(queries)}] Already complete, skipping: {query}")
+                continue
+            
+            print(f"\n[{i}/{len(queries)}] Processing query...")
+            results = run_single_query(tester, query, analyzer, save_individual=False, providers=pending, samples=samples)
+            location = result_log.append(build_output_record(query, results))
+            checkpoint.record(query, results, location)
+            
+            # Add a small delay between queries to avoid rate limiting
+            if i < len(queries):
+                time.sleep(2)
+    except KeyboardInterrupt:
+        interrupted = True
+        print("\n[WARNING] Batch interrupted - writing summary of completed pairs")
+    
+    summary_data, incomplete = save_batch_summary(tester, queries, result_log, checkpoint, checkpoint_path, shard)
+    
+    if incomplete:
+        print(f"\n[WARNING] {len(incomplete)} queries have failed or missing providers")
+        shard_arg = f" --shard {shard[0]}/{shard[1]}" if shard else ""
+        print(f"Re-run with --resume to retry only those: python3 run.py --batch --file {questions_file}{shard_arg} --resume")
+    
+    if interrupted:
+        sys.exit(130)
+    
+    return summary_data
+
+def run_bulk(tester, queries, analyzer=None, questions_file='questions.txt', compression='none', resume=False, force=False):
+    """Run many queries through the providers' batch APIs and write the usual result log, checkpoint and summary"""
+    # Bulk results replace the checkpoint, so check before paying for any jobs
+    checkpoint_path = checkpoint_path_for(questions_file)
+    refuse_unfinished_checkpoint(checkpoint_path, questions_file, force)
+    
+    from bulk import (BATCH_PROVIDERS, OpenAIBatch, AnthropicBatch, BulkRunner, BulkStateMismatch,
+                      bulk_state_path_for, question_request, questions_fingerprint)
+    
+    batch_classes = {'openai': OpenAIBatch, 'anthropic': AnthropicBatch}
+    clients = {p: batch_classes[p](tester.api_keys[p]) for p in tester.configured_providers if p in BATCH_PROVIDERS}
+    direct = [p for p in tester.configured_providers if p not in BATCH_PROVIDERS]
+    analyze = analyzer is not None and analyzer.analyze_enabled
+    if analyze and analyzer.analysis_provider not in clients:
+        # The analysis provider gets a batch client even when it is not one of the queried providers
+        clients[analyzer.analysis_provider] = batch_classes[analyzer.analysis_provider](analyzer.api_key)
+    
+    state_path = bulk_state_path_for(questions_file)
+    try:
+        runner = BulkRunner(clients, state_path, resume=resume, fingerprint=questions_fingerprint(queries))
+    except BulkStateMismatch as e:
+        print(f"[ERROR] {e} - {questions_file} changed since those jobs were submitted")
+        print("Restore the original questions to resume, or run without --resume to submit new jobs")
+        sys.exit(1)
+    names = {'openai': 'OpenAI', 'anthropic': 'Anthropic'}
+    
+    print(f"\n[INFO] Bulk mode: {len(queries)} queries via batch APIs for {', '.join(p for p in clients if p in tester.configured_providers) or 'no providers'}")
+    if direct:
+        print(f"[INFO] No batch API for {', '.join(direct)} - those are queried directly")
+    print("=" * 60)
+    
+    # Providers without a batch API are queried while the batch jobs are pending, not after them
+    stop_direct = threading.Event()
+    
+    def query_direct():
+        answers = []
+        for query in queries:
+            if stop_direct.is_set():
+                break
+            answers.append(tester.test_all(query, direct))
+        return answers
+    
+    direct_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bulk-direct')
+    try:
+        direct_future = direct_executor.submit(query_direct) if direct else None
+        requests_by_provider = {
+            p: [(f"q{i}-{p}", question_request(p, query)) for i, query in enumerate(queries)]
+            for p in clients if p in tester.configured_providers
+        }
+        outcomes = runner.run('questions', requests_by_provider)
+        direct_answers = direct_future.result() if direct_future else [[] for _ in queries]
+        
+        all_results = []
+        for i, query in enumerate(queries):
+            results = []
+            for p in requests_by_provider:
+                outcome = outcomes.get(f"q{i}-{p}") or {'error': 'No result returned by the batch job'}
+                if 'error' in outcome:
+                    results.append({'provider': names[p], 'provider_id': p, 'error': outcome['error']})
+                else:
+                    results.append({'provider': names[p], 'provider_id': p, 'response': outcome['text'],
+                                    'model': outcome['model'], 'success': True})
+            results.extend(direct_answers[i])
+            all_results.append(results)
+        
+        if analyze:
+            # One analysis request per successful LLM answer, all in a single batch on the analysis provider
+            requests_by_provider = {analyzer.analysis_provider: [
+                (f"a{i}-{result['provider_id']}", analyzer.build_analysis_request(result['response'], query, result['provider']))
+                for i, (query, results) in enumerate(zip(queries, all_results))
+                for result in results
+                if 'error' not in result and result.get('response') and result['provider_id'] != 'google_search'
+            ]}
+            outcomes = runner.run('analysis', requests_by_provider)
+            analyzed = {custom_id for custom_id, _ in requests_by_provider[analyzer.analysis_provider]}
+            for i, (query, results) in enumerate(zip(queries, all_results)):
+                for result in results:
+                    custom_id = f"a{i}-{result['provider_id']}"
+                    if custom_id not in analyzed:
+                        continue
+                    outcome = outcomes.get(custom_id) or {}
+                    analyzer.record_usage(outcome.get('usage'))
+                    analysis = analyzer.analysis_from_text(outcome.get('text'), result['response'], query, result['provider'])
+                    result['analysis'] = analysis
+                    analyzer.save_to_csv(analysis)
+    except KeyboardInterrupt:
+        print("\n[WARNING] Stopped while waiting - the batch jobs keep running at the provider")
+        print(f"Re-run with --resume to pick them up again: python3 run.py --batch --bulk --file {questions_file} --resume")
+        sys.exit(130)
+    finally:
+        # Let an interrupted run exit after the direct question in progress
+        stop_direct.set()
+        direct_executor.shutdown(wait=False)
+    
+    # Same outputs as a regular batch, so --batch --resume can retry anything that failed
+    result_log = ResultLog.create('results', prefix='batch_results', compression=compression)
+    checkpoint = BatchCheckpoint.start(checkpoint_path, questions_file, result_log)
+    for query, results in zip(queries, all_results):
+        location = result_log.append(build_output_record(query, results))
+        checkpoint.record(query, results, location)
+    
+    summary_data, incomplete = save_batch_summary(tester, queries, result_log, checkpoint, checkpoint_path,
+                                                  extra={'mode': 'bulk'})
+    runner.finish()
+    
+    if incomplete:
+        print(f"\n[WARNING] {len(incomplete)} queries have failed or missing providers")
+        print(f"Retry only those directly: python3 run.py --batch --file {questions_file} --resume")
+    
+    return summary_data
+
+def run_monitor(tester, queries, analyzer=None, questions_file='questions.txt', compression='none', budget=None):
+    """One monitoring tick: re-query only the stalest (question, provider) pairs, at most `budget` of them"""
+    state_path = monitor_state_path_for(questions_file)
+    state = MonitorState(state_path)
+    providers = tester.configured_providers
+    # Plan once: the budget only cuts the stalest-first list of due pairs
+    due = state.plan(queries, providers)
+    plan = due if budget is None else due[:budget]
+    
+    print(f"\n[INFO] Monitoring {len(queries)} questions x {len(providers)} providers from: {state_path}")
+    print(f"[INFO] {len(due)} pairs due, running {len(plan)}" + (f" (budget {budget})" if budget is not None else ""))
+    print("=" * 60)
+    
+    # Group the chosen pairs by question, keeping the stalest questions first
+    by_query = {}
+    for query, provider in plan:
+        by_query.setdefault(query, []).append(provider)
+    
+    result_log = None
+    ran = []
+    interrupted = False
+    try:
+        for i, (query, pending) in enumerate(by_query.items(), 1):
+            if result_log is None:
+                result_log = ResultLog.create('results', prefix='monitor_results', compression=compression)
+                print(f"[INFO] Writing results to: {result_log.path}")
+            
+            print(f"\n[{i}/{len(by_query)}] Refreshing {', '.join(pending)}...")
+            results = run_single_query(tester, query, analyzer, save_individual=False, providers=pending)
+            location = result_log.append(build_output_record(query, results))
+            for result in results:
+                entry = state.record(query, result, result_log.path, location)
+                ran.append({'query': query, 'provider': entry['provider'], 'status': entry['last_status'],
+                            'volatility': entry['volatility'], 'change': entry.get('last_change')})
+            # Saved after every question so an interrupted tick keeps what it paid for
+            state.save()
+            
+            if i < len(by_query):
+                time.sleep(2)
+    except KeyboardInterrupt:
+        interrupted = True
+        print("\n[WARNING] Monitoring interrupted - writing summary of refreshed pairs")
+    
+    coverage = state.coverage(queries, providers)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    os.makedirs('results', exist_ok=True)
+    summary_filename = f"results/monitor_summary_{timestamp}.json"
+    summary_data = {
+        'monitor_timestamp': datetime.now().isoformat(),
+        'questions_file': questions_file,
+        'state': state_path,
+        'result_log': result_log.path if result_log else None,
+        'budget': budget,
+        'due': due,
+        'refreshed': ran,
+        'coverage': coverage
+    }
+    with open(summary_filename, 'w') as f:
+        json.dump(summary_data, f, indent=2, default=str)
+    
+    print("\n" + "=" * 60)
+    print("MONITORING SUMMARY")
+    print("=" * 60)
+    print(f"Refreshed {len(ran)} pairs ({sum(1 for r in ran if r['status'] == 'failed')} failed), {max(due - len(plan), 0)} due pairs left for the next tick")
+    print(f"{coverage['within_interval']}/{coverage['pairs']} pairs within their re-check interval"
+          + (f", oldest answer {coverage['max_age_hours']}h" if coverage['max_age_hours'] is not None else ""))
+    if coverage['never_answered']:
+        print(f"[WARNING] {coverage['never_answered']} pairs have no answer yet")
+    print(f"Monitor summary saved to: {summary_filename}")
+    
+    if interrupted:
+        sys.exit(130)
+    
+    return summary_data
+
 # Main execution
 if __name__ == "__main__":
     # Set up argument parser
@@ -610,8 +1049,50 @@ if __name__ == "__main__":
     parser.add_argument('--batch', '-b', action='store_true', help='Run all questions from questions.txt')
     parser.add_argument('--select', '-s', action='store_true', help='Select questions interactively')
     parser.add_argument('--file', '-f', type=str, default='questions.txt', help='Questions file to use (default: questions.txt)')
+    parser.add_argument('--compress', type=str, choices=['none', 'gzip', 'zstd'],
+                        default=os.getenv('RESULT_LOG_COMPRESSION', 'none').lower(),
+                        help='Compression for the batch result log (default: none, or RESULT_LOG_COMPRESSION)')
+    parser.add_argument('--resume', '-r', action='store_true', help='Resume the last batch for --file, retrying only failed or missing pairs')
+    parser.add_argument('--force', action='store_true', help='Start a new batch even if the last one for --file is unfinished, discarding its resume state')
+    parser.add_argument('--samples', '-n', type=int, default=1,
+                        help='Ask every provider this many times per question and report mention rates with confidence intervals (default: 1)')
+    parser.add_argument('--bulk', action='store_true',
+                        help='Submit the batch through the OpenAI/Anthropic batch APIs and wait for the results (cheaper, not real-time)')
+    parser.add_argument('--shard', type=str, help='Run only shard i of N of the questions file, e.g. --shard 2/8 (with --batch)')
+    parser.add_argument('--monitor', action='store_true',
+                        help='Recurring run: re-query only pairs that are stale for how often their answers change (with --batch)')
+    parser.add_argument('--budget', type=int,
+                        help='Most (question, provider) calls one --monitor run may make (default: MONITOR_BUDGET, or all due pairs)')
     
     args = parser.parse_args()
+    if args.samples < 1:
+        parser.error('--samples must be at least 1')
+    
+    if args.bulk and not args.batch:
+        parser.error('--bulk requires --batch')
+    if args.bulk and (args.shard or args.samples > 1):
+        parser.error('--bulk cannot be combined with --shard or --samples')
+    if args.monitor and not args.batch:
+        parser.error('--monitor requires --batch')
+    if args.monitor and (args.bulk or args.shard or args.resume or args.samples > 1):
+        parser.error('--monitor cannot be combined with --bulk, --shard, --resume or --samples')
+    if args.budget is not None and (args.budget < 1 or not args.monitor):
+        parser.error('--budget must be at least 1 and requires --monitor')
+    if args.monitor and args.budget is None and os.getenv('MONITOR_BUDGET'):
+        args.budget = int(os.getenv('MONITOR_BUDGET'))
+        if args.budget < 1:
+            parser.error('MONITOR_BUDGET must be at least 1')
+    
+    shard = None
+    if args.shard:
+        if not args.batch:
+            parser.error('--shard requires --batch')
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        # Each shard appends to its own analysis CSV; sharding.py merge combines them
+        os.environ['ANALYSIS_CSV_PATH'] = shard_path(os.getenv('ANALYSIS_CSV_PATH', 'analysis_results.csv'), shard)
     
     print("\n" + "=" * 60)
     print("STARTING TESTS")
@@ -638,7 +1119,11 @@ if __name__ == "__main__":
             sys.exit(1)
         
         queries_to_run = questions
-        print(f"Batch mode: Running {len(questions)} questions from {args.file}")
+        if shard:
+            queries_to_run = select_shard(questions, shard)
+            print(f"Batch mode: Running shard {args.shard} ({len(queries_to_run)} of {len(questions)} questions) from {args.file}")
+        else:
+            print(f"Batch mode: Running {len(questions)} questions from {args.file}")
         
     elif args.select:
         # Select mode - interactive selection
@@ -662,55 +1147,43 @@ if __name__ == "__main__":
             print(f"Using default prompt: '{test_prompt}'")
         queries_to_run = [test_prompt]
     
-    # Check if we have queries to run
-    if not queries_to_run:
+    # Check if we have queries to run (an empty shard still writes its checkpoint for the merge)
+    if not queries_to_run and not shard:
         print("[ERROR] No queries to run.")
         sys.exit(1)
     
     # Run queries
-    all_results = []
-    
-    if len(queries_to_run) == 1:
+    if args.monitor:
+        # Incremental refresh - only the pairs whose answers are due for a re-check
+        run_monitor(tester, queries_to_run, analyzer,
+                    questions_file=args.file,
+                    compression=args.compress,
+                    budget=args.budget)
+        
+    elif args.bulk:
+        # Provider batch jobs - results arrive when the provider is done
+        run_bulk(tester, queries_to_run, analyzer,
+                 questions_file=args.file,
+                 compression=args.compress,
+                 resume=args.resume,
+                 force=args.force)
+        
+    elif len(queries_to_run) == 1 and not shard:
         # Single query
-        results = run_single_query(tester, queries_to_run[0], analyzer, save_individual=True)
-        all_results.append({'query': queries_to_run[0], 'results': results})
+        run_single_query(tester, queries_to_run[0], analyzer, save_individual=True, samples=args.samples)
         
     else:
         # Multiple queries
-        print(f"\n[INFO] Running {len(queries_to_run)} queries...")
-        print("=" * 60)
-        
-        for i, query in enumerate(queries_to_run, 1):
-            print(f"\n[{i}/{len(queries_to_run)}] Processing query...")
-            results = run_single_query(tester, query, analyzer, save_individual=True)
-            all_results.append({'query': query, 'results': results})
-            
-            # Add a small delay between queries to avoid rate limiting
-            if i < len(queries_to_run):
-                time.sleep(2)
-        
-        # Save batch summary
-        print("\n" + "=" * 60)
-        print("SAVING BATCH SUMMARY")
-        print("=" * 60 + "\n")
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        os.makedirs('results', exist_ok=True)
-        summary_filename = f"results/batch_summary_{timestamp}.json"
-        
-        summary_data = {
-            'batch_timestamp': datetime.now().isoformat(),
-            'total_queries': len(queries_to_run),
-            'queries_run': queries_to_run,
-            'all_results': all_results
-        }
-        
-        with open(summary_filename, 'w') as f:
-            json.dump(summary_data, f, indent=2, default=str)
-        
-        print(f"Batch summary saved to: {summary_filename}")
+        run_batch(tester, queries_to_run, analyzer,
+                  questions_file=args.file,
+                  compression=args.compress,
+                  resume=args.resume,
+                  shard=shard,
+                  samples=args.samples,
+                  force=args.force)
     
     if analyzer:
+        analyzer.display_usage()
         print(f"\n[OK] Analysis results saved to: {analyzer.csv_path}")
     
     print("\n[OK] Testing complete!")
\ No newline at end of file
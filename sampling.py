@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Repeated Sampling Statistics
+Mention frequencies with Wilson confidence intervals across several samples of the same question
+"""
+
+import os
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+
+# z for a two-sided 95% interval
+Z_95 = 1.959964
+
+
+def wilson_interval(successes, trials, z=Z_95):
+    """Wilson score interval for a proportion; stays sensible for small samples and rates near 0 or 1"""
+    if trials == 0:
+        return 0.0, 0.0
+    rate = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (rate + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def analyze_samples(analyzer, samples, query, provider):
+    """Analyze every sample, a few at a time (SAMPLE_CONCURRENCY, default 5)"""
+    workers = max(1, min(len(samples), int(os.getenv('SAMPLE_CONCURRENCY', 5))))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda text: analyzer.analyze_with_ai(text, query, provider), samples))
+
+
+def mention_frequencies(analyses):
+    """How often each company was mentioned across the analyzed samples.
+
+    A company counts once per sample however often that sample names it.
+    Names are matched case-insensitively and reported in their most common
+    spelling, most frequently mentioned first.
+    """
+    analyses = [analysis for analysis in analyses if analysis]
+    trials = len(analyses)
+    counts = {}
+    spellings = {}
+    for analysis in analyses:
+        seen = set()
+        for company in analysis.get('companies_mentioned', []) or []:
+            name = str(company).strip()
+            key = name.casefold()
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            counts[key] = counts.get(key, 0) + 1
+            variants = spellings.setdefault(key, {})
+            variants[name] = variants.get(name, 0) + 1
+
+    frequencies = {}
+    for key, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+        name = max(spellings[key].items(), key=lambda item: (item[1], item[0]))[0]
+        low, high = wilson_interval(count, trials)
+        frequencies[name] = {
+            'count': count,
+            'rate': round(count / trials, 4),
+            'ci_low': round(low, 4),
+            'ci_high': round(high, 4)
+        }
+    return {'samples': trials, 'confidence': 0.95, 'mention_frequencies': frequencies}
+
+
+def display_frequencies(summary, provider, limit=10):
+    """Print the most mentioned companies with their intervals"""
+    frequencies = summary.get('mention_frequencies', {})
+    print(f"\n[{provider}] Mention rates over {summary.get('samples', 0)} samples (95% CI):")
+    print("-" * 40)
+    if not frequencies:
+        print("No companies mentioned")
+    for name, stats in list(frequencies.items())[:limit]:
+        print(f"{name}: {stats['rate']:.0%} ({stats['ci_low']:.0%}-{stats['ci_high']:.0%})")
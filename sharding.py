@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Sharded Batch Runs
+Deterministically splits a questions file across processes or machines and merges the shard outputs
+"""
+
+import os
+import sys
+import csv
+import json
+import hashlib
+import argparse
+
+from checkpoint import BatchCheckpoint, checkpoint_path_for
+
+
+def parse_shard(value):
+    """(index, count) from an "i/N" string, where 1 <= i <= N"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N (e.g. 2/8), got: {value}")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Shard index must be between 1 and {count}, got: {value}")
+    return index, count
+
+
+def shard_tag(shard):
+    """File name tag for a shard, e.g. shard2of8"""
+    index, count = shard
+    return f"shard{index}of{count}"
+
+
+def shard_of(question, count):
+    """Shard (1-based) a question belongs to.
+
+    Depends only on the question text and the shard count, so every process
+    and machine computes the same split without coordinating, and repeated
+    questions always land in the same shard.
+    """
+    digest = hashlib.sha1(question.strip().encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+
+def select_shard(questions, shard):
+    """The questions of one shard, in file order, each once (as merge_summaries counts them)"""
+    index, count = shard
+    return [q for q in dict.fromkeys(questions) if shard_of(q, count) == index]
+
+
+def shard_path(path, shard):
+    """Per-shard variant of an output path, e.g. analysis_results_shard2of8.csv"""
+    root, ext = os.path.splitext(path)
+    return f"{root}_{shard_tag(shard)}{ext}"
+
+
+def read_questions(filename):
+    """Questions of a file, one per non-empty line (same rules as run.py)"""
+    with open(filename, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def merge_summaries(questions_file, count, directory='results', allow_partial=False):
+    """Build one batch summary from every shard's checkpoint.
+
+    The output only depends on the questions file and the shard checkpoints,
+    so merging the same shards twice produces byte-identical files.
+    """
+    questions = list(dict.fromkeys(read_questions(questions_file)))
+    name = os.path.splitext(os.path.basename(questions_file))[0] or 'questions'
+
+    checkpoints = {}
+    missing = []
+    for index in range(1, count + 1):
+        path = shard_path(checkpoint_path_for(questions_file, directory), (index, count))
+        checkpoint = BatchCheckpoint.load(path)
+        if checkpoint is None:
+            missing.append(path)
+        else:
+            checkpoints[index] = checkpoint
+
+    if missing:
+        for path in missing:
+            print(f"[{'WARNING' if allow_partial else 'ERROR'}] Missing shard checkpoint: {path}")
+        if not allow_partial:
+            return None
+
+    # Each shard indexes its own questions; the merged index follows the questions file
+    by_shard = {index: [] for index in checkpoints}
+    for question in questions:
+        index = shard_of(question, count)
+        if index in by_shard:
+            by_shard[index].append(question)
+
+    entries = {}
+    for index, checkpoint in checkpoints.items():
+        stray = {q for q, _ in checkpoint.pairs if shard_of(q, count) != index}
+        if stray:
+            print(f"[WARNING] Shard {index}/{count} recorded {len(stray)} questions from another shard - were shards run with a different N?")
+        for entry in checkpoint.build_index(by_shard[index]):
+            entry['shard'] = index
+            entry['result_log'] = checkpoint.header['result_log']
+            entries[entry['query']] = entry
+
+    index = [entries[q] for q in questions if q in entries]
+    complete = not missing and all(entry['providers'] and not entry['failed'] for entry in index)
+
+    summary = {
+        'questions_file': questions_file,
+        'shards': count,
+        'total_queries': len(questions),
+        'shard_runs': [
+            {
+                'shard': f"{i}/{count}",
+                'checkpoint': checkpoints[i].path,
+                'result_log': checkpoints[i].header['result_log'],
+                'compression': checkpoints[i].header.get('compression'),
+                'queries': len(by_shard[i])
+            }
+            for i in sorted(checkpoints)
+        ],
+        'missing_shards': missing,
+        'complete': complete,
+        'index': index
+    }
+
+    os.makedirs(directory, exist_ok=True)
+    summary_path = os.path.join(directory, f"batch_summary_{name}_merged.json")
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2, default=str)
+    print(f"[OK] Merged summary of {len(checkpoints)} shards saved to: {summary_path}")
+    return summary_path
+
+
+def merge_analysis(questions_file, count, analysis_csv, directory='results'):
+    """Combine the shards' analysis CSVs into one, keeping only rows for this questions file"""
+    questions = list(dict.fromkeys(read_questions(questions_file)))
+    position = {q: i for i, q in enumerate(questions)}
+    name = os.path.splitext(os.path.basename(questions_file))[0] or 'questions'
+
+    header = None
+    rows = []
+    for index in range(1, count + 1):
+        path = shard_path(analysis_csv, (index, count))
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, None) or header
+            for row in reader:
+                # Columns: timestamp, query, provider, ...
+                if len(row) > 2 and row[1] in position:
+                    rows.append(row)
+
+    if header is None:
+        print(f"[WARNING] No shard analysis CSVs found next to {analysis_csv}")
+        return None
+
+    # Question order first, then provider and time, so the file does not depend on which shard finished first
+    rows.sort(key=lambda row: (position[row[1]], row[2], row[0]))
+
+    os.makedirs(directory, exist_ok=True)
+    merged_path = os.path.join(directory, f"analysis_{name}_merged.csv")
+    with open(merged_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    print(f"[OK] Merged {len(rows)} analysis rows saved to: {merged_path}")
+    return merged_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plan or merge sharded batch runs (run.py --batch --shard i/N)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    plan = subparsers.add_parser('plan', help='Show how many questions each shard gets')
+    plan.add_argument('--file', '-f', default='questions.txt', help='Questions file (default: questions.txt)')
+    plan.add_argument('--shards', '-n', type=int, required=True, help='Number of shards')
+
+    merge = subparsers.add_parser('merge', help='Merge shard checkpoints and analysis CSVs')
+    merge.add_argument('--file', '-f', default='questions.txt', help='Questions file the shards ran (default: questions.txt)')
+    merge.add_argument('--shards', '-n', type=int, required=True, help='Number of shards the file was split into')
+    merge.add_argument('--results-dir', default='results', help='Directory holding shard checkpoints (default: results)')
+    merge.add_argument('--analysis-csv', default=os.getenv('ANALYSIS_CSV_PATH', 'analysis_results.csv'),
+                       help='Base analysis CSV path the shards derived their own from')
+    merge.add_argument('--allow-partial', action='store_true', help='Merge even if some shards have no checkpoint yet')
+
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error('--shards must be at least 1')
+    if not os.path.exists(args.file):
+        print(f"[ERROR] Questions file not found: {args.file}")
+        sys.exit(1)
+
+    if args.command == 'plan':
+        questions = read_questions(args.file)
+        for index in range(1, args.shards + 1):
+            print(f"Shard {index}/{args.shards}: {len(select_shard(questions, (index, args.shards)))} questions")
+        return
+
+    summary_path = merge_summaries(args.file, args.shards, args.results_dir, args.allow_partial)
+    if summary_path is None:
+        sys.exit(1)
+    merge_analysis(args.file, args.shards, args.analysis_csv, args.results_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Incremental Share-of-Voice Aggregation
+Keeps materialized mention counts per company x provider x query for the analysis CSV
+"""
+
+import os
+import io
+import csv
+import sys
+import json
+import time
+import atexit
+import weakref
+import argparse
+import threading
+
+
+# Wildcard used for "any company / provider / query" in the materialized counts
+ANY = '*'
+KEY_SEPARATOR = '\x1f'
+SENTIMENTS = ('positive', 'neutral', 'negative')
+
+
+def complete_rows(data, start, end):
+    """Yield (row_start, row_end) for every complete CSV row in data[start:end].
+
+    A newline inside a quoted field does not end the row, so a multi-line
+    field is never split; bytes after the last complete row are left alone
+    because a concurrent writer may still be in the middle of it.
+    """
+    pos = row_start = start
+    quotes = 0
+    while pos < end:
+        newline = data.find(b'\n', pos, end)
+        if newline < 0:
+            break
+        quotes += data[pos:newline].count(b'"')
+        pos = newline + 1
+        if quotes % 2:
+            continue
+        yield row_start, pos
+        row_start = pos
+        quotes = 0
+
+
+# Indexes with unsaved counts are flushed once at exit; replaced instances are not kept alive
+_instances = weakref.WeakSet()
+
+
+def _flush_all():
+    for instance in list(_instances):
+        instance.flush()
+
+
+atexit.register(_flush_all)
+
+
+def normalize_provider(provider):
+    """Map display names ('OpenAI', 'Google Search') and ids ('openai') onto the same key"""
+    return str(provider or '').strip().lower().replace(' ', '_')
+
+
+def normalize_company(company):
+    """Return (key, display name) for one companies_mentioned entry"""
+    if isinstance(company, dict):
+        company = company.get('name') or company.get('company') or ''
+    name = ' '.join(str(company).split())
+    return name.casefold(), name
+
+
+def normalize_sentiment(sentiment):
+    """Collapse free-form sentiment values into positive / neutral / negative"""
+    text = json.dumps(sentiment) if not isinstance(sentiment, str) else sentiment
+    text = text.lower()
+    if 'positive' in text and 'negative' not in text:
+        return 'positive'
+    if 'negative' in text and 'positive' not in text:
+        return 'negative'
+    return 'neutral'
+
+
+class ShareOfVoice:
+    """Materialized share-of-voice counts kept in step with the analysis CSV.
+
+    The CSV stays the source of truth. The index remembers how many bytes of
+    it have been folded in and only parses rows appended after that, so each
+    save_to_csv() costs one row regardless of how large the CSV has grown.
+    Counts are kept for every wildcard combination of (company, provider,
+    query), which makes any lookup a single dict access.
+    """
+
+    def __init__(self, csv_path, index_path=None, save_interval=None):
+        self.csv_path = csv_path
+        self.index_path = index_path or f"{csv_path}.sov.json"
+        if save_interval is None:
+            save_interval = float(os.getenv('SOV_SAVE_INTERVAL', 5))
+        self.save_interval = save_interval
+
+        self.lock = threading.Lock()
+        self._last_save = 0.0
+        self._snapshot_mtime = None
+        self._dirty = False
+        self._reset()
+        self._load()
+        _instances.add(self)
+
+    def _reset(self):
+        """Forget all counts"""
+        self.offset = 0
+        self.rows = 0
+        self.mentions = {}
+        self.responses = {}
+        self.names = {}
+
+    def _load(self):
+        """Load the persisted snapshot, if there is one"""
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            mtime = os.stat(self.index_path).st_mtime_ns
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[WARNING] Ignoring unreadable share-of-voice index {self.index_path}: {e}")
+            return
+
+        self._snapshot_mtime = mtime
+        if data.get('offset', 0) <= self.offset:
+            # Our in-memory counts are at least as far along
+            return
+        self.offset = data.get('offset', 0)
+        self.rows = data.get('rows', 0)
+        self.mentions = {tuple(k.split(KEY_SEPARATOR)): v for k, v in data.get('mentions', {}).items()}
+        self.responses = {tuple(k.split(KEY_SEPARATOR)): v for k, v in data.get('responses', {}).items()}
+        self.names = data.get('names', {})
+
+    def _snapshot_changed(self):
+        """True if another process rewrote the snapshot since we last loaded or saved it"""
+        try:
+            return os.stat(self.index_path).st_mtime_ns != self._snapshot_mtime
+        except OSError:
+            return False
+
+    def _save(self):
+        """Atomically write the snapshot next to the CSV"""
+        data = {
+            'csv_path': self.csv_path,
+            'offset': self.offset,
+            'rows': self.rows,
+            'mentions': {KEY_SEPARATOR.join(k): v for k, v in self.mentions.items()},
+            'responses': {KEY_SEPARATOR.join(k): v for k, v in self.responses.items()},
+            'names': self.names
+        }
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, self.index_path)
+        self._snapshot_mtime = os.stat(self.index_path).st_mtime_ns
+        self._last_save = time.time()
+        self._dirty = False
+
+    def _read_new_rows(self, size):
+        """Parse CSV rows between the current offset and the last complete line"""
+        with open(self.csv_path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+
+        # Only consume complete rows - a concurrent writer may be mid-row
+        end = 0
+        for _, end in complete_rows(data, 0, len(data)):
+            pass
+        if not end:
+            return []
+        data = data[:end]
+        self.offset += end
+
+        reader = csv.reader(io.StringIO(data.decode('utf-8'), newline=''))
+        return [row for row in reader if row and row[0] != 'timestamp']
+
+    def _apply(self, row):
+        """Fold one CSV row into the counts"""
+        if len(row) < 10:
+            return
+        query = row[1].strip()
+        provider = normalize_provider(row[2])
+        sentiment = normalize_sentiment(row[9])
+        try:
+            companies = json.loads(row[3]) if row[3] else []
+        except json.JSONDecodeError:
+            companies = []
+        if not isinstance(companies, list):
+            companies = [companies]
+
+        for key in ((provider, query), (provider, ANY), (ANY, query), (ANY, ANY)):
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+        seen = set()
+        for company in companies:
+            company_key, display = normalize_company(company)
+            if not company_key or company_key in seen:
+                continue
+            seen.add(company_key)
+            self.names.setdefault(company_key, display)
+
+            for company_part in (company_key, ANY):
+                for provider_part in (provider, ANY):
+                    for query_part in (query, ANY):
+                        key = (company_part, provider_part, query_part)
+                        counts = self.mentions.get(key)
+                        if counts is None:
+                            counts = self.mentions[key] = {'mentions': 0, 'positive': 0, 'neutral': 0, 'negative': 0}
+                        counts['mentions'] += 1
+                        counts[sentiment] += 1
+        self.rows += 1
+
+    def refresh(self):
+        """Fold any rows appended to the CSV since the last refresh"""
+        with self.lock:
+            if not os.path.exists(self.csv_path):
+                return
+
+            if self._snapshot_changed():
+                # Another process (CLI run or backend) saved - adopt its counts if it got further
+                self._load()
+
+            size = os.path.getsize(self.csv_path)
+            if size < self.offset:
+                # The CSV was truncated or replaced - rebuild from scratch
+                print(f"[WARNING] {self.csv_path} shrank, rebuilding share-of-voice index")
+                self._reset()
+
+            if size > self.offset:
+                for row in self._read_new_rows(size):
+                    self._apply(row)
+                self._dirty = True
+
+            if self._dirty and time.time() - self._last_save >= self.save_interval:
+                self._save()
+
+    def flush(self):
+        """Persist pending counts immediately"""
+        with self.lock:
+            if self._dirty:
+                try:
+                    self._save()
+                except OSError as e:
+                    print(f"[ERROR] Failed to save share-of-voice index: {e}")
+
+    def lookup(self, company=None, provider=None, query=None):
+        """Mention counts and share for a company (None means 'any') in O(1)"""
+        with self.lock:
+            return self._lookup(company, provider, query)
+
+    def _lookup(self, company, provider, query):
+        company_key = normalize_company(company)[0] if company else ANY
+        provider_key = normalize_provider(provider) if provider else ANY
+        query_key = query.strip() if query else ANY
+
+        counts = self.mentions.get((company_key, provider_key, query_key))
+        counts = dict(counts) if counts else {'mentions': 0, 'positive': 0, 'neutral': 0, 'negative': 0}
+        responses = self.responses.get((provider_key, query_key), 0)
+
+        return {
+            'company': self.names.get(company_key, company) if company else None,
+            'provider': provider,
+            'query': query,
+            'mentions': counts['mentions'],
+            'responses': responses,
+            'share': round(counts['mentions'] / responses, 4) if responses else 0.0,
+            'sentiment': {s: counts[s] for s in SENTIMENTS}
+        }
+
+    def top(self, provider=None, query=None, limit=10):
+        """Most-mentioned companies for a provider/query slice"""
+        provider_key = normalize_provider(provider) if provider else ANY
+        query_key = query.strip() if query else ANY
+
+        # refresh() from another request thread may be adding keys meanwhile
+        with self.lock:
+            ranked = [
+                (counts['mentions'], company_key)
+                for (company_key, p, q), counts in self.mentions.items()
+                if company_key != ANY and p == provider_key and q == query_key
+            ]
+            ranked.sort(key=lambda item: (-item[0], item[1]))
+            return [self._lookup(self.names.get(company_key, company_key), provider, query)
+                    for _, company_key in ranked[:limit]]
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_share_of_voice(csv_path):
+    """The process-wide index for a CSV, so analyzers rebuilt on a config change reuse it"""
+    with _shared_lock:
+        instance = _shared.get(csv_path)
+        if instance is None:
+            instance = _shared[csv_path] = ShareOfVoice(csv_path)
+        return instance
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Share-of-voice lookups over the analysis CSV')
+    parser.add_argument('--company', '-c', type=str, help='Company/brand to look up (default: top companies)')
+    parser.add_argument('--provider', '-p', type=str, help='Restrict to one provider (e.g. openai)')
+    parser.add_argument('--query', '-q', type=str, help='Restrict to one exact query')
+    parser.add_argument('--top', '-t', type=int, default=10, help='Number of companies to list without --company')
+    parser.add_argument('--csv', type=str, default=os.getenv('ANALYSIS_CSV_PATH', 'analysis_results.csv'),
+                        help='Analysis CSV path (default: ANALYSIS_CSV_PATH or analysis_results.csv)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv):
+        print(f"[ERROR] Analysis CSV not found: {args.csv}")
+        sys.exit(1)
+
+    sov = ShareOfVoice(args.csv, save_interval=0)
+    sov.refresh()
+
+    if args.company:
+        rows = [sov.lookup(args.company, args.provider, args.query)]
+    else:
+        rows = sov.top(args.provider, args.query, args.top)
+
+    print(f"Share of voice ({sov.rows} analyzed responses)")
+    print("-" * 60)
+    for row in rows:
+        sentiment = row['sentiment']
+        print(f"{row['company']}: {row['mentions']}/{row['responses']} responses ({row['share']:.1%}) "
+              f"+{sentiment['positive']} ={sentiment['neutral']} -{sentiment['negative']}")
@@ -0,0 +1,41 @@
+"""Make the root modules and the backend package importable from the tests"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def backend_app(tmp_path_factory):
+    """backend/app.py imported in a scratch directory, with no .env reloading and no real providers"""
+    workdir = tmp_path_factory.mktemp('backend')
+    (workdir / '.env').write_text('OPENAI_API_KEY=sk-test\nANTHROPIC_API_KEY=sk-ant-test\nANALYZE_RESPONSES=false\n')
+    settings = {'ENV_FILE': str(workdir / '.env'), 'CONFIG_POLL_INTERVAL': '0', 'RESULT_STORE': 'memory',
+                'ANALYSIS_CSV_PATH': str(workdir / 'analysis.csv'), 'TREND_DB_PATH': str(workdir / 'trends.db')}
+    previous = {name: os.environ.get(name) for name in settings}
+    os.environ.update(settings)
+    cwd = os.getcwd()
+    # run.py looks for .env in the working directory when it is imported
+    os.chdir(workdir)
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return app
+
+
+@pytest.fixture(scope='session')
+def run_module(backend_app):
+    """run.py, imported (with its .env) along with the backend"""
+    import run
+    return run
@@ -0,0 +1,83 @@
+"""Batch submission through /api/batch"""
+
+import threading
+import time
+
+
+class BlockingTester:
+    """Answers only once released, so batch questions pile up behind the pool"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def test_provider(self, provider, prompt):
+        self.release.wait(10)
+        return {'provider': provider, 'response': f'answer to {prompt}', 'success': True}
+
+
+class FakeAnalyzer:
+    analyze_enabled = False
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.02)
+
+
+def test_queued_batch_questions_stay_out_of_the_result_store(backend_app, monkeypatch):
+    app = backend_app
+    tester = BlockingTester()
+    monkeypatch.setattr(app, 'get_services', lambda settings: (tester, FakeAnalyzer()))
+    client = app.app.test_client()
+    stored_before = len(app.query_results)
+
+    response = client.post('/api/batch', json={'questions': [f'question {n}' for n in range(60)], 'providers': ['openai']})
+    assert response.status_code == 200
+    batch = response.get_json()
+
+    # Only what the pool has taken (workers + queue + the one being fed) is in the store
+    limit = app.batch_pool.max_workers + app.batch_pool.max_queue + 1
+    wait_for(lambda: len(app.query_results) - stored_before >= app.batch_pool.max_queue)
+    assert len(app.query_results) - stored_before <= limit
+
+    last = batch['query_ids'][-1]
+    assert client.get(f'/api/results/{last}').get_json()['status'] == 'queued'
+    assert client.post(f'/api/query/{last}/cancel').get_json()['status'] == 'cancelled'
+
+    tester.release.set()
+    wait_for(lambda: client.get(f"/api/batch/{batch['batch_id']}").get_json()['status'] == 'completed')
+    assert client.get(f'/api/results/{last}').get_json()['status'] == 'cancelled'
+    assert client.get(f"/api/results/{batch['query_ids'][0]}").get_json()['status'] == 'completed'
+    assert not app.queued_batch_records
+
+
+def test_batch_questions_report_their_place_in_the_batch_queue(backend_app, monkeypatch):
+    app = backend_app
+    tester = BlockingTester()
+    monkeypatch.setattr(app, 'get_services', lambda settings: (tester, FakeAnalyzer()))
+    client = app.app.test_client()
+
+    batch = client.post('/api/batch', json={'questions': [f'line {n}' for n in range(12)],
+                                            'providers': ['openai']}).get_json()
+    waiting = batch['query_ids'][app.batch_pool.max_workers]
+    wait_for(lambda: app.batch_pool.position(waiting) is not None)
+
+    record = client.get(f'/api/results/{waiting}').get_json()
+    assert record['queue_position'] == app.batch_pool.position(waiting) >= 1
+    assert record['queue_depth'] >= 1
+
+    tester.release.set()
+    wait_for(lambda: client.get(f"/api/batch/{batch['batch_id']}").get_json()['status'] == 'completed')
+
+
+def test_unconfigured_batch_providers_are_rejected(backend_app):
+    client = backend_app.app.test_client()
+    stored_before = len(backend_app.query_results)
+
+    response = client.post('/api/batch', json={'questions': ['q'], 'providers': ['openai', 'nosuchllm']})
+    assert response.status_code == 400
+    assert 'nosuchllm' in response.get_json()['error']
+    assert client.post('/api/batch', json={'questions': ['q'], 'providers': 'openai'}).status_code == 400
+    assert len(backend_app.query_results) == stored_before
@@ -0,0 +1,111 @@
+"""Bulk mode end to end against the local batch API stand-in"""
+
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import bulk_standin
+from analyzer import ResponseAnalyzer
+from bulk import BulkRunner, BulkStateMismatch, questions_fingerprint
+
+
+@pytest.fixture
+def standin(monkeypatch):
+    """The stand-in on a free port, with the batch clients pointed at it"""
+    bulk_standin.Handler.state = state = bulk_standin.StandinState(delay=0.5)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), bulk_standin.Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setenv('OPENAI_BASE_URL', f"{base}/v1")
+    monkeypatch.setenv('ANTHROPIC_BASE_URL', base)
+    monkeypatch.setenv('BULK_POLL_INTERVAL', '0.1')
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1')
+    monkeypatch.setenv('no_proxy', '127.0.0.1')
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+class DirectTester:
+    """OpenAI and Anthropic go through the batch APIs; Perplexity is answered directly"""
+
+    configured_providers = ['openai', 'anthropic', 'perplexity']
+    api_keys = {'openai': 'sk-test', 'anthropic': 'sk-ant-test', 'perplexity': 'pplx-test'}
+
+    def __init__(self):
+        self.called_at = []
+
+    def test_all(self, prompt, providers=None):
+        self.called_at.append(time.time())
+        return [{'provider': 'Perplexity', 'provider_id': 'perplexity', 'response': f'direct answer to {prompt}',
+                 'success': True}]
+
+
+def test_bulk_run_writes_batch_and_direct_results(run_module, standin, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tester = DirectTester()
+    queries = ['Best ETFs?', 'Best brokers? [fail]']
+
+    summary = run_module.run_bulk(tester, queries, questions_file='questions.txt')
+
+    # Direct providers were queried before the batch jobs reported completion
+    finished_at = min(batch['created'] for batch in standin.batches.values()) + standin.delay
+    assert len(tester.called_at) == 2
+    assert max(tester.called_at) < finished_at
+
+    assert summary['mode'] == 'bulk'
+    assert summary['complete'] is False
+    with open(summary['result_log']) as f:
+        records = [json.loads(line) for line in f]
+    first = {result['provider_id']: result for result in records[0]['results']}
+    assert first['openai']['response'].startswith('Stand-in answer to: Best ETFs?')
+    assert first['anthropic']['success'] is True
+    assert first['perplexity']['response'] == 'direct answer to Best ETFs?'
+    second = {result['provider_id']: result for result in records[1]['results']}
+    assert second['openai']['error'] == 'Stand-in failure'
+    assert second['perplexity']['success'] is True
+    # Job ids are dropped once the results are saved
+    assert not os.path.exists(tmp_path / 'results' / 'bulk_questions.json')
+
+
+def test_resume_refuses_jobs_for_other_questions(run_module, standin, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    state_path = tmp_path / 'results' / 'bulk_questions.json'
+    state_path.parent.mkdir()
+    state_path.write_text(json.dumps({'questions': questions_fingerprint(['Old question?']),
+                                      'jobs': {'questions': {'openai': 'batch_1'}}}))
+
+    with pytest.raises(SystemExit) as exit_info:
+        run_module.run_bulk(DirectTester(), ['New question?'], questions_file='questions.txt', resume=True)
+    assert exit_info.value.code == 1
+    assert not standin.batches
+
+    runner = BulkRunner({}, str(state_path), resume=True, fingerprint=questions_fingerprint(['Old question?']))
+    assert runner.state['jobs'] == {'questions': {'openai': 'batch_1'}}
+    with pytest.raises(BulkStateMismatch):
+        BulkRunner({}, str(state_path), resume=True, fingerprint=questions_fingerprint(['Old question?', 'More?']))
+
+
+def test_standin_caches_only_prefixes_above_the_minimum():
+    state = bulk_standin.StandinState(delay=0)
+    analysis = ResponseAnalyzer().build_analysis_request('Vanguard is popular.', 'best etfs', 'openai')
+    long_prefix = 'Follow these instructions. ' * 200
+    long = dict(analysis, messages=[{'role': 'system', 'content': long_prefix}] + analysis['messages'][1:])
+
+    # The analysis instructions are below the minimum, so they are never cached
+    for _ in range(2):
+        assert state.prompt_tokens(analysis)[1:] == (0, 0)
+
+    # A prefix past the minimum is written once and read back afterwards
+    _, cached, written = state.prompt_tokens(long)
+    assert cached == 0
+    assert written >= bulk_standin.CACHE_MIN_TOKENS
+    assert state.prompt_tokens(long)[1:] == (written, 0)
+    # ...except on Haiku models, which need twice as much
+    haiku = dict(long, model='claude-3-5-haiku-20241022', messages=[{'role': 'system', 'content': long_prefix + ' '}])
+    for _ in range(2):
+        assert state.prompt_tokens(haiku)[1:] == (0, 0)
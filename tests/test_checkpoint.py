@@ -0,0 +1,77 @@
+"""Result log and batch checkpoint: locating records and resuming interrupted runs"""
+
+import os
+
+import pytest
+
+from checkpoint import BatchCheckpoint, checkpoint_path_for
+from result_log import ResultLog
+
+
+def results(*statuses):
+    """Provider results, 'ok' or 'failed' in provider order"""
+    out = []
+    for provider, status in zip(('openai', 'anthropic', 'perplexity'), statuses):
+        if status == 'ok':
+            out.append({'provider_id': provider, 'response': f'{provider} answer', 'success': True})
+        else:
+            out.append({'provider_id': provider, 'error': 'boom'})
+    return out
+
+
+@pytest.mark.parametrize('compression', ['none', 'gzip'])
+def test_result_log_reads_records_back_by_location(tmp_path, compression):
+    log = ResultLog.create(str(tmp_path), prefix='batch_results', compression=compression)
+    first = log.append({'query': 'one'})
+    second = log.append({'query': 'two'})
+
+    assert log.read(**second) == {'query': 'two'}
+    assert log.read(**first) == {'query': 'one'}
+    assert [record['query'] for record in ResultLog(log.path)] == ['one', 'two']
+
+
+def test_checkpoint_resume_skips_only_successful_pairs(tmp_path):
+    log = ResultLog(str(tmp_path / 'log.jsonl'))
+    path = checkpoint_path_for('questions.txt', str(tmp_path))
+    checkpoint = BatchCheckpoint.start(path, 'questions.txt', log)
+    checkpoint.record('q1', results('ok', 'ok'), log.append({'query': 'q1'}))
+    checkpoint.record('q2', results('ok', 'failed'), log.append({'query': 'q2'}))
+
+    resumed = BatchCheckpoint.load(path)
+    assert resumed.header['result_log'] == log.path
+    assert resumed.pending_providers('q1', ['openai', 'anthropic']) == []
+    assert resumed.pending_providers('q2', ['openai', 'anthropic']) == ['anthropic']
+    assert resumed.pending_providers('q3', ['openai', 'anthropic']) == ['openai', 'anthropic']
+
+    # A later success for the failed pair wins
+    resumed.record('q2', results('ok', 'ok')[1:], log.append({'query': 'q2'}))
+    index = BatchCheckpoint.load(path).build_index(['q1', 'q2'])
+    assert [entry['failed'] for entry in index] == [[], []]
+
+
+def test_checkpoint_ignores_a_torn_last_line(tmp_path):
+    log = ResultLog(str(tmp_path / 'log.jsonl'))
+    path = str(tmp_path / 'checkpoint.jsonl')
+    checkpoint = BatchCheckpoint.start(path, 'questions.txt', log)
+    checkpoint.record('q1', results('ok'), log.append({'query': 'q1'}))
+    with open(path, 'a') as f:
+        f.write('{"type": "pair", "question": "q2", "prov')
+
+    resumed = BatchCheckpoint.load(path)
+    assert resumed.is_done('q1', 'openai')
+    assert not resumed.is_done('q2', 'openai')
+
+
+def test_only_unfinished_checkpoints_block_a_new_run(tmp_path):
+    log = ResultLog(str(tmp_path / 'log.jsonl'))
+    path = str(tmp_path / 'checkpoint.jsonl')
+    assert BatchCheckpoint.unfinished(path) is None
+
+    checkpoint = BatchCheckpoint.start(path, 'questions.txt', log)
+    checkpoint.record('q1', results('failed'), log.append({'query': 'q1'}))
+    assert BatchCheckpoint.unfinished(path) is not None
+
+    checkpoint.record('q1', results('ok'), log.append({'query': 'q1'}))
+    checkpoint.mark_complete()
+    assert BatchCheckpoint.unfinished(path) is None
+    assert os.path.exists(path)
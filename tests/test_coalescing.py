@@ -0,0 +1,76 @@
+"""Identical in-flight queries sharing one run"""
+
+import uuid
+
+from coalesce import SingleFlight, coalesce_key
+
+
+def test_followers_attach_to_the_leader_until_it_is_released():
+    flight = SingleFlight()
+    key = coalesce_key('Best ETFs?', ['openai', 'anthropic'])
+
+    assert flight.claim(key, 'leader') is None
+    assert flight.claim(coalesce_key('  best   etfs? ', ['anthropic', 'openai']), 'follower') == 'leader'
+    assert flight.claim(coalesce_key('Best ETFs?', ['openai']), 'other') is None
+
+    assert flight.detach('leader') is True
+    assert flight.detach('leader') is False
+    flight.release('leader')
+    assert flight.claim(key, 'next') is None
+    assert flight.stats() == {'in_flight': 2, 'coalesced': 1}
+
+
+class FakeTester:
+    def test_provider(self, provider, prompt):
+        return {'provider': provider, 'response': f'answer from {provider}', 'success': True}
+
+
+class FakeAnalyzer:
+    analyze_enabled = False
+
+
+def start_query(app, text, providers):
+    query_id = str(uuid.uuid4())
+    app.query_results.put(query_id, {'id': query_id, 'query': text, 'timestamp': '2025-01-01T00:00:00',
+                                     'status': 'queued', 'providers': providers, 'results': {}, 'analysis': None})
+    assert app.in_flight.claim(coalesce_key(text, providers), query_id) is None
+    return query_id
+
+
+def test_key_is_released_before_the_terminal_event(backend_app, monkeypatch):
+    app = backend_app
+    monkeypatch.setattr(app, 'get_services', lambda settings: (FakeTester(), FakeAnalyzer()))
+    providers = ['openai', 'anthropic']
+    query_id = start_query(app, 'release ordering', providers)
+
+    seen = []
+
+    def emit_to_query(event, payload, target):
+        if event == 'query_complete':
+            # A submitter arriving now must start its own run, not attach to one that has no events left
+            probe = str(uuid.uuid4())
+            seen.append(app.in_flight.claim(coalesce_key('release ordering', providers), probe))
+            app.in_flight.release(probe)
+            seen.append(app.query_results.get(target)['status'])
+
+    monkeypatch.setattr(app, 'emit_to_query', emit_to_query)
+    app.process_query_async(query_id, 'release ordering', providers)
+
+    assert seen == [None, 'completed']
+
+
+def test_late_joiners_get_the_outcome_replayed(backend_app, monkeypatch):
+    app = backend_app
+    monkeypatch.setattr(app, 'get_services', lambda settings: (FakeTester(), FakeAnalyzer()))
+    query_id = start_query(app, 'late joiner', ['openai'])
+    app.process_query_async(query_id, 'late joiner', ['openai'])
+
+    client = app.socketio.test_client(app.app)
+    client.get_received()
+    client.emit('join_query', {'query_id': query_id})
+    events = [(message['name'], message['args'][0]) for message in client.get_received()]
+
+    assert [name for name, _ in events] == ['joined', 'provider_complete', 'query_complete']
+    assert events[1][1]['result']['response'] == 'answer from openai'
+    assert events[2][1]['query_id'] == query_id
+    client.disconnect()
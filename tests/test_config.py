@@ -0,0 +1,49 @@
+"""Configuration snapshots following the .env file"""
+
+import os
+
+from config import ConfigWatcher
+
+
+def test_removed_keys_leave_the_environment(tmp_path, monkeypatch):
+    env = tmp_path / '.env'
+    monkeypatch.delenv('ANTHROPIC_API_KEY', raising=False)
+    monkeypatch.setenv('OPENAI_MODEL', 'from-process')
+    env.write_text('ANTHROPIC_API_KEY=sk-ant-real\nOPENAI_MODEL=from-file\n')
+
+    watcher = ConfigWatcher(str(env), poll_interval=0)
+    try:
+        assert 'anthropic' in watcher.current().configured_providers
+        assert os.environ['OPENAI_MODEL'] == 'from-file'
+
+        env.write_text('# keys removed\n')
+        snapshot = watcher.reload()
+        assert 'anthropic' not in snapshot.configured_providers
+        assert 'ANTHROPIC_API_KEY' not in os.environ
+        # Values the process started with come back
+        assert snapshot.get('OPENAI_MODEL') == 'from-process'
+        assert snapshot.version == 2
+    finally:
+        os.environ.pop('ANTHROPIC_API_KEY', None)
+
+
+def test_removed_keys_leave_the_environment_in_the_app(backend_app):
+    # run.py loaded .env into os.environ before the app built its watcher
+    app = backend_app
+    env_path = app.config.env_path
+    with open(env_path) as f:
+        original = f.read()
+    started_with = app.PROCESS_ENV.get('ANTHROPIC_API_KEY')
+    assert app.config.current().get('ANTHROPIC_API_KEY') == 'sk-ant-test'
+
+    try:
+        with open(env_path, 'w') as f:
+            f.write(original.replace('ANTHROPIC_API_KEY=sk-ant-test\n', ''))
+        snapshot = app.config.reload()
+        assert os.environ.get('ANTHROPIC_API_KEY') == started_with
+        assert snapshot.get('ANTHROPIC_API_KEY') != 'sk-ant-test'
+        assert ('anthropic' in snapshot.configured_providers) == bool(started_with)
+    finally:
+        with open(env_path, 'w') as f:
+            f.write(original)
+        app.config.reload()
@@ -0,0 +1,67 @@
+"""Offset-indexed analysis CSV reads and the append-only sidecar index"""
+
+import csv
+import os
+
+from csv_index import ROW_RECORD, AnalysisCSVReader
+
+HEADER = ['timestamp', 'query', 'provider', 'companies_mentioned', 'sentiment']
+
+
+def append(path, rows, header=False):
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if header:
+            writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+def test_filters_and_incremental_sidecar(tmp_path):
+    path = str(tmp_path / 'analysis.csv')
+    append(path, [
+        ['2025-01-01T10:00:00', 'best etf', 'OpenAI', '["A"]', 'positive'],
+        ['2025-01-02T10:00:00', 'best etf', 'anthropic', '["B"]', 'neutral'],
+    ], header=True)
+
+    reader = AnalysisCSVReader(path)
+    assert reader.count() == 2
+    assert [row['companies_mentioned'] for row in reader.rows(provider='openai')] == ['["A"]']
+    rows_size = os.path.getsize(f"{path}.idx.rows")
+    keys_size = os.path.getsize(f"{path}.idx.keys")
+    assert rows_size == 2 * ROW_RECORD.size
+
+    # An append writes one more fixed-width record and only the keys it introduced
+    append(path, [['2025-01-02T11:00:00', 'robo advisor', 'openai', '["C"]', 'multi\nline']])
+    assert reader.count(provider='openai') == 2
+    assert os.path.getsize(f"{path}.idx.rows") == rows_size + ROW_RECORD.size
+    assert os.path.getsize(f"{path}.idx.keys") > keys_size
+
+    reopened = AnalysisCSVReader(path)
+    assert reopened.offsets == reader.offsets
+    assert reopened.count(date='2025-01-02') == 2
+    assert [row['sentiment'] for row in reopened.rows(query='robo advisor')] == ['multi\nline']
+    assert reopened.count(since='2025-01-02', provider='openai') == 1
+
+
+def test_rebuilds_when_the_sidecar_is_out_of_sync(tmp_path):
+    path = str(tmp_path / 'analysis.csv')
+    append(path, [['2025-01-01T10:00:00', 'q', 'openai', '[]', 'neutral']] * 3, header=True)
+    AnalysisCSVReader(path).refresh()
+
+    with open(f"{path}.idx.rows", 'r+b') as f:
+        f.truncate(ROW_RECORD.size)
+    reader = AnalysisCSVReader(path)
+    assert reader.count() == 3
+    assert AnalysisCSVReader(path).count(query='q') == 3
+
+
+def test_replaced_csv_is_reindexed(tmp_path):
+    path = str(tmp_path / 'analysis.csv')
+    append(path, [['2025-01-01T10:00:00', 'old', 'openai', '[]', 'neutral']] * 2, header=True)
+    reader = AnalysisCSVReader(path)
+    assert reader.count() == 2
+
+    os.remove(path)
+    append(path, [['2025-02-01T10:00:00', 'new', 'perplexity', '[]', 'neutral']], header=True)
+    assert reader.count() == 1
+    assert AnalysisCSVReader(path).count(query='new') == 1
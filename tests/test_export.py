@@ -0,0 +1,102 @@
+"""Column selection and streaming in the bulk export"""
+
+import csv
+import io
+import json
+
+import pytest
+
+import export
+from export import DEFAULT_COLUMNS, parse_columns, stream_csv, stream_ndjson
+
+
+def record(n, results, analysis=None):
+    return {'id': f'export-{n:03d}', 'query': f'export question {n}', 'timestamp': f'2001-01-01T00:00:{n:02d}',
+            'status': 'completed', 'providers': list(results), 'results': results, 'analysis': analysis}
+
+
+RECORDS = [
+    record(1, {'openai': {'model': 'gpt', 'response': 'first, "quoted"', 'success': True},
+               'anthropic': {'error': 'timeout'}},
+           analysis={'openai': {'companies_mentioned': ['Vanguard', 'Fidelity']}}),
+    record(2, {}),
+]
+
+
+def test_columns_are_validated_and_keep_the_requested_order():
+    assert parse_columns(None) == list(DEFAULT_COLUMNS)
+    assert parse_columns('all') == list(export.COLUMNS)
+    assert parse_columns(' provider, query_id ,') == ['provider', 'query_id']
+    with pytest.raises(ValueError, match='bogus'):
+        parse_columns('query_id,bogus')
+
+
+def test_ndjson_has_one_row_per_provider_result():
+    rows = [json.loads(line) for line in ''.join(stream_ndjson(RECORDS, ['query_id', 'provider', 'success',
+                                                                          'companies_mentioned'])).splitlines()]
+    assert rows == [
+        {'query_id': 'export-001', 'provider': 'openai', 'success': True, 'companies_mentioned': ['Vanguard', 'Fidelity']},
+        {'query_id': 'export-001', 'provider': 'anthropic', 'success': False, 'companies_mentioned': None},
+        # A record without results still gets a row
+        {'query_id': 'export-002', 'provider': None, 'success': False, 'companies_mentioned': None},
+    ]
+
+
+def test_csv_writes_a_header_and_lists_as_json():
+    rows = list(csv.reader(io.StringIO(''.join(stream_csv(RECORDS, ['provider', 'response', 'companies_mentioned'])))))
+    assert rows == [
+        ['provider', 'response', 'companies_mentioned'],
+        ['openai', 'first, "quoted"', '["Vanguard", "Fidelity"]'],
+        ['anthropic', '', ''],
+        ['', '', ''],
+    ]
+
+
+@pytest.mark.parametrize('stream', [stream_ndjson, stream_csv])
+def test_rows_are_flushed_in_chunks_as_records_stream_in(stream, monkeypatch):
+    monkeypatch.setattr(export, 'CHUNK_SIZE', 100)
+    consumed = []
+
+    def records():
+        for n in range(1, 11):
+            consumed.append(n)
+            yield record(n, {'openai': {'response': 'x' * 100, 'success': True}})
+
+    chunks = stream(records(), ['query_id', 'response'])
+    first = next(chunks)
+    # Every row fills a chunk, so each one goes out before the next record is read
+    assert consumed == [1]
+    assert 'export-001' in first
+    rest = list(chunks)
+    assert len(rest) == 9
+    assert ''.join([first] + rest).count('export-0') == 10
+
+
+def test_bulk_export_endpoint_streams_selected_columns(backend_app):
+    app = backend_app
+    for item in RECORDS:
+        app.query_results.put(item['id'], item)
+    client = app.app.test_client()
+    try:
+        response = client.get('/api/export?since=2001-01-01&until=2001-01-02&columns=query_id,provider')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        assert response.is_streamed or 'Content-Length' not in response.headers
+        assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == [
+            {'query_id': 'export-001', 'provider': 'openai'},
+            {'query_id': 'export-001', 'provider': 'anthropic'},
+            {'query_id': 'export-002', 'provider': None},
+        ]
+
+        response = client.post('/api/export', json={'format': 'csv', 'ids': ['export-002', 'missing'],
+                                                     'columns': ['query', 'status']})
+        assert response.mimetype == 'text/csv'
+        assert response.get_data(as_text=True).splitlines() == ['query,status', 'export question 2,completed']
+
+        response = client.get('/api/export?columns=query_id,bogus')
+        assert response.status_code == 400
+        assert 'bogus' in response.get_json()['error']
+        assert client.get('/api/export?format=xml').status_code == 400
+    finally:
+        for item in RECORDS:
+            app.query_results.delete(item['id'])
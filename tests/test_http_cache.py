@@ -0,0 +1,96 @@
+"""ETags, 304s and content-encoding negotiation for polled JSON"""
+
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+import http_cache
+from http_cache import ResponseCache, json_response
+
+LARGE = {'response': 'a long answer ' * 100}
+SMALL = {'status': 'completed'}
+
+flask_app = Flask(__name__)
+
+
+def respond(payload, cache=None, **headers):
+    with flask_app.test_request_context(headers=headers):
+        if cache is not None:
+            return cache.respond('key', lambda: payload)
+        return json_response(payload)
+
+
+def test_gzip_is_used_when_accepted_and_the_body_is_large_enough(monkeypatch):
+    monkeypatch.setattr(http_cache, 'brotli', None)
+    response = respond(LARGE, **{'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.get_data())) == LARGE
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    assert 'Content-Encoding' not in respond(LARGE).headers
+    assert 'Content-Encoding' not in respond(SMALL, **{'Accept-Encoding': 'gzip'}).headers
+
+
+@pytest.mark.skipif(http_cache.brotli is None, reason='brotli is not installed')
+def test_brotli_is_preferred_when_installed():
+    response = respond(LARGE, **{'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(http_cache.brotli.decompress(response.get_data())) == LARGE
+
+
+def test_each_encoding_has_its_own_etag_and_a_match_answers_304(monkeypatch):
+    monkeypatch.setattr(http_cache, 'brotli', None)
+    plain = respond(LARGE).headers['ETag']
+    gzipped = respond(LARGE, **{'Accept-Encoding': 'gzip'}).headers['ETag']
+    assert plain != gzipped
+
+    response = respond(LARGE, **{'Accept-Encoding': 'gzip', 'If-None-Match': gzipped})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.headers['ETag'] == gzipped
+    # The plain body's ETag does not validate the gzipped representation
+    assert respond(LARGE, **{'Accept-Encoding': 'gzip', 'If-None-Match': plain}).status_code == 200
+    assert respond(dict(LARGE, status='changed'), **{'If-None-Match': plain}).status_code == 200
+
+
+def test_cached_bodies_are_serialized_once_and_count_compressed_copies(monkeypatch):
+    monkeypatch.setattr(http_cache, 'brotli', None)
+    cache = ResponseCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return LARGE
+
+    with flask_app.test_request_context():
+        plain = cache.respond('key', build)
+    plain_bytes = cache.stats()['bytes']
+    with flask_app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        cache.respond('key', build)
+
+    assert len(builds) == 1
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    assert cache.stats()['bytes'] > plain_bytes == len(plain.get_data())
+
+
+def test_finished_results_answer_repeat_polls_with_304(backend_app):
+    app = backend_app
+    app.query_results.put('etag-1', {'id': 'etag-1', 'query': 'etag question', 'timestamp': '2001-01-01T00:00:00',
+                                     'status': 'completed', 'providers': ['openai'],
+                                     'results': {'openai': {'response': 'answer ' * 200, 'success': True}},
+                                     'analysis': None})
+    client = app.app.test_client()
+    try:
+        first = client.get('/api/results/etag-1', headers={'Accept-Encoding': 'gzip'})
+        assert first.status_code == 200
+        assert first.headers['Content-Encoding'] == 'gzip'
+        etag = first.headers['ETag']
+
+        again = client.get('/api/results/etag-1', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        assert again.status_code == 304
+        assert again.headers['ETag'] == etag
+    finally:
+        app.query_results.delete('etag-1')
@@ -0,0 +1,78 @@
+"""Staleness-driven monitoring state"""
+
+from monitor import MonitorState, answer_signatures, entity_signature
+
+HOUR = 3600
+# Any fixed clock
+START = 1_000_000
+
+
+def answer(response, companies=None):
+    result = {'provider_id': 'openai', 'provider': 'OpenAI', 'response': response, 'success': True}
+    if companies is not None:
+        result['analysis'] = {'companies_mentioned': companies}
+    return result
+
+
+def test_entity_signature_keeps_names_and_links():
+    text = ('The best options are **Vanguard** and Fidelity Investments. For beginners, Charles Schwab is great.\n'
+            'According to Morningstar (https://www.morningstar.com/funds.) and investopedia.com, index funds win.')
+    assert entity_signature(text) == ['charles schwab', 'fidelity investments', 'https://www.morningstar.com/funds',
+                                      'investopedia.com', 'morningstar', 'vanguard']
+    # Rewording around the same names leaves the signature alone
+    assert entity_signature('Vanguard, then Fidelity Investments; Charles Schwab too.') == \
+        ['charles schwab', 'fidelity investments', 'vanguard']
+
+
+def test_answers_are_compared_like_with_like(tmp_path):
+    state = MonitorState(str(tmp_path / 'monitor.json'), min_interval=HOUR, max_interval=10 * HOUR, alpha=0.5)
+    state.record('q', answer('Vanguard is cheap.', ['Vanguard', 'Fidelity']), now=START)
+
+    # No analysis this time: compared on entities, not the analysis companies against raw text
+    entry = state.record('q', answer('Vanguard and Fidelity are both cheap, and it rained today.'), now=START + HOUR)
+    assert entry['last_change'] == 0.5
+    assert set(entry['signature']) == {'entities'}
+
+    entry = state.record('q', answer('Fidelity and Vanguard stay cheap.', ['fidelity', 'vanguard']), now=START + 2 * HOUR)
+    assert entry['last_change'] == 0.0
+    assert answer_signatures(answer('x', ['Vanguard']))['companies'] == ['vanguard']
+
+
+def test_signatures_from_older_state_files_are_not_compared(tmp_path):
+    state = MonitorState(str(tmp_path / 'monitor.json'), alpha=0.5)
+    entry = state.record('q', answer('Vanguard.', ['Vanguard']), now=START)
+    entry['signature'] = ['vanguard', 'fidelity']
+
+    entry = state.record('q', answer('Vanguard.', ['Vanguard']), now=START + HOUR)
+    assert entry['volatility'] == 0.5
+    assert 'last_change' not in entry
+
+
+def test_plan_runs_the_stalest_pairs_within_the_budget(tmp_path):
+    path = str(tmp_path / 'monitor.json')
+    state = MonitorState(path, min_interval=HOUR, max_interval=9 * HOUR)
+    state.record('steady', answer('Vanguard.'), now=START)
+    state.record('failing', {'provider_id': 'openai', 'error': 'timeout'}, now=START)
+    state.save()
+
+    state = MonitorState(path, min_interval=HOUR, max_interval=9 * HOUR)
+    # Volatility 0.5 gives 'steady' a 5 hour interval; the failed pair retries hourly
+    questions = ['steady', 'failing', 'new']
+    assert state.plan(questions, ['openai'], now=START + 2 * HOUR) == [('new', 'openai'), ('failing', 'openai')]
+    assert state.plan(questions, ['openai'], budget=1, now=START + 6 * HOUR) == [('new', 'openai')]
+    assert state.plan(['steady'], ['openai'], now=START + 6 * HOUR) == [('steady', 'openai')]
+    assert state.coverage(['steady', 'new'], ['openai'], now=START + HOUR)['never_answered'] == 1
+
+
+def test_zero_settings_and_clock_are_taken_as_given(tmp_path, monkeypatch):
+    monkeypatch.setenv('MONITOR_VOLATILITY_ALPHA', '0.9')
+    state = MonitorState(str(tmp_path / 'monitor.json'), min_interval=HOUR, max_interval=2 * HOUR, alpha=0)
+    assert state.alpha == 0
+
+    state.record('q', answer('Vanguard.', ['Vanguard']), now=0)
+    entry = state.record('q', answer('Fidelity.', ['Fidelity']), now=HOUR)
+    # alpha=0 ignores new changes instead of falling back to the environment's weight
+    assert entry['last_change'] == 1.0 and entry['volatility'] == 0.5
+    assert entry['last_run'] == HOUR
+    assert state.plan(['q'], ['openai'], now=HOUR) == []
+    assert state.plan(['q'], ['openai'], now=HOUR + 2 * HOUR) == [('q', 'openai')]
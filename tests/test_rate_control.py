@@ -0,0 +1,111 @@
+"""AIMD concurrency limits and the signals that drive them"""
+
+import sys
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from analyzer import ResponseAnalyzer
+from rate_control import AIMDLimiter, AdaptiveConcurrency, error_signals, parse_reset
+
+
+def test_parse_reset_formats():
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    assert parse_reset('1s') == 1.0
+    assert parse_reset('6m0s') == 360.0
+    assert parse_reset('20ms') == 0.02
+    assert parse_reset('1h2m3.5s') == 3723.5
+    assert parse_reset('30') == 30.0
+    assert parse_reset((now + timedelta(seconds=5)).isoformat().replace('+00:00', 'Z'), now) == 5.0
+    assert parse_reset((now - timedelta(seconds=5)).isoformat(), now) == 0.0
+    assert parse_reset('soon') is None
+    assert parse_reset(None) is None
+
+
+def test_additive_increase_and_multiplicative_decrease():
+    limiter = AIMDLimiter(initial=4, max_limit=8, cooldown=1.0)
+    for n in range(5):
+        limiter.observe(1.0, now=100.0 + n)
+    assert limiter.current(now=200.0) == 5
+
+    # A burst of 429s inside one cool-down counts once
+    limiter.observe(1.0, status=429, now=200.0)
+    limiter.observe(1.0, status=429, now=200.5)
+    assert limiter.current(now=201.0) == 2
+    assert limiter.congestion_events == 1
+
+    limiter.observe(1.0, status=401, now=202.0)
+    assert limiter.current(now=202.0) == 2
+
+
+def test_exhausted_budget_pauses_until_the_reset():
+    limiter = AIMDLimiter(initial=4)
+    pause = limiter.observe(1.0, headers={'x-ratelimit-remaining-requests': '0',
+                                          'x-ratelimit-reset-requests': '2s'}, now=100.0)
+    assert pause == 2.0
+    assert limiter.current(now=101.0) == 0
+    assert limiter.current(now=102.5) == 4
+
+
+def test_error_signals_read_sdk_errors():
+    class RateLimitError(Exception):
+        status_code = 429
+        response = SimpleNamespace(headers={'retry-after': '3'})
+
+    class APITimeoutError(Exception):
+        pass
+
+    assert error_signals(RateLimitError()) == (429, {'retry-after': '3'}, False)
+    assert error_signals(APITimeoutError()) == (None, None, True)
+
+
+class FakeRaw:
+    def __init__(self, headers, content):
+        self.headers = headers
+        self._content = content
+
+    def parse(self):
+        message = SimpleNamespace(content=self._content)
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, prompt_tokens_details=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class FakeCompletions:
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.with_raw_response = self
+
+    def create(self, **request):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def test_analysis_calls_feed_the_analysis_provider_limit(monkeypatch):
+    monkeypatch.setenv('ANALYSIS_PROVIDER', 'openai')
+    analyzer = ResponseAnalyzer()
+    analyzer.analyze_enabled = True
+    rate_control = AdaptiveConcurrency(initial_for=lambda provider: 4)
+    analyzer.rate_control = rate_control
+
+    class Overloaded(Exception):
+        status_code = 529
+
+    completions = FakeCompletions([
+        FakeRaw({'x-ratelimit-remaining-requests': '99'}, '{"brands_mentioned": []}'),
+        Overloaded('overloaded'),
+    ])
+    analyzer._client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setitem(sys.modules, 'openai', SimpleNamespace(OpenAI=None))
+
+    analyzer.analyze_with_ai('Vanguard is popular.', 'best etfs', 'perplexity')
+    stats = rate_control.stats()['openai']
+    assert stats['calls'] == 1
+    assert stats['remaining_requests'] == 99
+
+    # A failed analysis still falls back, and its 529 halves the limit
+    assert analyzer.analyze_with_ai('Vanguard is popular.', 'best etfs', 'perplexity') is not None
+    stats = rate_control.stats()['openai']
+    assert stats['calls'] == 2
+    assert stats['congestion_events'] == 1
+    assert stats['limit'] == 2
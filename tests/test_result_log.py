@@ -0,0 +1,64 @@
+"""Result log frames and offset reads for every compression"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import result_log
+from checkpoint import BatchCheckpoint
+from result_log import ResultLog, detect_compression
+
+COMPRESSIONS = ['none', 'gzip', pytest.param('zstd', marks=pytest.mark.skipif(
+    not result_log.has_zstd, reason='zstandard not installed'))]
+
+
+def records(count):
+    return [{'query': f'question {n}', 'results': [{'provider': 'OpenAI', 'response': 'é' * n}]} for n in range(count)]
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_records_roundtrip_by_offset_and_in_order(tmp_path, compression):
+    log = ResultLog.create(str(tmp_path), compression=compression)
+    assert detect_compression(log.path) == compression
+    written = records(5)
+    locations = [log.append(record) for record in written]
+
+    # Every record is its own frame: readable alone, in any order
+    for location, record in reversed(list(zip(locations, written))):
+        assert log.read(location['offset'], location['length']) == record
+    assert locations[1]['offset'] == locations[0]['offset'] + locations[0]['length']
+    assert list(ResultLog(log.path)) == written
+    assert log.records_written == 5
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_truncated_last_frame_is_skipped(tmp_path, compression, capsys):
+    log = ResultLog.create(str(tmp_path), compression=compression)
+    written = records(3)
+    locations = [log.append(record) for record in written]
+    with open(log.path, 'r+b') as f:
+        f.truncate(locations[-1]['offset'] + locations[-1]['length'] // 2)
+
+    assert list(ResultLog(log.path)) == written[:2]
+    assert 'partly written record' in capsys.readouterr().out
+    assert log.read(locations[1]['offset'], locations[1]['length']) == written[1]
+
+
+def test_missing_zstandard_falls_back_or_refuses(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_log, 'has_zstd', False)
+    assert ResultLog.create(str(tmp_path), compression='zstd').compression == 'gzip'
+    with pytest.raises(ValueError):
+        ResultLog(str(tmp_path / 'results.jsonl.zst'))
+
+
+def test_resuming_a_zstd_log_without_zstandard_exits_cleanly(run_module, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    log = SimpleNamespace(path='results/batch_results_x.jsonl.zst', compression='zstd')
+    BatchCheckpoint.start('results/checkpoint_questions.jsonl', 'questions.txt', log)
+    monkeypatch.setattr(result_log, 'has_zstd', False)
+    tester = SimpleNamespace(configured_providers=['openai'])
+
+    with pytest.raises(SystemExit) as exit_info:
+        run_module.run_batch(tester, ['q'], questions_file='questions.txt', resume=True)
+    assert exit_info.value.code == 1
+    assert '[ERROR] Cannot resume results/batch_results_x.jsonl.zst' in capsys.readouterr().out
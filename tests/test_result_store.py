@@ -0,0 +1,132 @@
+"""History paging and eviction in the memory and SQLite result stores"""
+
+import pytest
+
+import result_store
+from result_store import MemoryResultStore, SQLiteResultStore, record_size
+
+
+def record(n, providers, status='completed'):
+    return {'id': f'q{n:03d}', 'query': f'question {n}', 'timestamp': f'2025-01-01T00:00:{n:02d}',
+            'status': status, 'providers': providers, 'results': {}, 'analysis': None}
+
+
+def all_pages(store, **filters):
+    ids, cursor = [], None
+    while True:
+        rows, cursor = store.history(limit=3, cursor=cursor, **filters)
+        ids += [row['id'] for row in rows]
+        if cursor is None:
+            return ids
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryResultStore(max_entries=100)
+    return MemoryResultStore(max_entries=100, backing=SQLiteResultStore(str(tmp_path / 'results.db')))
+
+
+def test_cursor_pages_walk_newest_first_with_filters(store):
+    for n in range(10):
+        store.put(f'q{n:03d}', record(n, ['openai', 'anthropic'] if n % 2 else ['perplexity'],
+                                      'error' if n == 7 else 'completed'))
+
+    assert all_pages(store) == [f'q{n:03d}' for n in range(9, -1, -1)]
+    assert all_pages(store, provider='openai') == ['q009', 'q007', 'q005', 'q003', 'q001']
+    assert all_pages(store, provider='openai', status='completed') == ['q009', 'q005', 'q003', 'q001']
+    assert all_pages(store, prefix='QUESTION 1') == ['q001']
+
+
+def test_provider_rows_follow_updates_and_deletes(store):
+    store.put('q001', record(1, ['openai']))
+    store.put('q002', record(2, ['openai']))
+    store.put('q001', record(1, ['anthropic']))
+    store.delete('q002')
+
+    assert all_pages(store, provider='openai') == []
+    assert all_pages(store, provider='anthropic') == ['q001']
+
+
+def test_provider_filter_seeks_on_the_side_table(tmp_path):
+    sqlite_store = SQLiteResultStore(str(tmp_path / 'results.db'))
+    plan = ' '.join(row[-1] for row in sqlite_store.conn.execute(
+        'EXPLAIN QUERY PLAN SELECT r.summary FROM result_providers p JOIN results r ON r.id = p.id '
+        "WHERE p.provider = 'openai' ORDER BY p.timestamp DESC, p.id DESC LIMIT 3"))
+    assert 'SEARCH p USING PRIMARY KEY (provider=?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+class Clock:
+    """Stands in for the time module so TTLs pass without sleeping"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+def test_least_recently_used_records_are_evicted_first():
+    store = MemoryResultStore(max_entries=3)
+    for n in range(1, 4):
+        store.put(f'q{n:03d}', record(n, ['openai']))
+    store.get('q001')
+    store.put('q004', record(4, ['openai']))
+
+    assert 'q002' not in store
+    assert [query_id in store for query_id in ('q001', 'q003', 'q004')] == [True, True, True]
+    assert store.stats()['evictions'] == 1
+
+
+def test_byte_cap_evicts_until_the_store_fits():
+    size = record_size(record(1, ['openai']))
+    store = MemoryResultStore(max_entries=100, max_bytes=int(size * 2.5))
+    for n in range(1, 5):
+        store.put(f'q{n:03d}', record(n, ['openai']))
+
+    assert len(store) == 2
+    assert store.stats()['bytes'] <= store.max_bytes
+    assert store.get('q001') is None and store.get('q004') is not None
+
+
+def test_records_expire_after_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_store, 'time', clock)
+    store = MemoryResultStore(max_entries=100, ttl=60)
+    store.put('q001', record(1, ['openai']))
+    clock.now += 30
+    store.put('q002', record(2, ['openai']))
+
+    clock.now += 45
+    assert store.get('q001') is None
+    assert store.get('q002') is not None
+    # Re-storing a record restarts its TTL
+    store.put('q002', record(2, ['openai']))
+    clock.now += 45
+    assert store.get('q002') is not None
+
+
+def test_queued_and_processing_records_are_never_evicted(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_store, 'time', clock)
+    store = MemoryResultStore(max_entries=3, ttl=60)
+    store.put('q001', record(1, ['openai'], 'queued'))
+    store.put('q002', record(2, ['openai'], 'processing'))
+    store.put('q003', record(3, ['openai']))
+    store.get('q001')
+    store.put('q004', record(4, ['openai']))
+
+    # q001 and q002 are older, but still being worked on
+    assert [query_id in store for query_id in ('q001', 'q002', 'q003', 'q004')] == [True, True, False, True]
+
+    clock.now += 120
+    store.put('q005', record(5, ['openai'], 'processing'))
+    assert store.get('q001') is not None and store.get('q002') is not None
+    assert store.get('q004') is None
+
+    # Once finished they are ordinary entries again
+    store.put('q001', record(1, ['openai']))
+    store.put('q006', record(6, ['openai']))
+    assert 'q001' not in store
+    assert [query_id in store for query_id in ('q002', 'q005', 'q006')] == [True, True, True]
@@ -0,0 +1,72 @@
+"""Mention rates across repeated samples"""
+
+import pytest
+
+from sampling import mention_frequencies, wilson_interval
+
+
+def test_wilson_interval():
+    assert wilson_interval(0, 0) == (0.0, 0.0)
+    low, high = wilson_interval(5, 10)
+    assert low == pytest.approx(0.2366, abs=1e-4)
+    assert high == pytest.approx(0.7634, abs=1e-4)
+    # Never collapses to a point at 0% or 100%
+    assert wilson_interval(10, 10)[0] < 1.0
+    assert wilson_interval(0, 10)[1] > 0.0
+
+
+def test_mention_frequencies_count_each_sample_once():
+    summary = mention_frequencies([
+        {'companies_mentioned': ['Vanguard', 'vanguard', 'Fidelity']},
+        {'companies_mentioned': ['VANGUARD']},
+        None,
+        {'companies_mentioned': ['Vanguard', ' ']},
+    ])
+
+    assert summary['samples'] == 3
+    assert list(summary['mention_frequencies']) == ['Vanguard', 'Fidelity']
+    assert summary['mention_frequencies']['Vanguard']['count'] == 3
+    assert summary['mention_frequencies']['Fidelity']['rate'] == pytest.approx(0.3333)
+
+
+class FakeTester:
+    def __init__(self, samples):
+        self.samples = samples
+
+    def test_all(self, prompt, providers=None, samples=1):
+        return [{'provider': 'OpenAI', 'response': self.samples[0], 'samples': list(self.samples), 'success': True}]
+
+    def display_results(self, results):
+        pass
+
+
+class FakeAnalyzer:
+    def __init__(self):
+        self.saved = []
+
+    def analyze_with_ai(self, text, query, provider):
+        if text == 'unparseable':
+            return None
+        return {'provider': provider, 'companies_mentioned': [text]}
+
+    def save_to_csv(self, analysis):
+        self.saved.append(analysis)
+
+    def display_insights(self, analysis):
+        pass
+
+
+@pytest.mark.parametrize('samples, analysis', [
+    (['unparseable', 'Vanguard'], {'provider': 'OpenAI', 'companies_mentioned': ['Vanguard']}),
+    (['Fidelity'], {'provider': 'OpenAI', 'companies_mentioned': ['Fidelity']}),
+])
+def test_sampled_results_keep_an_analysis_and_their_rates(run_module, monkeypatch, samples, analysis):
+    monkeypatch.setenv('ANALYZE_RESPONSES', 'true')
+    analyzer = FakeAnalyzer()
+    result, = run_module.run_single_query(FakeTester(samples), 'best etfs', analyzer, save_individual=False, samples=3)
+
+    # The first analysis that succeeded, not whatever the first sample gave
+    assert result['analysis'] == analysis
+    assert analyzer.saved == [analysis]
+    # One surviving sample out of three still reports its rates
+    assert result['sample_analysis']['samples'] == len([text for text in samples if text != 'unparseable'])
@@ -0,0 +1,182 @@
+"""Weighted fair queuing between priority classes"""
+
+import threading
+import time
+
+from cancellation import CancelToken, QueryCancelled
+from scheduler import FairScheduler
+
+
+def queue_calls(scheduler, provider, priorities, order):
+    """Start one waiting call per priority; each records its class once granted and frees the slot"""
+    threads = []
+    for priority in priorities:
+        def call(priority=priority):
+            with scheduler.slot(provider, priority):
+                order.append(priority)
+        thread = threading.Thread(target=call)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+def wait_for_waiters(scheduler, provider, count):
+    deadline = time.time() + 5
+    while sum(scheduler.stats()['providers'][provider]['waiting'].values()) < count:
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_interactive_calls_overtake_the_batch_backlog():
+    scheduler = FairScheduler(slots=1, weights={'interactive': 8, 'analysis': 2, 'batch': 1})
+    order = []
+    scheduler.acquire('openai', 'batch')
+
+    threads = queue_calls(scheduler, 'openai', ['batch'] * 6, order)
+    wait_for_waiters(scheduler, 'openai', 6)
+    threads += queue_calls(scheduler, 'openai', ['interactive'] * 3, order)
+    wait_for_waiters(scheduler, 'openai', 9)
+
+    scheduler.release('openai')
+    for thread in threads:
+        thread.join(5)
+
+    # The first batch call had the earliest tag; the interactive calls follow it, ahead of the other five
+    assert order[:4] == ['batch', 'interactive', 'interactive', 'interactive']
+    assert order[4:] == ['batch'] * 5
+
+
+def test_idle_capacity_is_not_held_back():
+    scheduler = FairScheduler(slots=2)
+    scheduler.acquire('openai', 'batch')
+    scheduler.acquire('openai', 'batch')
+    assert scheduler.stats()['providers']['openai'] == {'limit': 2, 'in_use': 2, 'waiting': {}}
+
+
+class FakeTester:
+    def test_provider(self, provider, prompt):
+        return {'provider': provider, 'response': f'answer from {provider}', 'success': True}
+
+
+class FakeAnalyzer:
+    analyze_enabled = True
+
+    def analyze_with_ai(self, response, query, provider):
+        return {'provider': provider, 'brands_mentioned': []}
+
+
+def test_analysis_runs_in_the_query_class(backend_app, monkeypatch):
+    app = backend_app
+    monkeypatch.setattr(app, 'get_services', lambda settings: (FakeTester(), FakeAnalyzer()))
+    classes = []
+    real_slot = app.scheduler.slot
+
+    def slot(provider, priority='interactive', cancel=None):
+        classes.append((provider, priority))
+        return real_slot(provider, priority, cancel)
+
+    monkeypatch.setattr(app.scheduler, 'slot', slot)
+    for query_id, priority in (('q-interactive', 'interactive'), ('q-batch', 'batch')):
+        app.query_results.put(query_id, {'id': query_id, 'query': 'q', 'timestamp': '2025-01-01T00:00:00',
+                                         'status': 'queued', 'providers': ['openai'], 'results': {}, 'analysis': None})
+        app.process_query_async(query_id, 'q', ['openai'], priority)
+
+    assert classes == [('openai', 'interactive'), (app.ANALYSIS_BUDGET, 'interactive'),
+                       ('openai', 'batch'), (app.ANALYSIS_BUDGET, 'analysis')]
+
+
+def test_cancel_wakes_only_waiting_callers():
+    scheduler = FairScheduler(slots=1)
+    token = CancelToken()
+
+    # Granted at once: nothing left registered on the token
+    with scheduler.slot('openai', 'batch', token):
+        assert token._callbacks == []
+
+        errors = []
+
+        def wait_for_slot():
+            try:
+                scheduler.acquire('openai', 'batch', token)
+            except QueryCancelled as e:
+                errors.append(e)
+
+        waiter = threading.Thread(target=wait_for_slot)
+        waiter.start()
+        wait_for_waiters(scheduler, 'openai', 1)
+        assert len(token._callbacks) == 1
+
+        token.cancel()
+        waiter.join(5)
+        assert len(errors) == 1
+        assert scheduler.stats()['providers']['openai']['waiting'] == {}
+
+
+def test_callbacks_can_be_removed_before_cancel():
+    token = CancelToken()
+    calls = []
+    handle = token.on_cancel(lambda: calls.append('kept'))
+    token.remove_callback(token.on_cancel(lambda: calls.append('removed')))
+    token.cancel()
+    token.remove_callback(handle)
+
+    assert calls == ['kept']
+    token.on_cancel(lambda: calls.append('late'))
+    assert calls == ['kept', 'late']
+    assert token.cancel() is False
+
+
+def test_answer_racing_a_cancel_is_dropped(backend_app, monkeypatch):
+    app = backend_app
+    monkeypatch.setattr(app, 'get_services', lambda settings: (FakeTester(), FakeAnalyzer()))
+    query_id = 'q-racing-cancel'
+    app.query_results.put(query_id, {'id': query_id, 'query': 'q', 'timestamp': '2025-01-01T00:00:00',
+                                     'status': 'queued', 'providers': ['openai'], 'results': {}, 'analysis': None})
+    token = app.track_query(query_id, 'interactive')
+    real_lock = threading.Lock()
+
+    class CancellingLock:
+        """Cancels the query just as a provider thread goes to store its answer"""
+
+        def __enter__(self):
+            token.cancel()
+            real_lock.acquire()
+
+        def __exit__(self, *exc):
+            real_lock.release()
+
+    monkeypatch.setattr(app, 'record_lock', CancellingLock())
+    app.process_query_async(query_id, 'q', ['openai'])
+
+    record = app.query_results.get(query_id)
+    assert record['status'] == 'cancelled'
+    assert record['results'] == {}
+
+
+def test_cancel_as_a_slot_is_granted_skips_the_call(backend_app, monkeypatch):
+    app = backend_app
+    calls = []
+
+    class CountingTester(FakeTester):
+        def test_provider(self, provider, prompt):
+            calls.append(provider)
+            return super().test_provider(provider, prompt)
+
+    monkeypatch.setattr(app, 'get_services', lambda settings: (CountingTester(), FakeAnalyzer()))
+    query_id = 'q-cancel-at-grant'
+    app.query_results.put(query_id, {'id': query_id, 'query': 'q', 'timestamp': '2025-01-01T00:00:00',
+                                     'status': 'queued', 'providers': ['openai'], 'results': {}, 'analysis': None})
+    token = app.track_query(query_id, 'interactive')
+    real_acquire = app.scheduler.acquire
+
+    def acquire(provider, priority='interactive', cancel=None):
+        """Grants the slot, with the cancel arriving right behind the grant"""
+        real_acquire(provider, priority, cancel)
+        token.cancel()
+
+    monkeypatch.setattr(app.scheduler, 'acquire', acquire)
+    app.process_query_async(query_id, 'q', ['openai'])
+
+    assert calls == []
+    assert app.query_results.get(query_id)['status'] == 'cancelled'
+    assert app.scheduler.stats()['providers']['openai']['in_use'] == 0
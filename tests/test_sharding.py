@@ -0,0 +1,35 @@
+"""Deterministic question sharding"""
+
+import pytest
+
+from sharding import parse_shard, select_shard, shard_of, shard_path
+
+
+def test_shards_partition_the_questions():
+    questions = [f'question {n}' for n in range(200)]
+    shards = [select_shard(questions, (index, 4)) for index in range(1, 5)]
+
+    assert sorted(q for shard in shards for q in shard) == sorted(questions)
+    assert all(shard for shard in shards)
+    # File order is kept inside a shard
+    assert shards[0] == [q for q in questions if q in set(shards[0])]
+
+
+def test_repeated_questions_are_run_once():
+    questions = ['Best ETFs?', 'Cheapest broker?', 'Best ETFs?']
+    shards = [select_shard(questions, (index, 2)) for index in (1, 2)]
+    assert sorted(q for shard in shards for q in shard) == ['Best ETFs?', 'Cheapest broker?']
+
+
+def test_shard_depends_only_on_the_question():
+    assert shard_of('Best ETFs?', 8) == shard_of('  Best ETFs?\n', 8)
+    assert 1 <= shard_of('Best ETFs?', 8) <= 8
+    assert shard_of('anything', 1) == 1
+
+
+def test_parse_shard_and_paths():
+    assert parse_shard('2/8') == (2, 8)
+    for value in ('0/8', '9/8', '2', 'a/b'):
+        with pytest.raises(ValueError):
+            parse_shard(value)
+    assert shard_path('results/analysis_results.csv', (2, 8)) == 'results/analysis_results_shard2of8.csv'
@@ -0,0 +1,86 @@
+"""Share-of-voice counts over the analysis CSV"""
+
+import csv
+import json
+
+from share_of_voice import ShareOfVoice, complete_rows
+
+HEADER = ['timestamp', 'query', 'provider', 'companies_mentioned', 'mention_reasons', 'authority_signals',
+          'key_features', 'sources_cited', 'ranking_factors', 'sentiment', 'optimization_insights']
+
+
+def row(query, provider, companies, sentiment='positive', insights='none'):
+    return ['2025-01-01T10:00:00', query, provider, json.dumps(companies), '{}', '[]', '[]', '[]', '',
+            sentiment, insights]
+
+
+def write_rows(path, rows, header=False):
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if header:
+            writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+def test_counts_and_shares(tmp_path):
+    path = str(tmp_path / 'analysis.csv')
+    write_rows(path, [
+        row('best etf', 'OpenAI', ['Vanguard', 'Fidelity']),
+        row('best etf', 'anthropic', ['vanguard'], 'negative'),
+        row('robo advisor', 'openai', ['Betterment'])
+    ], header=True)
+
+    sov = ShareOfVoice(path, save_interval=0)
+    sov.refresh()
+
+    vanguard = sov.lookup('VANGUARD')
+    assert (vanguard['mentions'], vanguard['responses'], vanguard['share']) == (2, 3, 0.6667)
+    assert vanguard['sentiment'] == {'positive': 1, 'neutral': 0, 'negative': 1}
+    assert sov.lookup('Vanguard', provider='openai', query='best etf')['share'] == 1.0
+    assert [entry['company'] for entry in sov.top(limit=2)] == ['Vanguard', 'Betterment']
+
+
+def test_refresh_only_reads_new_rows_and_survives_a_restart(tmp_path):
+    path = str(tmp_path / 'analysis.csv')
+    write_rows(path, [row('q', 'openai', ['A'])], header=True)
+    sov = ShareOfVoice(path, save_interval=0)
+    sov.refresh()
+
+    write_rows(path, [row('q', 'openai', ['A', 'B'])])
+    sov.refresh()
+    assert sov.rows == 2
+    assert sov.lookup('A')['mentions'] == 2
+
+    reopened = ShareOfVoice(path, save_interval=0)
+    assert reopened.rows == 2
+    assert reopened.lookup('B')['mentions'] == 1
+
+
+def test_a_multi_line_field_is_not_split_while_being_written(tmp_path):
+    path = str(tmp_path / 'analysis.csv')
+    write_rows(path, [row('q', 'openai', ['A'])], header=True)
+    with open(path, 'rb') as f:
+        complete = f.read()
+    write_rows(path, [row('q', 'openai', ['B'], insights='first line\nsecond line')])
+    with open(path, 'rb') as f:
+        full = f.read()
+
+    # Stop the writer right after the newline inside the quoted field
+    torn = full[:full.index(b'first line\n') + len(b'first line\n')]
+    with open(path, 'wb') as f:
+        f.write(torn)
+    sov = ShareOfVoice(path, save_interval=0)
+    sov.refresh()
+    assert sov.rows == 1
+    assert sov.offset == len(complete)
+
+    with open(path, 'wb') as f:
+        f.write(full)
+    sov.refresh()
+    assert sov.rows == 2
+    assert sov.lookup('B')['mentions'] == 1
+
+
+def test_complete_rows_skips_quoted_newlines():
+    data = b'a,b\n"x\ny",z\npartial'
+    assert list(complete_rows(data, 0, len(data))) == [(0, 4), (4, 12)]
@@ -0,0 +1,70 @@
+"""Mention trend buckets, and the stores analyzers share"""
+
+from datetime import datetime
+
+from analyzer import ResponseAnalyzer
+from trends import TrendStore
+
+
+def test_daily_trend_counts_mention_rate_and_rank(tmp_path):
+    store = TrendStore(str(tmp_path / 'trends.db'))
+    store.record({'timestamp': '2025-01-01T09:00:00', 'provider': 'OpenAI', 'companies_mentioned': ['Vanguard', 'Fidelity']})
+    store.record({'timestamp': '2025-01-01T15:00:00', 'provider': 'openai', 'companies_mentioned': ['Fidelity']})
+    store.record({'timestamp': '2025-01-02T10:00:00', 'provider': 'anthropic', 'companies_mentioned': []})
+
+    points = store.trend('fidelity', granularity='daily')
+    assert [(p['bucket'], p['responses'], p['mentions'], p['avg_rank']) for p in points] == [
+        ('2025-01-01', 2, 2, 1.5),
+        ('2025-01-02', 1, 0, None),
+    ]
+    assert store.trend('Vanguard', provider='openai', granularity='weekly')[0]['mention_rate'] == 0.5
+    store.close()
+
+
+def test_rebuilt_analyzers_share_one_index_and_connection(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('ANALYZE_RESPONSES', 'true')
+    monkeypatch.setenv('ANALYSIS_CSV_PATH', str(tmp_path / 'analysis.csv'))
+    monkeypatch.setenv('TREND_DB_PATH', str(tmp_path / 'trends.db'))
+
+    first, second = ResponseAnalyzer(), ResponseAnalyzer()
+    assert first.share_of_voice is second.share_of_voice
+    assert first.trends is second.trends
+
+
+def test_hourly_daily_and_weekly_rollups_agree(tmp_path):
+    store = TrendStore(str(tmp_path / 'trends.db'), raw_retention_days=100000, hourly_retention_days=100000)
+    # 2025-01-05 is a Sunday, 2025-01-06 the Monday that starts the next week
+    store.record({'timestamp': '2025-01-05T09:10:00', 'provider': 'openai', 'companies_mentioned': ['Fidelity']})
+    store.record({'timestamp': '2025-01-05T09:50:00', 'provider': 'anthropic', 'companies_mentioned': ['Vanguard', 'Fidelity']})
+    store.record({'timestamp': '2025-01-05T23:00:00', 'provider': 'openai', 'companies_mentioned': []})
+    store.record({'timestamp': '2025-01-06T08:00:00', 'provider': 'openai', 'companies_mentioned': ['Fidelity']})
+
+    def rollup(granularity, **kwargs):
+        return [(p['bucket'], p['responses'], p['mentions'], p['avg_rank'])
+                for p in store.trend('Fidelity', granularity=granularity, **kwargs)]
+
+    assert rollup('hourly') == [('2025-01-05T09', 2, 2, 1.5), ('2025-01-05T23', 1, 0, None), ('2025-01-06T08', 1, 1, 1.0)]
+    assert rollup('daily') == [('2025-01-05', 3, 2, 1.5), ('2025-01-06', 1, 1, 1.0)]
+    assert rollup('weekly') == [('2024-12-30', 3, 2, 1.5), ('2025-01-06', 1, 1, 1.0)]
+    assert rollup('daily', provider='OpenAI') == [('2025-01-05', 2, 1, 1.0), ('2025-01-06', 1, 1, 1.0)]
+    assert rollup('hourly', since='2025-01-05T10:00:00', until='2025-01-06T00:00:00') == [('2025-01-05T23', 1, 0, None)]
+    store.close()
+
+
+def test_retention_prunes_raw_rows_and_hourly_buckets_only(tmp_path):
+    store = TrendStore(str(tmp_path / 'trends.db'), raw_retention_days=100000, hourly_retention_days=100000)
+    store.record({'timestamp': '2025-01-01T09:00:00', 'provider': 'openai', 'companies_mentioned': ['Fidelity']})
+    store.record({'timestamp': '2025-01-20T09:00:00', 'provider': 'openai', 'companies_mentioned': ['Fidelity']})
+    store.raw_retention_days, store.hourly_retention_days = 10, 5
+
+    assert store.apply_retention(now=datetime(2025, 1, 21, 12)) == 1
+    assert [p['bucket'] for p in store.trend('Fidelity', granularity='hourly')] == ['2025-01-20T09']
+    # Daily and weekly rollups outlive the raw rows they were counted from
+    assert [p['bucket'] for p in store.trend('Fidelity', granularity='daily')] == ['2025-01-01', '2025-01-20']
+    assert [p['bucket'] for p in store.trend('Fidelity', granularity='weekly')] == ['2024-12-30', '2025-01-20']
+    assert store.conn.execute('SELECT COUNT(*) FROM raw_records').fetchone()[0] == 1
+    assert store.latest_timestamp() == '2025-01-20T09:00:00'
+
+    assert store.apply_retention(now=datetime(2025, 1, 21, 12)) == 0
+    store.close()
@@ -0,0 +1,75 @@
+"""Queue positions and push-back in the bounded worker pool"""
+
+import threading
+import time
+
+import pytest
+
+from worker_pool import QueryWorkerPool, QueueFull
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.02)
+
+
+def test_positions_follow_submission_order_and_a_full_queue_pushes_back():
+    pool = QueryWorkerPool(max_workers=1, max_queue=2)
+    release = threading.Event()
+
+    pool.submit('running', release.wait, 10)
+    wait_for(lambda: pool.position('running') == 0)
+    assert pool.submit('first', release.wait, 10) == 1
+    assert pool.submit('second', release.wait, 10) == 2
+
+    with pytest.raises(QueueFull) as rejected:
+        pool.submit('third', release.wait, 10)
+    # Two waiting jobs plus the rejected one, on one worker averaging 10s
+    assert rejected.value.retry_after == 30
+    assert pool.position('third') is None
+
+    assert pool.cancel('first')
+    assert pool.position('second') == 1
+    assert pool.depth() == 1
+
+    release.set()
+    wait_for(lambda: pool.stats()['running'] == 0 and pool.depth() == 0)
+    assert pool.position('second') is None
+
+
+class BlockingTester:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def test_provider(self, provider, prompt):
+        self.release.wait(10)
+        return {'provider': provider, 'response': f'answer to {prompt}', 'success': True}
+
+
+class FakeAnalyzer:
+    analyze_enabled = False
+
+
+def test_full_query_queue_answers_429_with_retry_after(backend_app, monkeypatch):
+    app = backend_app
+    tester = BlockingTester()
+    pool = QueryWorkerPool(max_workers=1, max_queue=1)
+    monkeypatch.setattr(app, 'get_services', lambda settings: (tester, FakeAnalyzer()))
+    monkeypatch.setattr(app, 'worker_pool', pool)
+    client = app.app.test_client()
+
+    running = client.post('/api/query', json={'query': 'pool question 1', 'providers': ['openai']}).get_json()
+    wait_for(lambda: pool.position(running['query_id']) == 0)
+    queued = client.post('/api/query', json={'query': 'pool question 2', 'providers': ['openai']}).get_json()
+    assert queued['queue_position'] == 1
+    assert client.get(f"/api/results/{queued['query_id']}").get_json()['queue_position'] == 1
+
+    response = client.post('/api/query', json={'query': 'pool question 3', 'providers': ['openai']})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == str(response.get_json()['retry_after'])
+    assert int(response.headers['Retry-After']) >= 1
+
+    tester.release.set()
+    wait_for(lambda: client.get(f"/api/results/{queued['query_id']}").get_json()['status'] == 'completed')
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Mention Trend Store
+Time-bucketed mention rate and rank position per brand and provider, backed by SQLite
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+from share_of_voice import ANY, normalize_company, normalize_provider
+from csv_index import AnalysisCSVReader
+
+
+GRANULARITIES = ('hourly', 'daily', 'weekly')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw_records (
+    ts TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    query TEXT NOT NULL,
+    companies TEXT NOT NULL,
+    sentiment TEXT
+);
+CREATE INDEX IF NOT EXISTS raw_records_ts ON raw_records (ts);
+
+CREATE TABLE IF NOT EXISTS response_buckets (
+    granularity TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    responses INTEGER NOT NULL,
+    PRIMARY KEY (granularity, provider, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS mention_buckets (
+    granularity TEXT NOT NULL,
+    company TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    mentions INTEGER NOT NULL,
+    rank_sum INTEGER NOT NULL,
+    PRIMARY KEY (granularity, company, provider, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def bucket_keys(ts):
+    """Hourly, daily and weekly bucket labels for a timestamp (weeks start on Monday)"""
+    day = ts.date()
+    monday = day - timedelta(days=day.weekday())
+    return {
+        'hourly': ts.strftime('%Y-%m-%dT%H'),
+        'daily': day.isoformat(),
+        'weekly': monday.isoformat(),
+    }
+
+
+def parse_timestamp(value):
+    """Parse the ISO timestamps written by the analyzer, defaulting to now"""
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return datetime.now()
+
+
+class TrendStore:
+    """Mention trends per brand and provider.
+
+    Each analysis record is kept as a raw row and also counted into hourly,
+    daily and weekly buckets in the same transaction, so the coarser rollups
+    never need to be rebuilt from raw data. Raw rows and hourly buckets are
+    pruned after their retention period; daily and weekly buckets are kept.
+    A trend query is a single primary-key range scan over one granularity.
+    """
+
+    def __init__(self, db_path=None, raw_retention_days=None, hourly_retention_days=None):
+        self.db_path = db_path or os.getenv('TREND_DB_PATH', 'analysis_trends.db')
+        if raw_retention_days is None:
+            raw_retention_days = int(os.getenv('TREND_RAW_RETENTION_DAYS', 30))
+        if hourly_retention_days is None:
+            hourly_retention_days = int(os.getenv('TREND_HOURLY_RETENTION_DAYS', 14))
+        self.raw_retention_days = raw_retention_days
+        self.hourly_retention_days = hourly_retention_days
+
+        self.lock = threading.Lock()
+        self._last_retention = 0.0
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def record(self, analysis_data):
+        """Add one analysis record to the raw table and every bucket"""
+        if not analysis_data:
+            return
+
+        ts = parse_timestamp(analysis_data.get('timestamp'))
+        provider = normalize_provider(analysis_data.get('provider'))
+        companies = analysis_data.get('companies_mentioned') or []
+        if not isinstance(companies, list):
+            companies = [companies]
+
+        # Rank is the 1-based position of a company's first mention
+        ranked = {}
+        for company in companies:
+            company_key, _ = normalize_company(company)
+            if company_key and company_key not in ranked:
+                ranked[company_key] = len(ranked) + 1
+
+        buckets = bucket_keys(ts)
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT INTO raw_records (ts, provider, query, companies, sentiment) VALUES (?, ?, ?, ?, ?)',
+                (ts.isoformat(), provider, analysis_data.get('query', ''),
+                 json.dumps(list(ranked)), str(analysis_data.get('sentiment', 'neutral')))
+            )
+            for granularity, bucket in buckets.items():
+                for provider_part in (provider, ANY):
+                    self.conn.execute(
+                        'INSERT INTO response_buckets (granularity, provider, bucket, responses) VALUES (?, ?, ?, 1) '
+                        'ON CONFLICT (granularity, provider, bucket) DO UPDATE SET responses = responses + 1',
+                        (granularity, provider_part, bucket)
+                    )
+                    for company_key, rank in ranked.items():
+                        self.conn.execute(
+                            'INSERT INTO mention_buckets (granularity, company, provider, bucket, mentions, rank_sum) '
+                            'VALUES (?, ?, ?, ?, 1, ?) '
+                            'ON CONFLICT (granularity, company, provider, bucket) '
+                            'DO UPDATE SET mentions = mentions + 1, rank_sum = rank_sum + excluded.rank_sum',
+                            (granularity, company_key, provider_part, bucket, rank)
+                        )
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('latest_ts', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value)",
+                (ts.isoformat(),)
+            )
+
+        # Pruning is cheap but pointless on every write - run it at most hourly
+        if time.time() - self._last_retention > 3600:
+            self.apply_retention()
+
+    def apply_retention(self, now=None):
+        """Delete raw records and hourly buckets older than their retention period"""
+        now = now or datetime.now()
+        raw_cutoff = (now - timedelta(days=self.raw_retention_days)).isoformat()
+        hourly_cutoff = (now - timedelta(days=self.hourly_retention_days)).strftime('%Y-%m-%dT%H')
+
+        with self.lock, self.conn:
+            raw_deleted = self.conn.execute('DELETE FROM raw_records WHERE ts < ?', (raw_cutoff,)).rowcount
+            self.conn.execute("DELETE FROM response_buckets WHERE granularity = 'hourly' AND bucket < ?", (hourly_cutoff,))
+            self.conn.execute("DELETE FROM mention_buckets WHERE granularity = 'hourly' AND bucket < ?", (hourly_cutoff,))
+        self._last_retention = time.time()
+        return raw_deleted
+
+    def latest_timestamp(self):
+        """Timestamp of the newest record in the store, or None if it is empty"""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'latest_ts'").fetchone()
+        return row[0] if row else None
+
+    def trend(self, company, provider=None, granularity='daily', since=None, until=None):
+        """Mention rate and average rank per bucket for one company"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+
+        company_key, _ = normalize_company(company)
+        provider_key = normalize_provider(provider) if provider else ANY
+        since_key = bucket_keys(parse_timestamp(since))[granularity] if since else ''
+        until_key = bucket_keys(parse_timestamp(until))[granularity] if until else '9999'
+
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT r.bucket, r.responses, COALESCE(m.mentions, 0), COALESCE(m.rank_sum, 0) '
+                'FROM response_buckets r '
+                'LEFT JOIN mention_buckets m ON m.granularity = r.granularity AND m.company = ? '
+                'AND m.provider = r.provider AND m.bucket = r.bucket '
+                'WHERE r.granularity = ? AND r.provider = ? AND r.bucket >= ? AND r.bucket <= ? '
+                'ORDER BY r.bucket',
+                (company_key, granularity, provider_key, since_key, until_key)
+            ).fetchall()
+
+        return [
+            {
+                'bucket': bucket,
+                'responses': responses,
+                'mentions': mentions,
+                'mention_rate': round(mentions / responses, 4) if responses else 0.0,
+                'avg_rank': round(rank_sum / mentions, 2) if mentions else None
+            }
+            for bucket, responses, mentions, rank_sum in rows
+        ]
+
+    def backfill_from_csv(self, csv_path):
+        """Load analysis CSV rows newer than anything already in the store"""
+        latest = self.latest_timestamp() or ''
+        added = 0
+        # The offset index lets us skip straight to the days we haven't seen
+        reader = AnalysisCSVReader(csv_path)
+        for row in reader.rows(since=latest[:10] or None):
+            if row.get('timestamp', '') <= latest:
+                continue
+            try:
+                companies = json.loads(row.get('companies_mentioned') or '[]')
+            except json.JSONDecodeError:
+                companies = []
+            self.record({
+                'timestamp': row.get('timestamp'),
+                'provider': row.get('provider'),
+                'query': row.get('query'),
+                'companies_mentioned': companies,
+                'sentiment': row.get('sentiment')
+            })
+            added += 1
+        return added
+
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.conn.close()
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_trend_store(db_path=None):
+    """The process-wide store for a database, so there is one SQLite connection however many analyzers exist"""
+    db_path = db_path or os.getenv('TREND_DB_PATH', 'analysis_trends.db')
+    with _shared_lock:
+        store = _shared.get(db_path)
+        if store is None:
+            store = _shared[db_path] = TrendStore(db_path)
+        return store
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Mention trends per brand and provider')
+    parser.add_argument('--company', '-c', type=str, help='Company/brand to chart')
+    parser.add_argument('--provider', '-p', type=str, help='Restrict to one provider (default: all providers)')
+    parser.add_argument('--granularity', '-g', choices=GRANULARITIES, default='daily', help='Bucket size (default: daily)')
+    parser.add_argument('--days', '-d', type=int, default=90, help='How far back to look (default: 90)')
+    parser.add_argument('--backfill', action='store_true', help='Import analysis CSV rows newer than the store first')
+    parser.add_argument('--csv', type=str, default=os.getenv('ANALYSIS_CSV_PATH', 'analysis_results.csv'),
+                        help='Analysis CSV used by --backfill')
+    args = parser.parse_args()
+
+    store = TrendStore()
+
+    if args.backfill:
+        if not os.path.exists(args.csv):
+            print(f"[ERROR] Analysis CSV not found: {args.csv}")
+            sys.exit(1)
+        print(f"[OK] Imported {store.backfill_from_csv(args.csv)} rows from {args.csv}")
+
+    if not args.company:
+        if not args.backfill:
+            parser.error('--company is required unless --backfill is given')
+        sys.exit(0)
+
+    since = datetime.now() - timedelta(days=args.days)
+    points = store.trend(args.company, args.provider, args.granularity, since=since)
+
+    print(f"{args.company} - {args.granularity} trend ({args.provider or 'all providers'})")
+    print("-" * 60)
+    for point in points:
+        rank = f"{point['avg_rank']:.1f}" if point['avg_rank'] is not None else '-'
+        print(f"{point['bucket']}: {point['mentions']}/{point['responses']} "
+              f"({point['mention_rate']:.1%}) avg rank {rank}")